@@ -2,57 +2,420 @@
 pragma solidity ^0.8.12;
 
 import "@openzeppelin/contracts/token/ERC721/ERC721.sol";
-import "@openzeppelin/contracts/token/ERC721/extensions/ERC721URIStorage.sol";
-import "@openzeppelin/contracts/utils/Counters.sol";
+import "@openzeppelin/contracts/utils/Strings.sol";
+import "@openzeppelin/contracts/utils/structs/BitMaps.sol";
 import "@openzeppelin/contracts/access/Ownable.sol";
+import "@openzeppelin/contracts/proxy/utils/Initializable.sol";
 
-contract GenericNFT is ERC721URIStorage, Ownable {
-    using Counters for Counters.Counter;
-    Counters.Counter private _tokenIds;
+contract GenericNFT is ERC721, Ownable, Initializable {
+    using Strings for uint256;
+    using BitMaps for BitMaps.BitMap;
+
+    // Consecutive tokens minted with a single owner write
+    struct MintBatch {
+        address owner;
+        uint48 firstTokenId;
+        uint48 lastTokenId;
+        string baseURI;
+    }
+
+    // Stored here instead of in ERC721 so that minimal proxy clones can initialize them
+    string private _collectionName;
+    string private _collectionSymbol;
+
+    // Last minted token id. Ids start from 1 and are never reused
+    uint256 private _tokenIds;
+    uint256 private _burnedTokens;
     bool public locked;
 
+    // Compact token URIs: prefix + base32 CIDv1 built from the header and the digest + suffix
+    bytes4 public cidHeader;
+    string public uriPrefix;
+    string public uriSuffix;
+    // Token ids are never reused, so digests are not cleared on burn
+    mapping(uint256 => bytes32) private _tokenDigests;
+    // Full URIs, taking precedence over digests and batch URIs
+    mapping(uint256 => string) private _tokenURIs;
+
+    // Batches sorted by token id, used to lazily resolve the owner of tokens
+    // that have not been transferred since they were minted
+    MintBatch[] private _batches;
+    // Tokens minted in a batch that have been burned
+    BitMaps.BitMap private _burnedBatchTokens;
+    // Tokens that cannot be transferred even when the contract is unlocked, 256 for each slot
+    BitMaps.BitMap private _lockedTokens;
+
+    event LockChanged(bool locked);
+
+    event CompactURIFormatChanged(string prefix, bytes4 header, string suffix);
+
+    event TokensLockChanged(uint256 firstTokenId, uint256 lastTokenId, bool locked);
+
+    error EmptyDigest();
+    error InvalidTokenRange();
+    error TransferLocked();
+    error MintToZeroAddress();
+    error EmptyBatch();
+    error TooManyTokens();
+    error InvalidPageSize();
+
     constructor(string memory name, string memory symbol)
-        ERC721(name, symbol) {
-            locked = true;
+        ERC721("", "") {
+            initialize(name, symbol, msg.sender);
+    }
+
+    /**
+    * Initializes the collection. Called by the constructor or,
+    * for minimal proxy clones, by the factory right after cloning
+    */
+    function initialize(string memory collectionName, string memory collectionSymbol, address collectionOwner)
+        public
+        initializer
+    {
+        _collectionName = collectionName;
+        _collectionSymbol = collectionSymbol;
+        locked = true;
+        // CIDv1, dag-pb, sha2-256 with 32 bytes digest, as the directories of scripts/metadata_pipeline.py
+        cidHeader = 0x01701220;
+        uriPrefix = "ipfs://";
+        uriSuffix = "/metadata.json";
+        _transferOwnership(collectionOwner);
+    }
+
+    function name() public view virtual override returns (string memory) {
+        return _collectionName;
+    }
+
+    function symbol() public view virtual override returns (string memory) {
+        return _collectionSymbol;
     }
 
     function changeAttributes(uint256 tokenId, string memory newTokenURI) public onlyOwner {
-        _setTokenURI(tokenId, newTokenURI);
+        _requireMinted(tokenId);
+        _tokenURIs[tokenId] = newTokenURI;
+    }
+
+    /**
+    * Replaces the URI of the token with the compact representation of the given digest.
+    * Returns the old and the new URI of the token
+    */
+    function changeCID(uint256 tokenId, bytes32 cidDigest)
+        public
+        onlyOwner
+        returns (string memory oldURI, string memory newURI)
+    {
+        if (cidDigest == 0) revert EmptyDigest();
+        oldURI = tokenURI(tokenId);
+
+        // The full URI takes precedence over the digest, so it has to be removed
+        if (bytes(_tokenURIs[tokenId]).length > 0) {
+            delete _tokenURIs[tokenId];
+        }
+        _tokenDigests[tokenId] = cidDigest;
+        newURI = _compactURI(cidDigest);
+    }
+
+    /**
+    * Sets the format used to rebuild the URIs of the tokens stored as digests
+    */
+    function setCompactURIFormat(string memory prefix, bytes4 header, string memory suffix) public onlyOwner {
+        uriPrefix = prefix;
+        cidHeader = header;
+        uriSuffix = suffix;
+        emit CompactURIFormatChanged(prefix, header, suffix);
     }
 
     function destroy(uint256 tokenId) public onlyOwner {
         _burn(tokenId);
+        if (bytes(_tokenURIs[tokenId]).length > 0) {
+            delete _tokenURIs[tokenId];
+        }
     }
 
     function lock() public onlyOwner {
         locked = true;
+        emit LockChanged(true);
     }
 
     function unlock() public onlyOwner {
         locked = false;
+        emit LockChanged(false);
+    }
+
+    /**
+    * Locks the tokens from firstTokenId to lastTokenId included, writing one slot for every 256 tokens.
+    * Locked tokens cannot be transferred even when the contract is unlocked
+    */
+    function lockTokens(uint256 firstTokenId, uint256 lastTokenId) public onlyOwner {
+        _setTokensLock(firstTokenId, lastTokenId, true);
+    }
+
+    /**
+    * Unlocks the tokens from firstTokenId to lastTokenId included.
+    * The tokens can be transferred only when the contract is unlocked as well
+    */
+    function unlockTokens(uint256 firstTokenId, uint256 lastTokenId) public onlyOwner {
+        _setTokensLock(firstTokenId, lastTokenId, false);
+    }
+
+    /**
+    * Checks if the token cannot be transferred, because of its own lock or of the contract lock
+    */
+    function isTokenLocked(uint256 tokenId) public view returns (bool) {
+        return locked || _lockedTokens.get(tokenId);
+    }
+
+    function _setTokensLock(uint256 firstTokenId, uint256 lastTokenId, bool tokensLocked) internal {
+        if (firstTokenId == 0 || firstTokenId > lastTokenId) revert InvalidTokenRange();
+
+        uint256 firstBucket = firstTokenId >> 8;
+        uint256 lastBucket = lastTokenId >> 8;
+        for (uint256 bucket = firstBucket; bucket <= lastBucket; bucket++) {
+            uint256 mask = type(uint256).max;
+            if (bucket == firstBucket) {
+                mask &= type(uint256).max << (firstTokenId & 0xff);
+            }
+            if (bucket == lastBucket) {
+                mask &= type(uint256).max >> (255 - (lastTokenId & 0xff));
+            }
+
+            if (tokensLocked) {
+                _lockedTokens._data[bucket] |= mask;
+            } else {
+                _lockedTokens._data[bucket] &= ~mask;
+            }
+        }
+        emit TokensLockChanged(firstTokenId, lastTokenId, tokensLocked);
     }
 
     function _beforeTokenTransfer(
         address from,
         address to,
-        uint256,
-        uint256 batchSize
+        uint256 firstTokenId,
+        uint256
     ) internal override {
-        require(!locked, "Cannot transfer - currently locked");
+        // Minting and burning are restricted to the owner, so only transfers are subject to the locks
+        if (from != address(0) && to != address(0)) {
+            if (locked || _lockedTokens.get(firstTokenId)) revert TransferLocked();
+        }
+    }
+
+    function _afterTokenTransfer(
+        address from,
+        address to,
+        uint256 firstTokenId,
+        uint256 batchSize
+    ) internal virtual override {
+        if (to == address(0)) {
+            _burnedTokens += batchSize;
+            // Once the explicit owner is deleted the batch owner must not be used anymore
+            (bool found, ) = _findBatch(firstTokenId);
+            if (found) {
+                _burnedBatchTokens.set(firstTokenId);
+            }
+        }
+        super._afterTokenTransfer(from, to, firstTokenId, batchSize);
+    }
+
+    /**
+    * Number of tokens that have been minted and not burned
+    */
+    function totalSupply() public view returns (uint256) {
+        return _tokenIds - _burnedTokens;
+    }
+
+    /**
+    * Returns up to limit ids of existing tokens, starting from the token id cursor.
+    * The returned cursor is the one of the next page, 0 when there are no more tokens.
+    * Start from cursor 1 to enumerate every token. The limit cannot be 0, since the
+    * cursor would never move forward
+    */
+    function getTokenIds(uint256 cursor, uint256 limit) public view returns (uint256[] memory tokenIds, uint256 nextCursor) {
+        if (limit == 0) revert InvalidPageSize();
+        uint256 lastTokenId = _tokenIds;
+        if (cursor == 0) {
+            cursor = 1;
+        }
+        if (cursor > lastTokenId) {
+            return (tokenIds, 0);
+        }
+        if (limit > lastTokenId - cursor + 1) {
+            limit = lastTokenId - cursor + 1;
+        }
+
+        tokenIds = new uint256[](limit);
+        uint256 count = 0;
+        uint256 tokenId = cursor;
+        for (; tokenId <= lastTokenId && count < limit; tokenId++) {
+            if (_exists(tokenId)) {
+                tokenIds[count] = tokenId;
+                count++;
+            }
+        }
+
+        // Shrink the page to the tokens found
+        assembly {
+            mstore(tokenIds, count)
+        }
+        nextCursor = tokenId <= lastTokenId ? tokenId : 0;
+    }
+
+    /**
+    * Resolves the owner of tokens minted in a batch that have never been transferred
+    */
+    function _ownerOf(uint256 tokenId) internal view virtual override returns (address) {
+        address owner = super._ownerOf(tokenId);
+        if (owner != address(0)) {
+            return owner;
+        }
+
+        (bool found, uint256 index) = _findBatch(tokenId);
+        if (!found || _burnedBatchTokens.get(tokenId)) {
+            return address(0);
+        }
+        return _batches[index].owner;
+    }
+
+    /**
+    * Tokens stored as digests rebuild their URI from the compact format.
+    * Tokens minted in a batch without an explicit URI use the base URI
+    * of the batch followed by the token id
+    */
+    function tokenURI(uint256 tokenId) public view virtual override returns (string memory) {
+        _requireMinted(tokenId);
+        string memory storedURI = _tokenURIs[tokenId];
+        if (bytes(storedURI).length > 0) {
+            return storedURI;
+        }
+
+        bytes32 cidDigest = _tokenDigests[tokenId];
+        if (cidDigest != 0) {
+            return _compactURI(cidDigest);
+        }
+
+        (bool found, uint256 index) = _findBatch(tokenId);
+        if (!found) {
+            return storedURI;
+        }
+        return string(abi.encodePacked(_batches[index].baseURI, tokenId.toString()));
+    }
+
+    /**
+    * Builds the URI of a token stored as the digest of its CID
+    */
+    function _compactURI(bytes32 cidDigest) internal view returns (string memory) {
+        return string(abi.encodePacked(uriPrefix, "b", _encodeCID(cidHeader, cidDigest), uriSuffix));
+    }
+
+    /**
+    * Encodes the 36 bytes of header and digest in lowercase RFC 4648 base32 without padding
+    */
+    function _encodeCID(bytes4 header, bytes32 cidDigest) internal pure returns (bytes memory) {
+        bytes32 alphabet = "abcdefghijklmnopqrstuvwxyz234567";
+        bytes memory result = new bytes(58);
+        uint256 high = uint32(header);
+        uint256 low = uint256(cidDigest);
+
+        // The first 30 bits of the header
+        for (uint256 index = 0; index < 6; index++) {
+            result[index] = alphabet[(high >> (27 - 5 * index)) & 31];
+        }
+        // The last 2 bits of the header and the first 3 bits of the digest
+        result[6] = alphabet[((high & 3) << 3) | (low >> 253)];
+        // The remaining 253 bits of the digest followed by 2 bits of padding
+        low = low << 2;
+        for (uint256 index = 0; index < 51; index++) {
+            result[7 + index] = alphabet[(low >> (250 - 5 * index)) & 31];
+        }
+        return result;
+    }
+
+    /**
+    * Binary search for the batch containing the given token id
+    */
+    function _findBatch(uint256 tokenId) internal view returns (bool, uint256) {
+        uint256 high = _batches.length;
+        if (high == 0 || tokenId > _batches[high - 1].lastTokenId) {
+            return (false, 0);
+        }
+
+        uint256 low = 0;
+        while (low < high) {
+            uint256 mid = (low + high) / 2;
+            if (_batches[mid].lastTokenId < tokenId) {
+                low = mid + 1;
+            } else {
+                high = mid;
+            }
+        }
+        return (_batches[low].firstTokenId <= tokenId, low);
     }
 
     function mintNFT(address recipient, string memory tokenURI)
         public
         virtual
         payable
+        onlyOwner
+        returns (uint256)
+    {
+        _tokenIds += 1;
+
+        uint256 newItemId = _tokenIds;
+        _mint(recipient, newItemId);
+        _tokenURIs[newItemId] = tokenURI;
+
+        return newItemId;
+    }
+
+    /**
+    * Mints a token whose URI is stored as the digest of its CID
+    */
+    function mintNFTWithCID(address recipient, bytes32 cidDigest)
+        public
+        virtual
+        onlyOwner
         returns (uint256)
     {
-        _tokenIds.increment();
+        if (cidDigest == 0) revert EmptyDigest();
+        _tokenIds += 1;
 
-        uint256 newItemId = _tokenIds.current();
+        uint256 newItemId = _tokenIds;
         _mint(recipient, newItemId);
-        _setTokenURI(newItemId, tokenURI);
+        _tokenDigests[newItemId] = cidDigest;
 
         return newItemId;
     }
-}
\ No newline at end of file
+
+    /**
+    * Mints count consecutive tokens to the recipient writing the owner only once.
+    * The URI of each token is the batch base URI followed by the token id.
+    * Returns the id of the first token of the batch
+    */
+    function mintBatch(address recipient, uint256 count, string memory batchBaseURI)
+        public
+        virtual
+        onlyOwner
+        returns (uint256)
+    {
+        if (recipient == address(0)) revert MintToZeroAddress();
+        if (count == 0) revert EmptyBatch();
+
+        uint256 firstTokenId = _tokenIds + 1;
+        uint256 lastTokenId = _tokenIds + count;
+        if (lastTokenId > type(uint48).max) revert TooManyTokens();
+
+        _beforeTokenTransfer(address(0), recipient, firstTokenId, count);
+
+        _tokenIds = lastTokenId;
+        _batches.push(MintBatch(recipient, uint48(firstTokenId), uint48(lastTokenId), batchBaseURI));
+        __unsafe_increaseBalance(recipient, count);
+
+        for (uint256 tokenId = firstTokenId; tokenId <= lastTokenId; tokenId++) {
+            emit Transfer(address(0), recipient, tokenId);
+        }
+
+        _afterTokenTransfer(address(0), recipient, firstTokenId, count);
+
+        return firstTokenId;
+    }
+}
@@ -3,7 +3,14 @@ pragma solidity ^0.8.12;
 
 import "./GenericNFT.sol";
 import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
+import "@openzeppelin/contracts/token/ERC20/extensions/draft-IERC20Permit.sol";
 import "@openzeppelin/contracts/access/Ownable.sol";
+import "@openzeppelin/contracts/proxy/Clones.sol";
+import "@openzeppelin/contracts/utils/math/SafeCast.sol";
+import "@openzeppelin/contracts/utils/cryptography/MerkleProof.sol";
+import "@openzeppelin/contracts/utils/cryptography/EIP712.sol";
+import "@openzeppelin/contracts/utils/cryptography/ECDSA.sol";
+import "@openzeppelin/contracts/utils/structs/BitMaps.sol";
 
 /**
 This is version 1 of the GenericNFTFactory contract
@@ -14,19 +21,75 @@ The contracts admitted in the previous version will be automatically
 admitted to the new version.
  */
 
-contract GenericNFTFactory is Ownable {
+contract GenericNFTFactory is Ownable, EIP712 {
 
-    IERC20 public depositToken;
-    uint256 public fee;
-    uint256 public admissionFee;
-    uint256 public editingFee;
+    // The minting fee shares its slot with the deposit token,
+    // so that minting reads the whole payment configuration at once
+    struct PaymentConfig {
+        IERC20 depositToken;
+        uint96 fee;
+    }
+
+    struct FeeConfig {
+        uint128 admissionFee;
+        uint128 editingFee;
+    }
+
+    // Registry entry of an NFT contract
+    struct ContractInfo {
+        address user;
+        uint8 flags;
+        // Tokens minted through the factory since the contract was admitted
+        uint56 mintedTokens;
+        // Position in the list of contracts of the user
+        uint32 userIndex;
+    }
+
+    struct UserInfo {
+        // Position in the whitelist array + 1 (0 means that the user is not in the whitelist)
+        uint128 whitelistIndex;
+    }
+
+    // Mint authorization signed off-chain by the user of the NFT contract.
+    // Anyone can submit a voucher, which mints to its recipient, or to the submitter when the recipient is zero
+    struct MintVoucher {
+        address nftContractAddress;
+        address recipient;
+        string tokenURI;
+        uint256 fee;
+        uint256 expiry;
+        uint256 nonce;
+    }
+
+    // Flag of the contracts created by the factory as clones
+    uint8 public constant CONTRACT_CLONE = 1;
+
+    bytes32 public constant MINT_VOUCHER_TYPEHASH = keccak256(
+        "MintVoucher(address nftContractAddress,address recipient,string tokenURI,uint256 fee,uint256 expiry,uint256 nonce)");
+
+    PaymentConfig private paymentConfig;
+    FeeConfig private feeConfig;
     address[] private whitelist;
     address public latestAddress;
-
-    // Associates each NFT contrac address to its user
-    mapping(address => address) private nftContractToUser;
-    // Associate the user address to the amount of registered contracts
-    mapping(address => uint256) private contractNumberOfUsers;
+    // GenericNFT implementation cloned by createCollection
+    address public collectionImplementation;
+    // Merkle root of the (owner, NFT contract) pairs migrated from older factories
+    bytes32 public migrationRoot;
+
+    // Associates each user address to its whitelist position
+    mapping(address => UserInfo) private users;
+    // Associates each user address to its registered contracts
+    mapping(address => address[]) private userContracts;
+    // Associates each NFT contrac address to its registry entry
+    mapping(address => ContractInfo) private contracts;
+    // Associate the user address to the deposited amount still available for paying fees
+    mapping(address => uint256) public credits;
+    // Sum of the credits of every user, which belongs to the users and is not withdrawn by the owner
+    uint256 public outstandingCredits;
+    // Leaves of the migration tree that have already been admitted
+    mapping(bytes32 => bool) private migratedLeaves;
+    // Voucher nonces already redeemed or cancelled by each signer
+    mapping(address => BitMaps.BitMap) private voucherNonces;
 
     // Events
     event Approved(address indexed _owner,
@@ -37,44 +100,111 @@ contract GenericNFTFactory is Ownable {
                 address indexed _to,
                 uint256 _value);
 
+    event CreditUsed(address indexed _from,
+                uint256 _value);
+
+    event CreditWithdrawn(address indexed _to,
+                uint256 _value);
+
     event FeeChanged(uint256 oldValue, 
                 uint256 newValue);  
 
     event TokenChanged(address oldToken, 
                 address newToken);  
             
-    event AttributesUpdated(uint256 tokenId, 
+    event AttributesUpdated(address indexed nftContractAddress,
+                uint256 indexed tokenId,
+                address indexed caller,
                 string oldURI,
-                string newURI);  
-        
-    event NFTCreated(uint256 tokenId);  
+                string newURI,
+                uint256 fee);
+
+    // In batches the whole fee is reported by the first token and the others report 0
+    event NFTCreated(address indexed nftContractAddress,
+                uint256 indexed tokenId,
+                address indexed caller,
+                address recipient,
+                uint256 fee);
+
+    event CollectionCreated(address indexed _owner,
+                address indexed _collection);
+
+    event NFTDeleted(address indexed nftContractAddress,
+                uint256 indexed tokenId,
+                address indexed caller,
+                uint256 fee);
+
+    // fee is the admission fee paid by the user, 0 for contracts admitted by the owner or migrated
+    event ContractAdmitted(address indexed user,
+                address indexed nftContractAddress,
+                uint8 flags,
+                uint256 fee);
+
+    event ContractReleased(address indexed user,
+                address indexed nftContractAddress);
+
+    event AddedToWhitelist(address indexed user);
+
+    event RemovedFromWhitelist(address indexed user);
+
+    event VoucherRedeemed(address indexed signer,
+                uint256 indexed nonce,
+                address indexed nftContractAddress,
+                uint256 tokenId);
+
+    event VoucherCancelled(address indexed signer,
+                uint256 indexed nonce);
+
+
+    // Errors
+    error NotInWhitelist();
+    error NotContractUser();
+    error FeeTooLow();
+    error InvalidAmount();
+    error InsufficientCredits();
+    error TransferFailed();
+    error LengthMismatch();
+    error EmptyBatch();
+    error InvalidIndex();
+    error AlreadyMigrated();
+    error InvalidProof();
+    error CollectionsNotAvailable();
+    error ContractAlreadyRegistered();
+    error VoucherExpired();
+    error VoucherUsed();
+    error InvalidVoucherSigner();
+
+
+    // The check is in an internal function so that it is not inlined in every function using the modifier
+    modifier onlyWhitelist() {
+        _checkWhitelist();
+        _;
+    }
+   
 
-    event NFTDeleted(uint256 tokenId);  
+    constructor(uint256 _admissionFee, uint256 _fee, uint256 _editingFee, address _depositToken) EIP712("GenericNFTFactory", "1") {
+        paymentConfig = PaymentConfig(IERC20(_depositToken), SafeCast.toUint96(_fee));
+        feeConfig = FeeConfig(SafeCast.toUint128(_admissionFee), SafeCast.toUint128(_editingFee));
+    }
 
+    /**
+    * Configuration getters
+    */
 
-    modifier onlyWhitelist() {
-        bool isInWhitelist = false;
-        for(uint256 index=0; index < whitelist.length; index++) {
-            if(whitelist[index] == msg.sender){
-                isInWhitelist = true;
-            }
-        }
-        
-        // Owner can do what users in whitelist can do
-        if(msg.sender == this.owner()){
-            isInWhitelist = true;
-        }
+    function depositToken() public view returns (IERC20) {
+        return paymentConfig.depositToken;
+    }
 
-        require(isInWhitelist == true);
-        _;
+    function fee() public view returns (uint256) {
+        return paymentConfig.fee;
+    }
+
+    function admissionFee() public view returns (uint256) {
+        return feeConfig.admissionFee;
     }
-   
 
-    constructor(uint256 _admissionFee, uint256 _fee, uint256 _editingFee, address _depositToken) {
-        admissionFee = _admissionFee;
-        fee = _fee;
-        editingFee = _editingFee;
-        depositToken = IERC20(_depositToken);
+    function editingFee() public view returns (uint256) {
+        return feeConfig.editingFee;
     }
 
     /**
@@ -85,7 +215,7 @@ contract GenericNFTFactory is Ownable {
     * Retrieves the address of the latest factory deployed.
     * Should be used by factory users to make sure they are using the latest version.
     */
-    function getLatestVersion() public returns (address) {
+    function getLatestVersion() public view returns (address) {
         return latestAddress;
     }
 
@@ -102,13 +232,29 @@ contract GenericNFTFactory is Ownable {
     * nftContractAddress -> The GenericNFT contract address that the user wants to mint
     */
     function _admitToWhitelist(address nftContractAddressOwner, address nftContractAddress) internal {
-        nftContractToUser[nftContractAddress] = nftContractAddressOwner;
-        contractNumberOfUsers[nftContractAddressOwner] += 1;
+        _admitToWhitelist(nftContractAddressOwner, nftContractAddress, 0, 0);
+    }
 
-        bool alreadyInWhitelist = checkWhitelistAdmission();
-        if(!alreadyInWhitelist){
-            whitelist.push(nftContractAddressOwner);
+    /**
+    * Internal function to use for adding owners and contracts to the mappings
+    * nftContractAddressOwner -> The of the onwer of the GenericNFT contract address
+    * nftContractAddress -> The GenericNFT contract address that the user wants to mint
+    * flags -> The flags of the registry entry of the contract
+    * fee -> The admission fee paid by the user, reported by ContractAdmitted
+    */
+    function _admitToWhitelist(address nftContractAddressOwner, address nftContractAddress, uint8 flags, uint256 fee) internal {
+        // A contract admitted again is moved to the list of the new owner
+        ContractInfo storage info = contracts[nftContractAddress];
+        if(info.user != address(0)){
+            _removeContractOfUser(info.user, info.userIndex);
         }
+
+        address[] storage ownedContracts = userContracts[nftContractAddressOwner];
+        contracts[nftContractAddress] = ContractInfo(nftContractAddressOwner, flags, 0, SafeCast.toUint32(ownedContracts.length));
+        ownedContracts.push(nftContractAddress);
+
+        _addToWhitelist(nftContractAddressOwner);
+        emit ContractAdmitted(nftContractAddressOwner, nftContractAddress, flags, fee);
     }
 
     /**
@@ -121,51 +267,127 @@ contract GenericNFTFactory is Ownable {
         _admitToWhitelist(nftContractAddressOwner, nftContractAddress);
     }
 
+    /**
+    * Allows the owner to admit several addresses and contracts in one transaction.
+    * Pairs that are already registered are skipped.
+    * Returns the number of admitted pairs
+    * nftContractAddressOwners -> The owners of the GenericNFT contracts
+    * nftContractAddresses -> The GenericNFT contract addresses, one for each owner
+    */
+    function admitToWhitelistBatch(address[] memory nftContractAddressOwners, address[] memory nftContractAddresses) public onlyOwner returns (uint256 admitted) {
+        if(nftContractAddressOwners.length != nftContractAddresses.length) revert LengthMismatch();
+
+        for(uint256 index=0; index < nftContractAddresses.length; index++) {
+            if(contracts[nftContractAddresses[index]].user != nftContractAddressOwners[index]){
+                _admitToWhitelist(nftContractAddressOwners[index], nftContractAddresses[index]);
+                admitted++;
+            }
+        }
+    }
+
+    /**
+    * Allows the owner to publish the Merkle root of the contracts migrated from older factories,
+    * replacing one admitToWhitelist transaction per contract.
+    * The leaves are keccak256(keccak256(abi.encode(owner, nftContract))), built by scripts/merkle_whitelist.py
+    * _migrationRoot -> The root of the migration tree
+    */
+    function setMigrationRoot(bytes32 _migrationRoot) public onlyOwner {
+        migrationRoot = _migrationRoot;
+    }
+
+    /**
+    * Admits a contract of the migration tree. Can be called by the owner of the contract
+    * or by a relayer on its behalf, once for each pair of the tree
+    * nftContractAddressOwner -> The owner of the GenericNFT contract in the older factory
+    * nftContractAddress -> The GenericNFT contract address
+    * proof -> The Merkle proof of the pair
+    */
+    function claimMigration(address nftContractAddressOwner, address nftContractAddress, bytes32[] memory proof) public {
+        bytes32 leaf = keccak256(bytes.concat(keccak256(abi.encode(nftContractAddressOwner, nftContractAddress))));
+        if(migratedLeaves[leaf]) revert AlreadyMigrated();
+        if(!MerkleProof.verify(proof, migrationRoot, leaf)) revert InvalidProof();
+
+        migratedLeaves[leaf] = true;
+        _admitToWhitelist(nftContractAddressOwner, nftContractAddress);
+    }
+
     /** 
-    * Allows users to become part of the whitelist
+    * Allows users to become part of the whitelist.
+    * A contract registered to another user can be moved only by the owner or by a migration
     * nftContractAddress -> The GenericNFT contract address that the user wants to mint
     * _admissionFee -> The fee to pay for entering the whitelist
     */
     function applyToWhitelist(address nftContractAddress, uint256 _admissionFee) public payable {
-
-        deposit(_admissionFee);  
+        address currentUser = contracts[nftContractAddress].user;
+        if(currentUser != address(0) && currentUser != msg.sender) revert ContractAlreadyRegistered();
+        _checkFee(_admissionFee, feeConfig.admissionFee);
+        _collectFee(_admissionFee);  
         address nftContractAddressOwner = msg.sender;
-        _admitToWhitelist(nftContractAddressOwner, nftContractAddress);
+        _admitToWhitelist(nftContractAddressOwner, nftContractAddress, 0, _admissionFee);
+    }
+
+    /**
+    * Allows the owner to set the GenericNFT implementation used for new collections
+    */
+    function setCollectionImplementation(address _collectionImplementation) public onlyOwner {
+        collectionImplementation = _collectionImplementation;
+    }
+
+    /** 
+    * Allows users to create a new GenericNFT collection operated by the factory.
+    * The collection is a minimal proxy (EIP-1167) of the collection implementation,
+    * it is owned by the factory and it is admitted to the whitelist in the same transaction.
+    * The ownership can be claimed back with claimOwnership
+    * name -> The name of the collection
+    * symbol -> The symbol of the collection
+    * _admissionFee -> The fee to pay for entering the whitelist
+    */
+    function createCollection(string memory name, string memory symbol, uint256 _admissionFee) public returns (address) {
+        if(collectionImplementation == address(0)) revert CollectionsNotAvailable();
+        _checkFee(_admissionFee, feeConfig.admissionFee);
+        _collectFee(_admissionFee);
+
+        address collection = Clones.clone(collectionImplementation);
+        GenericNFT(collection).initialize(name, symbol, address(this));
+        _admitToWhitelist(msg.sender, collection, CONTRACT_CLONE, _admissionFee);
+
+        emit CollectionCreated(msg.sender, collection);
+        return collection;
+    }
+
+    /** 
+    * Allows users to become part of the whitelist approving the admission fee
+    * with an EIP-2612 permit signature instead of a separate approve transaction
+    * nftContractAddress -> The GenericNFT contract address that the user wants to mint
+    * _admissionFee -> The fee to pay for entering the whitelist
+    * deadline, v, r, s -> The permit signature of the user for the admission fee
+    */
+    function applyToWhitelistWithPermit(address nftContractAddress, uint256 _admissionFee, uint256 deadline, uint8 v, bytes32 r, bytes32 s) public {
+        _permit(_admissionFee, deadline, v, r, s);
+        applyToWhitelist(nftContractAddress, _admissionFee);
     }
 
     /**
     * Allows the user to check if it has been already admitted to
     * the whitelist 
     */
-    function checkWhitelistAdmission() public returns (bool) {
-        bool isInWhitelist = false;
-        for(uint256 index=0; index < whitelist.length; index++) {
-            if(whitelist[index] == msg.sender){
-                isInWhitelist = true;
-            }
-        }
-        return isInWhitelist;
+    function checkWhitelistAdmission() public view returns (bool) {
+        return _isInWhitelist(msg.sender);
     }
 
     /**
-    Allows the owner to check if an address is  admitted to
-    the whitelist 
+    Allows anyone to check if an address is admitted to
+    the whitelist, which is public through getWhitelist as well
     */
-    function checkWhitelistAdmission(address addressToCheck) public onlyOwner returns (bool) {
-        bool isInWhitelist = false;
-        for(uint256 index=0; index < whitelist.length; index++) {
-            if(whitelist[index] == addressToCheck){
-                isInWhitelist = true;
-            }
-        }
-        return isInWhitelist;
+    function checkWhitelistAdmission(address addressToCheck) public view returns (bool) {
+        return _isInWhitelist(addressToCheck);
     }
 
     /**
-    Allows the owner to retrieve an element from the whitelist
+    Retrieves an element from the whitelist, which is public like getWhitelist
     */
-    function getFromWhitelist(uint256 index) public onlyOwner returns (address) {
-        require(index >= 0 && index < whitelist.length, "Index is not valid.");
+    function getFromWhitelist(uint256 index) public view returns (address) {
+        if(index >= whitelist.length) revert InvalidIndex();
         return whitelist[index];
     }
 
@@ -175,60 +397,160 @@ contract GenericNFTFactory is Ownable {
     * nftContractAddress -> The NFT contract address for which the user wants to claim the ownership
     */
     function claimOwnership(address nftContractAddress) public onlyWhitelist {
-
-        require(contractNumberOfUsers[msg.sender] > 0, "The user has not applied for any contract.");
-        require(nftContractToUser[nftContractAddress] == msg.sender, "Only the same user who applied for the contract can claim the ownership.");
+        ContractInfo storage info = _contractOfSender(nftContractAddress);
 
         GenericNFT targetNFTContract = GenericNFT(nftContractAddress);
         targetNFTContract.transferOwnership(msg.sender);
 
-        contractNumberOfUsers[msg.sender] -= 1;
-        delete nftContractToUser[nftContractAddress];
+        uint256 remainingContracts = _removeContractOfUser(msg.sender, info.userIndex);
+        delete contracts[nftContractAddress];
+        emit ContractReleased(msg.sender, nftContractAddress);
 
-        if(contractNumberOfUsers[msg.sender] == 0) {
-            for(uint256 index=0; index < whitelist.length; index++){
-                if(whitelist[index] == msg.sender){
-                    _burn(index, whitelist);
-                }
-            }
+        if(remainingContracts == 0) {
+            _removeFromWhitelist(msg.sender);
         }
     }
 
+    /**
+    * Internal function to remove a contract from the list of the user.
+    * The last contract of the list takes the position of the removed one.
+    * Returns the number of contracts left to the user
+    * user -> The user of the contract
+    * index -> The position of the contract in the list of the user
+    */
+    function _removeContractOfUser(address user, uint256 index) internal returns (uint256) {
+        address[] storage ownedContracts = userContracts[user];
+        uint256 lastIndex = ownedContracts.length - 1;
+        if(index != lastIndex){
+            address lastContract = ownedContracts[lastIndex];
+            ownedContracts[index] = lastContract;
+            contracts[lastContract].userIndex = uint32(index);
+        }
+        ownedContracts.pop();
+        return lastIndex;
+    }
+
     /** 
     * Adds the address passed as argument to the whitelist
     * newAddress -> The address to be added to the whitelist
     */
     function addToWhitelist(address newAddress) public onlyOwner {
-        bool alreadyInWhitelist = checkWhitelistAdmission(newAddress);
-        if(!alreadyInWhitelist){
-            whitelist.push(newAddress);
+        _addToWhitelist(newAddress);
+    }
+
+    /** 
+    * Removes the address specified as argument from the whitelist
+    * addressToRemove -> the address to be removed
+    */
+    function removeFromWhitelist(address addressToRemove) public onlyOwner {
+        _removeFromWhitelist(addressToRemove);
+    }
+
+    /** 
+    * Adds the addresses passed as argument to the whitelist in one transaction.
+    * Addresses already in the whitelist are skipped.
+    * Returns the number of added addresses
+    * newAddresses -> The addresses to be added to the whitelist
+    */
+    function addToWhitelistBatch(address[] memory newAddresses) public onlyOwner returns (uint256 added) {
+        for(uint256 index=0; index < newAddresses.length; index++) {
+            if(_addToWhitelist(newAddresses[index])){
+                added++;
+            }
         }
     }
 
     /** 
-    * Removes the element at index specified as first argument
-    * from the array specified as second argument
-    * the array is the resized and the last item takes the 
-    * position of the removed one
-    * index -> The index of the element to be removed
-    * array -> The array to manipulate
+    * Removes the addresses passed as argument from the whitelist in one transaction.
+    * Addresses that are not in the whitelist are skipped.
+    * Returns the number of removed addresses
+    * addressesToRemove -> The addresses to be removed
     */
-    function _burn(uint256 index, address[] storage array) internal {
-        require(index < array.length);
-        array[index] = array[array.length-1];
-        array.pop();
+    function removeFromWhitelistBatch(address[] memory addressesToRemove) public onlyOwner returns (uint256 removed) {
+        for(uint256 index=0; index < addressesToRemove.length; index++) {
+            if(_removeFromWhitelist(addressesToRemove[index])){
+                removed++;
+            }
+        }
+    }
+
+    /**
+    * Internal function to check in constant time if an address is in the whitelist
+    * addressToCheck -> The address to look up
+    */
+    function _isInWhitelist(address addressToCheck) internal view returns (bool) {
+        return users[addressToCheck].whitelistIndex != 0;
+    }
+
+    /**
+    * Internal function to check that the sender is in the whitelist or is the owner,
+    * who can do what users in whitelist can do
+    */
+    function _checkWhitelist() internal view {
+        if(!_isInWhitelist(msg.sender) && msg.sender != owner()) revert NotInWhitelist();
+    }
+
+    /**
+    * Internal function to get the registry entry of a contract, checking
+    * that the sender is the same user who applied for the contract
+    * nftContractAddress -> The NFT contract address
+    */
+    function _contractOfSender(address nftContractAddress) internal view returns (ContractInfo storage info) {
+        info = contracts[nftContractAddress];
+        if(info.user != msg.sender) revert NotContractUser();
+    }
+
+    /**
+    * Internal function to check that the fee paid covers the required one
+    * paid -> The fee offered by the user
+    * required -> The fee required by the factory
+    */
+    function _checkFee(uint256 paid, uint256 required) internal pure {
+        if(paid < required) revert FeeTooLow();
+    }
+
+    /**
+    * Internal function to add an address to the whitelist.
+    * Does nothing if the address is already in the whitelist.
+    * Returns whether the address has been added
+    * newAddress -> The address to be added to the whitelist
+    */
+    function _addToWhitelist(address newAddress) internal returns (bool) {
+        UserInfo storage user = users[newAddress];
+        if(user.whitelistIndex != 0){
+            return false;
+        }
+
+        whitelist.push(newAddress);
+        user.whitelistIndex = uint128(whitelist.length);
+        emit AddedToWhitelist(newAddress);
+        return true;
     }
 
     /** 
-    * Removes the address specified as argument from the whitelist
+    * Internal function to remove an address from the whitelist.
+    * The last item of the array takes the position of the removed one
+    * and the array is then resized. Does nothing if the address is not in the whitelist.
+    * Returns whether the address has been removed
     * addressToRemove -> the address to be removed
     */
-    function removeFromWhitelist(address addressToRemove) public onlyOwner {
-        for(uint256 index=0; index < whitelist.length; index++){
-            if(whitelist[index] == addressToRemove){
-                _burn(index, whitelist);
-            }
+    function _removeFromWhitelist(address addressToRemove) internal returns (bool) {
+        UserInfo storage user = users[addressToRemove];
+        uint128 position = user.whitelistIndex;
+        if(position == 0){
+            return false;
+        }
+
+        uint256 lastPosition = whitelist.length;
+        if(position != lastPosition){
+            address lastAddress = whitelist[lastPosition - 1];
+            whitelist[position - 1] = lastAddress;
+            users[lastAddress].whitelistIndex = position;
         }
+        whitelist.pop();
+        user.whitelistIndex = 0;
+        emit RemovedFromWhitelist(addressToRemove);
+        return true;
     }
 
 
@@ -237,18 +559,63 @@ contract GenericNFTFactory is Ownable {
     */
 
     /**
-    Allows the owner to check who is the applicant for the contract passed
-    as argument
+    Allows anyone to check who is the applicant for the contract passed
+    as argument, like getContractInfo
+    */
+    function getUserOfContract(address contractAddress) public view returns (address) {
+        return contracts[contractAddress].user;
+    }
+
+    /**
+    Allows anyone to check how many contracts the user has applied for
     */
-    function getUserOfContract(address contractAddress) public onlyOwner returns (address) {
-        return nftContractToUser[contractAddress];
+    function getContractsOfUser(address userAddress) public view returns (uint256) {
+        return userContracts[userAddress].length;
     }
 
     /**
-    Allows the owner to check how many contracts the user has applied for
+    Retrieves up to limit contracts of the user starting from offset.
+    The order changes when a contract is released
     */
-    function getContractsOfUser(address userAddress) public onlyOwner returns (uint256) {
-        return contractNumberOfUsers[userAddress];
+    function getContractsOfUser(address userAddress, uint256 offset, uint256 limit) public view returns (address[] memory) {
+        return _paginate(userContracts[userAddress], offset, limit);
+    }
+
+    /**
+    Retrieves up to limit addresses of the whitelist starting from offset.
+    The order changes when an address is removed
+    */
+    function getWhitelist(uint256 offset, uint256 limit) public view returns (address[] memory) {
+        return _paginate(whitelist, offset, limit);
+    }
+
+    /**
+    * Internal function to copy a page of a storage list to memory
+    * list -> The list to be read
+    * offset -> The position of the first item of the page
+    * limit -> The maximum number of items of the page
+    */
+    function _paginate(address[] storage list, uint256 offset, uint256 limit) internal view returns (address[] memory page) {
+        uint256 length = list.length;
+        if(offset >= length){
+            return page;
+        }
+        if(limit > length - offset){
+            limit = length - offset;
+        }
+
+        page = new address[](limit);
+        for(uint256 index=0; index < limit; index++) {
+            page[index] = list[offset + index];
+        }
+    }
+
+    /**
+    Retrieves the registry entry of the contract passed as argument
+    */
+    function getContractInfo(address contractAddress) public view returns (address user, uint8 flags, uint256 mintedTokens) {
+        ContractInfo memory info = contracts[contractAddress];
+        return (info.user, info.flags, info.mintedTokens);
     }
 
     /** 
@@ -256,9 +623,9 @@ contract GenericNFTFactory is Ownable {
     newFee -> The new value for the fee
     */
     function setFee(uint256 newFee) public onlyOwner {
-        uint256 oldFee = fee;
-        fee = newFee;
-        emit FeeChanged(oldFee, fee);
+        uint256 oldFee = paymentConfig.fee;
+        paymentConfig.fee = SafeCast.toUint96(newFee);
+        emit FeeChanged(oldFee, newFee);
     }
 
     /** 
@@ -266,9 +633,9 @@ contract GenericNFTFactory is Ownable {
     * newFee -> The new value for the fee
     */
     function setAdmissionFee(uint256 newFee) public onlyOwner {
-        uint256 oldFee = admissionFee;
-        admissionFee = newFee;
-        emit FeeChanged(oldFee, admissionFee);
+        uint256 oldFee = feeConfig.admissionFee;
+        feeConfig.admissionFee = SafeCast.toUint128(newFee);
+        emit FeeChanged(oldFee, newFee);
     }
 
     /** 
@@ -276,9 +643,9 @@ contract GenericNFTFactory is Ownable {
     * newFee -> The new value for the fee
     */
     function setEditingFee(uint256 newFee) public onlyOwner {
-        uint256 oldFee = editingFee;
-        editingFee = newFee;
-        emit FeeChanged(oldFee, editingFee);
+        uint256 oldFee = feeConfig.editingFee;
+        feeConfig.editingFee = SafeCast.toUint128(newFee);
+        emit FeeChanged(oldFee, newFee);
     }
 
     /** 
@@ -286,34 +653,106 @@ contract GenericNFTFactory is Ownable {
     * tokenAddress -> The address of the new token to be used for fees
     */
     function setDepositToken(address tokenAddress) public onlyOwner {
-        address oldAddress = address(depositToken);
-        depositToken = IERC20(tokenAddress);
-        emit TokenChanged(oldAddress, address(depositToken));
+        address oldAddress = address(paymentConfig.depositToken);
+        paymentConfig.depositToken = IERC20(tokenAddress);
+        emit TokenChanged(oldAddress, tokenAddress);
     }
 
     /** 
-    * Allows users to deposit the amount of depositToken
+    * Allows users to deposit the amount of depositToken.
+    * The deposited amount is credited to the user and used to pay the fees
+    * of the following operations without further token transfers
     * amount -> The amount to be deposited
     */
     function deposit(uint256 amount) public {
-        require(amount > 0, "Amount must be more than 0");
-        
-        uint256 allowance = depositToken.allowance(msg.sender, address(this));
-        require(allowance >= amount, "Check the token allowance");
-        
-        bool deposited = depositToken.transferFrom(msg.sender, address(this), amount);
-        require(deposited);
+        _transferDeposit(amount);
+        credits[msg.sender] += amount;
+        outstandingCredits += amount;
+    }
+
+    /** 
+    * Allows users to take back credits they have not used for paying fees
+    * amount -> The amount of credits to be withdrawn
+    */
+    function withdrawCredits(uint256 amount) public {
+        uint256 credit = credits[msg.sender];
+        if(amount == 0) revert InvalidAmount();
+        if(credit < amount) revert InsufficientCredits();
+
+        credits[msg.sender] = credit - amount;
+        outstandingCredits -= amount;
+        bool withdrawn = paymentConfig.depositToken.transfer(msg.sender, amount);
+        if(!withdrawn) revert TransferFailed();
+
+        emit CreditWithdrawn(msg.sender, amount);
+    }
+
+    /** 
+    * Allows users to deposit the amount of depositToken approving it
+    * with an EIP-2612 permit signature instead of a separate approve transaction
+    * amount -> The amount to be deposited
+    * deadline, v, r, s -> The permit signature of the user for the amount
+    */
+    function depositWithPermit(uint256 amount, uint256 deadline, uint8 v, bytes32 r, bytes32 s) public {
+        _permit(amount, deadline, v, r, s);
+        deposit(amount);
+    }
+
+    /** 
+    * Internal function to approve the factory to spend the amount of depositToken
+    * on behalf of the user. A failing permit is ignored because it might have already
+    * been submitted by someone else: the following transfer fails anyway without allowance
+    * amount -> The amount to be approved
+    * deadline, v, r, s -> The permit signature of the user
+    */
+    function _permit(uint256 amount, uint256 deadline, uint8 v, bytes32 r, bytes32 s) internal {
+        try IERC20Permit(address(paymentConfig.depositToken)).permit(msg.sender, address(this), amount, deadline, v, r, s) {
+        } catch {
+        }
+    }
+
+    /** 
+    * Internal function to transfer the amount of depositToken from the user to the factory.
+    * transferFrom already reverts when the allowance is not enough
+    * amount -> The amount to be transferred
+    */
+    function _transferDeposit(uint256 amount) internal {
+        if(amount == 0) revert InvalidAmount();
+
+        bool deposited = paymentConfig.depositToken.transferFrom(msg.sender, address(this), amount);
+        if(!deposited) revert TransferFailed();
 
         emit Deposit(msg.sender, address(this), amount);
     }
 
+    /** 
+    * Internal function to collect a fee from the user.
+    * The fee is taken from the credits of the user when they are enough,
+    * otherwise it is transferred from the user
+    * amount -> The fee to be collected
+    */
+    function _collectFee(uint256 amount) internal {
+        if(amount == 0) revert InvalidAmount();
+
+        uint256 credit = credits[msg.sender];
+        if(credit >= amount){
+            credits[msg.sender] = credit - amount;
+            outstandingCredits -= amount;
+            emit CreditUsed(msg.sender, amount);
+        } else {
+            _transferDeposit(amount);
+        }
+    }
+
 
     /** 
-    * Transfers the contract balance of the depost token to the owner
+    * Transfers the contract balance of the depost token to the owner,
+    * except the credits that users have not used yet
     */
     function withdraw() public onlyOwner {        
-        uint256 balance = depositToken.balanceOf(address(this));
-        depositToken.transfer(msg.sender, balance);
+        IERC20 token = paymentConfig.depositToken;
+        uint256 balance = token.balanceOf(address(this));
+        token.transfer(msg.sender, balance - outstandingCredits);
     }
 
     /* 
@@ -321,7 +760,7 @@ contract GenericNFTFactory is Ownable {
     */
     function withdrawBaseCurrency() public onlyOwner {        
         uint256 balance = address(this).balance;
-        depositToken.transfer(msg.sender, balance);
+        paymentConfig.depositToken.transfer(msg.sender, balance);
     }
 
 
@@ -338,26 +777,190 @@ contract GenericNFTFactory is Ownable {
     * _fee -> the fee to be paid for minting 
     */ 
     function mintNFTFromAddress(address recipient, address nftContractAddress, string memory tokenURI, uint256 _fee) public onlyWhitelist returns (uint256) {
-        require(_fee >= fee, "Minting fee is higher, check the fee value");
-        deposit(_fee);        
+        _checkFee(_fee, paymentConfig.fee);
+        _collectFee(_fee);        
 
-        require(nftContractToUser[nftContractAddress] == msg.sender, "Only the same user who applied for the contract can mint NFTs.");
+        ContractInfo storage info = _contractOfSender(nftContractAddress);
+        info.mintedTokens += 1;
         
         GenericNFT nftContract = GenericNFT(nftContractAddress);
-        nftContract.unlock();
         uint256 tokenId = nftContract.mintNFT(recipient, tokenURI);
-        emit NFTCreated(tokenId);
-        nftContract.lock();
+        emit NFTCreated(nftContractAddress, tokenId, msg.sender, recipient, _fee);
+
+        return tokenId;
+    }
+
+    /** 
+    * Allows users in whitelist to create a new token for the contract passed as argument
+    * approving the minting fee with an EIP-2612 permit signature
+    * recipient -> The address that to which the token will be assigned
+    * nftContractAddress -> The address to be used for the NFT contract
+    * tokenURI -> The token URI to be provided by the user
+    * _fee -> the fee to be paid for minting 
+    * deadline, v, r, s -> The permit signature of the user for the minting fee
+    */ 
+    function mintNFTFromAddressWithPermit(address recipient, address nftContractAddress, string memory tokenURI, uint256 _fee, uint256 deadline, uint8 v, bytes32 r, bytes32 s) public returns (uint256) {
+        _permit(_fee, deadline, v, r, s);
+        return mintNFTFromAddress(recipient, nftContractAddress, tokenURI, _fee);
+    }
+
+    /** 
+    * Allows users in whitelist to create a new token whose URI is stored
+    * as the digest of its CID. The URI is rebuilt by the NFT contract using its compact format
+    * recipient -> The address that to which the token will be assigned
+    * nftContractAddress -> The address to be used for the NFT contract
+    * cidDigest -> The 32 bytes digest of the CID of the token metadata
+    * _fee -> the fee to be paid for minting 
+    */ 
+    function mintNFTWithCIDFromAddress(address recipient, address nftContractAddress, bytes32 cidDigest, uint256 _fee) public onlyWhitelist returns (uint256) {
+        _checkFee(_fee, paymentConfig.fee);
+        _collectFee(_fee);        
+
+        ContractInfo storage info = _contractOfSender(nftContractAddress);
+        info.mintedTokens += 1;
+        
+        GenericNFT nftContract = GenericNFT(nftContractAddress);
+        uint256 tokenId = nftContract.mintNFTWithCID(recipient, cidDigest);
+        emit NFTCreated(nftContractAddress, tokenId, msg.sender, recipient, _fee);
 
         return tokenId;
     }
 
+    /** 
+    * Allows users in whitelist to create several new tokens for the contract
+    * passed as argument in a single transaction. The fee is paid once for the whole batch
+    * recipients -> The addresses to which the tokens will be assigned
+    * nftContractAddress -> The address to be used for the NFT contract
+    * tokenURIs -> The token URIs to be provided by the user, one for each recipient
+    * totalFee -> the fee to be paid for minting the whole batch
+    */ 
+    function mintBatchFromAddress(address[] memory recipients, address nftContractAddress, string[] memory tokenURIs, uint256 totalFee) public onlyWhitelist returns (uint256[] memory) {
+        if(recipients.length == 0) revert EmptyBatch();
+        if(recipients.length != tokenURIs.length) revert LengthMismatch();
+        _checkFee(totalFee, paymentConfig.fee * recipients.length);
+        _collectFee(totalFee);
+
+        // Scoped to keep the stack small enough for the per token events
+        {
+            ContractInfo storage info = _contractOfSender(nftContractAddress);
+            info.mintedTokens += SafeCast.toUint56(recipients.length);
+        }
+
+        GenericNFT nftContract = GenericNFT(nftContractAddress);
+        uint256[] memory tokenIds = new uint256[](recipients.length);
+        for(uint256 index=0; index < recipients.length; index++) {
+            tokenIds[index] = nftContract.mintNFT(recipients[index], tokenURIs[index]);
+            emit NFTCreated(nftContractAddress, tokenIds[index], msg.sender, recipients[index], index == 0 ? totalFee : 0);
+        }
+
+        return tokenIds;
+    }
+
+    /** 
+    * Allows users in whitelist to create consecutive tokens assigned to the same
+    * recipient. The owner is stored once for the whole batch and the URI of each token
+    * is the base URI followed by the token id
+    * recipient -> The address to which the tokens will be assigned
+    * nftContractAddress -> The address to be used for the NFT contract
+    * count -> The number of tokens to be created
+    * batchBaseURI -> The base URI shared by the tokens of the batch
+    * totalFee -> the fee to be paid for minting the whole batch
+    */ 
+    function mintConsecutiveFromAddress(address recipient, address nftContractAddress, uint256 count, string memory batchBaseURI, uint256 totalFee) public onlyWhitelist returns (uint256) {
+        _checkFee(totalFee, paymentConfig.fee * count);
+        _collectFee(totalFee);
+
+        // Scoped to keep the stack small enough for the per token events
+        {
+            ContractInfo storage info = _contractOfSender(nftContractAddress);
+            info.mintedTokens += SafeCast.toUint56(count);
+        }
+
+        GenericNFT nftContract = GenericNFT(nftContractAddress);
+        uint256 firstTokenId = nftContract.mintBatch(recipient, count, batchBaseURI);
+        for(uint256 tokenId=firstTokenId; tokenId < firstTokenId + count; tokenId++) {
+            emit NFTCreated(nftContractAddress, tokenId, msg.sender, recipient, tokenId == firstTokenId ? totalFee : 0);
+        }
+
+        return firstTokenId;
+    }
+
+    /**
+    * Vouchers
+    */
+
+    /** 
+    * Mints the token described by a voucher signed by the user of the NFT contract.
+    * Anyone can redeem the voucher and pays its fee, so the user pays nothing
+    * for the tokens that are never claimed. Each nonce can be used once per signer
+    * voucher -> The voucher built by scripts/vouchers.py
+    * signature -> The EIP-712 signature of the voucher
+    */ 
+    function redeemVoucher(MintVoucher memory voucher, bytes memory signature) public returns (uint256) {
+        if(block.timestamp > voucher.expiry) revert VoucherExpired();
+        _checkFee(voucher.fee, paymentConfig.fee);
+
+        address signer = ECDSA.recover(_hashTypedDataV4(_hashVoucher(voucher)), signature);
+        if(BitMaps.get(voucherNonces[signer], voucher.nonce)) revert VoucherUsed();
+        BitMaps.set(voucherNonces[signer], voucher.nonce);
+
+        // Scoped to keep the stack small enough for the events
+        {
+            ContractInfo storage info = contracts[voucher.nftContractAddress];
+            if(info.user != signer || !_isInWhitelist(signer)) revert InvalidVoucherSigner();
+            info.mintedTokens += 1;
+        }
+        _collectFee(voucher.fee);
+
+        address recipient = voucher.recipient == address(0) ? msg.sender : voucher.recipient;
+        uint256 tokenId = GenericNFT(voucher.nftContractAddress).mintNFT(recipient, voucher.tokenURI);
+        emit NFTCreated(voucher.nftContractAddress, tokenId, msg.sender, recipient, voucher.fee);
+        emit VoucherRedeemed(signer, voucher.nonce, voucher.nftContractAddress, tokenId);
+
+        return tokenId;
+    }
+
+    /** 
+    * Allows the signer of vouchers to invalidate a voucher that has not been redeemed yet
+    * nonce -> The nonce of the voucher
+    */ 
+    function cancelVoucher(uint256 nonce) public {
+        if(BitMaps.get(voucherNonces[msg.sender], nonce)) revert VoucherUsed();
+        BitMaps.set(voucherNonces[msg.sender], nonce);
+        emit VoucherCancelled(msg.sender, nonce);
+    }
+
+    /** 
+    * Checks if a voucher nonce of the signer has been redeemed or cancelled
+    * signer -> The address that signed the voucher
+    * nonce -> The nonce of the voucher
+    */ 
+    function isVoucherNonceUsed(address signer, uint256 nonce) public view returns (bool) {
+        return BitMaps.get(voucherNonces[signer], nonce);
+    }
+
+    /** 
+    * Internal function to compute the EIP-712 struct hash of a voucher
+    * voucher -> The voucher to be hashed
+    */ 
+    function _hashVoucher(MintVoucher memory voucher) internal pure returns (bytes32) {
+        return keccak256(abi.encode(
+            MINT_VOUCHER_TYPEHASH,
+            voucher.nftContractAddress,
+            voucher.recipient,
+            keccak256(bytes(voucher.tokenURI)),
+            voucher.fee,
+            voucher.expiry,
+            voucher.nonce
+        ));
+    }
+
     /**
     * Allows users to lock their NFT contract in order to prevent unwanted transfers
     * nftContractAddress -> The address to be used for the NFT contract
     */
     function lockContract(address nftContractAddress) public onlyWhitelist returns (bool) {
-        require(nftContractToUser[nftContractAddress] == msg.sender, "Only the same user who applied for the contract can lock its NFT contract.");
+        _contractOfSender(nftContractAddress);
 
         GenericNFT nftContract = GenericNFT(nftContractAddress);
         nftContract.lock();
@@ -370,7 +973,7 @@ contract GenericNFTFactory is Ownable {
     * nftContractAddress -> The address to be used for the NFT contract
     */
     function unlockContract(address nftContractAddress) public onlyWhitelist returns (bool) {
-        require(nftContractToUser[nftContractAddress] == msg.sender, "Only the same user who applied for the contract can unlock its NFT contract.");
+        _contractOfSender(nftContractAddress);
 
         GenericNFT nftContract = GenericNFT(nftContractAddress);
         nftContract.unlock();
@@ -378,6 +981,30 @@ contract GenericNFTFactory is Ownable {
         return nftContract.locked();
     }
 
+
+    /**
+    * Allows users to lock a range of tokens of their NFT contract, so that they cannot be
+    * transferred even when the contract is unlocked. A slot is written for every 256 tokens
+    * nftContractAddress -> The address to be used for the NFT contract
+    * firstTokenId -> The first token of the range
+    * lastTokenId -> The last token of the range, included
+    */
+    function lockTokens(address nftContractAddress, uint256 firstTokenId, uint256 lastTokenId) public onlyWhitelist {
+        _contractOfSender(nftContractAddress);
+        GenericNFT(nftContractAddress).lockTokens(firstTokenId, lastTokenId);
+    }
+
+    /**
+    * Allows users to unlock a range of tokens of their NFT contract.
+    * The tokens can be transferred once the contract is unlocked as well
+    * nftContractAddress -> The address to be used for the NFT contract
+    * firstTokenId -> The first token of the range
+    * lastTokenId -> The last token of the range, included
+    */
+    function unlockTokens(address nftContractAddress, uint256 firstTokenId, uint256 lastTokenId) public onlyWhitelist {
+        _contractOfSender(nftContractAddress);
+        GenericNFT(nftContractAddress).unlockTokens(firstTokenId, lastTokenId);
+    }
     
     /** 
     * Allows the owner to change the token URI for the asset with the given token ID
@@ -388,16 +1015,38 @@ contract GenericNFTFactory is Ownable {
     */
     function changeTokenURI(address nftContractAddress, uint256 tokenId, string memory newTokenURI, uint256 _editingFee) public onlyWhitelist {
         
-        require(_editingFee >= editingFee, "Editing fee is higher, check the fee value");
-        deposit(_editingFee);   
+        _checkFee(_editingFee, feeConfig.editingFee);
+        _collectFee(_editingFee);   
 
-        require(nftContractToUser[nftContractAddress] == msg.sender, "Only the same user who applied for the contract can change URI.");
+        _contractOfSender(nftContractAddress);
         
         GenericNFT nftContract = GenericNFT(nftContractAddress);
         string memory oldURI = nftContract.tokenURI(tokenId);
         nftContract.changeAttributes(tokenId, newTokenURI);
         
-        emit AttributesUpdated(tokenId, oldURI, newTokenURI);
+        emit AttributesUpdated(nftContractAddress, tokenId, msg.sender, oldURI, newTokenURI, _editingFee);
+    }
+
+
+    /** 
+    * Allows the owner to change the token URI for the asset with the given token ID
+    * storing only the digest of the new CID
+    * tokenId -> The id of the token to be updated
+    * nftContractAddress -> The address of the token address to be used
+    * newCidDigest -> The 32 bytes digest of the CID of the new token metadata
+    * _editingFee -> The fee to be paid for editing
+    */
+    function changeTokenCID(address nftContractAddress, uint256 tokenId, bytes32 newCidDigest, uint256 _editingFee) public onlyWhitelist {
+        
+        _checkFee(_editingFee, feeConfig.editingFee);
+        _collectFee(_editingFee);   
+
+        _contractOfSender(nftContractAddress);
+        
+        GenericNFT nftContract = GenericNFT(nftContractAddress);
+        (string memory oldURI, string memory newURI) = nftContract.changeCID(tokenId, newCidDigest);
+        
+        emit AttributesUpdated(nftContractAddress, tokenId, msg.sender, oldURI, newURI, _editingFee);
     }
 
 
@@ -409,16 +1058,14 @@ contract GenericNFTFactory is Ownable {
     */
     function deleteNFT(address nftContractAddress, uint256 tokenId, uint256 _editingFee) public onlyWhitelist {
 
-        require(_editingFee >= editingFee, "Editing fee is higher, check the fee value");
-        deposit(_editingFee);   
+        _checkFee(_editingFee, feeConfig.editingFee);
+        _collectFee(_editingFee);   
 
-        require(nftContractToUser[nftContractAddress] == msg.sender, "Only the same user who applied for the contract can delete a NFT.");
+        _contractOfSender(nftContractAddress);
 
         GenericNFT nftContract = GenericNFT(nftContractAddress);
-        nftContract.unlock();
         nftContract.destroy(tokenId);
-        nftContract.lock();
-        emit NFTDeleted(tokenId);
+        emit NFTDeleted(nftContractAddress, tokenId, msg.sender, _editingFee);
     }
 
 }
\ No newline at end of file
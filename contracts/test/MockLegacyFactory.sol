@@ -0,0 +1,97 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.12;
+
+import "../GenericNFT.sol";
+import "@openzeppelin/contracts/token/ERC20/IERC20.sol";
+import "@openzeppelin/contracts/access/Ownable.sol";
+
+/**
+Registry of version 1 of the GenericNFTFactory contract, with its original ABI.
+It emits no admission events and has no getter listing the admitted contracts,
+it is used to test the migration of its contracts to the current factory
+ */
+
+contract MockLegacyFactory is Ownable {
+
+    IERC20 public depositToken;
+    uint256 public admissionFee;
+    address[] private whitelist;
+
+    // Associates each NFT contrac address to its user
+    mapping(address => address) private nftContractToUser;
+    // Associate the user address to the amount of registered contracts
+    mapping(address => uint256) private contractNumberOfUsers;
+
+    event Deposit(address indexed _from,
+                address indexed _to,
+                uint256 _value);
+
+
+    constructor(uint256 _admissionFee, address _depositToken) {
+        admissionFee = _admissionFee;
+        depositToken = IERC20(_depositToken);
+    }
+
+    function _admitToWhitelist(address nftContractAddressOwner, address nftContractAddress) internal {
+        nftContractToUser[nftContractAddress] = nftContractAddressOwner;
+        contractNumberOfUsers[nftContractAddressOwner] += 1;
+
+        bool alreadyInWhitelist = checkWhitelistAdmission();
+        if(!alreadyInWhitelist){
+            whitelist.push(nftContractAddressOwner);
+        }
+    }
+
+    function admitToWhitelist(address nftContractAddressOwner, address nftContractAddress) public onlyOwner {
+        _admitToWhitelist(nftContractAddressOwner, nftContractAddress);
+    }
+
+    function applyToWhitelist(address nftContractAddress, uint256 _admissionFee) public payable {
+
+        deposit(_admissionFee);
+        address nftContractAddressOwner = msg.sender;
+        _admitToWhitelist(nftContractAddressOwner, nftContractAddress);
+    }
+
+    function checkWhitelistAdmission() public returns (bool) {
+        bool isInWhitelist = false;
+        for(uint256 index=0; index < whitelist.length; index++) {
+            if(whitelist[index] == msg.sender){
+                isInWhitelist = true;
+            }
+        }
+        return isInWhitelist;
+    }
+
+    function claimOwnership(address nftContractAddress) public {
+
+        require(contractNumberOfUsers[msg.sender] > 0, "The user has not applied for any contract.");
+        require(nftContractToUser[nftContractAddress] == msg.sender, "Only the same user who applied for the contract can claim the ownership.");
+
+        GenericNFT targetNFTContract = GenericNFT(nftContractAddress);
+        targetNFTContract.transferOwnership(msg.sender);
+
+        contractNumberOfUsers[msg.sender] -= 1;
+        delete nftContractToUser[nftContractAddress];
+    }
+
+    function getUserOfContract(address contractAddress) public onlyOwner returns (address) {
+        return nftContractToUser[contractAddress];
+    }
+
+    function getContractsOfUser(address userAddress) public onlyOwner returns (uint256) {
+        return contractNumberOfUsers[userAddress];
+    }
+
+    function deposit(uint256 amount) public {
+        require(amount > 0, "Amount must be more than 0");
+
+        uint256 allowance = depositToken.allowance(msg.sender, address(this));
+        require(allowance >= amount, "Check the token allowance");
+
+        bool deposited = depositToken.transferFrom(msg.sender, address(this), amount);
+        require(deposited);
+
+        emit Deposit(msg.sender, address(this), amount);
+    }
+}
@@ -0,0 +1,28 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.12;
+
+/**
+* Local stand-in for Multicall3 (0xcA11bde05977b3631167028862bE2a173976CA11),
+* exposing the same aggregate3 interface restricted to read-only calls
+*/
+contract MockMulticall3 {
+    struct Call3 {
+        address target;
+        bool allowFailure;
+        bytes callData;
+    }
+
+    struct Result {
+        bool success;
+        bytes returnData;
+    }
+
+    function aggregate3(Call3[] memory calls) public view returns (Result[] memory returnData) {
+        returnData = new Result[](calls.length);
+        for(uint256 index=0; index < calls.length; index++) {
+            (bool success, bytes memory result) = calls[index].target.staticcall(calls[index].callData);
+            require(success || calls[index].allowFailure, "Multicall3: call failed");
+            returnData[index] = Result(success, result);
+        }
+    }
+}
@@ -3,35 +3,10 @@
 pragma solidity ^0.8.12;
 
 import "../GenericNFT.sol";
-import "@openzeppelin/contracts/token/ERC721/ERC721.sol";
-import "@openzeppelin/contracts/token/ERC721/extensions/ERC721URIStorage.sol";
-import "@openzeppelin/contracts/utils/Counters.sol";
-import "@openzeppelin/contracts/access/Ownable.sol";
 
 contract MockNFT is GenericNFT {
-    using Counters for Counters.Counter;
-    Counters.Counter private _tokenIds;
 
     constructor(string memory name, string memory symbol)
         GenericNFT(name, symbol) {
     }
-
-   function mintNFT(address recipient, string memory tokenURI)
-       public 
-       payable
-       override
-       onlyOwner
-       returns (uint256)
-   {
-        // unlock();
-       _tokenIds.increment();
-
-       uint256 newItemId = _tokenIds.current();
-       _mint(recipient, newItemId);
-       _setTokenURI(newItemId, tokenURI);
-
-    //    lock();
-
-       return newItemId;
-   }
-}
\ No newline at end of file
+}
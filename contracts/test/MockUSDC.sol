@@ -2,9 +2,10 @@
 pragma solidity ^0.8.12;
 
 import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
+import "@openzeppelin/contracts/token/ERC20/extensions/draft-ERC20Permit.sol";
 
-contract MockUSDC is ERC20 {
-    constructor() public ERC20("Mock USDC", "USDC"){
+contract MockUSDC is ERC20, ERC20Permit {
+    constructor() public ERC20("Mock USDC", "USDC") ERC20Permit("Mock USDC"){
         _mint(msg.sender, 10000000000000000000000); // 10k USDT
     }
-}
\ No newline at end of file
+}
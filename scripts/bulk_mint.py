@@ -0,0 +1,275 @@
+from brownie import GenericNFTFactory, web3
+from eth_account import Account
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+import asyncio
+import csv
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+# Gas price increase applied when a transaction is resent with the same nonce.
+# Nodes require at least 10% to replace a pending transaction
+GAS_PRICE_BUMP = 1.125
+# Margin applied to the estimated gas of each mint
+GAS_MARGIN = 1.2
+
+
+@dataclass
+class MintJob:
+    recipient: str
+    token_uri: str
+
+
+@dataclass
+class MintResult:
+    job: MintJob
+    nonce: int
+    tx_hash: Optional[str] = None
+    token_id: Optional[int] = None
+    submitted_at: Optional[float] = None
+    confirmed_at: Optional[float] = None
+    attempts: int = 0
+    error: Optional[str] = None
+
+    @property
+    def latency(self):
+        """
+        Seconds between the first submission and the confirmation
+        """
+        if self.confirmed_at is None:
+            return None
+        return self.confirmed_at - self.submitted_at
+
+
+class BulkMinter:
+    """
+    Mints through mintNFTFromAddress keeping several transactions in flight.
+    Nonces are assigned locally and transactions are signed with the private key of
+    the whitelisted user, so no transaction waits for the receipt of the previous one.
+    The fees must be covered beforehand, with credits or with an allowance for the whole run
+    """
+    def __init__(self, factory_address, nft_contract_address, private_key, max_in_flight=16,
+                 fee=None, gas_price=None, confirmation_timeout=120, resend_after=30,
+                 max_attempts=4, poll_interval=0.05):
+        """
+        factory_address -> The address of the factory
+        nft_contract_address -> The NFT contract the user applied for
+        private_key -> The private key of the whitelisted user
+        max_in_flight -> The number of transactions sent and not yet confirmed
+        fee -> The minting fee paid for each token, read from the factory when not provided
+        gas_price -> The initial gas price, read from the node when not provided
+        confirmation_timeout -> Seconds after the first submission after which a job is given up
+        resend_after -> Seconds without receipt after which the transaction is replaced with a higher gas price
+        max_attempts -> The number of times a transaction can be sent for each job
+        poll_interval -> Seconds between two receipt checks
+        """
+        self.account = Account.from_key(private_key)
+        self.factory_address = Web3.toChecksumAddress(str(factory_address))
+        self.nft_contract_address = Web3.toChecksumAddress(str(nft_contract_address))
+        self.contract = web3.eth.contract(address=self.factory_address, abi=GenericNFTFactory.abi)
+        self.max_in_flight = max_in_flight
+        self.fee = fee
+        self.gas_price = gas_price
+        self.confirmation_timeout = confirmation_timeout
+        self.resend_after = resend_after
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._next_nonce = None
+        self._nonce_lock = None
+
+    async def mint_all(self, jobs):
+        """
+        Mints a token for every (recipient, tokenURI) job.
+        Returns the results in the same order as the jobs
+        """
+        loop = asyncio.get_running_loop()
+        if self.fee is None:
+            self.fee = await loop.run_in_executor(None, self.contract.functions.fee().call)
+        if self.gas_price is None:
+            self.gas_price = await loop.run_in_executor(None, lambda: web3.eth.gas_price)
+        self._next_nonce = await loop.run_in_executor(
+            None, web3.eth.get_transaction_count, self.account.address, "pending")
+        self._nonce_lock = asyncio.Lock()
+
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+
+        async def run(job):
+            async with in_flight:
+                return await self._mint(MintJob(*job) if not isinstance(job, MintJob) else job)
+
+        return await asyncio.gather(*(run(job) for job in jobs))
+
+    async def _mint(self, job):
+        async with self._nonce_lock:
+            result = MintResult(job, self._next_nonce)
+            self._next_nonce += 1
+
+        gas_price = self.gas_price
+        try:
+            return await self._mint_with_nonce(job, result, gas_price)
+        except Exception as error:
+            # Any other RPC failure only fails this job, the gather of the other ones goes on
+            result.error = result.error or f"{type(error).__name__}: {error}"
+            await self._fill_nonce(result.nonce, gas_price)
+            return result
+
+    async def _mint_with_nonce(self, job, result, gas_price):
+        sent = []
+        deadline = None
+        while result.token_id is None:
+            if result.attempts >= self.max_attempts or (deadline and time.monotonic() > deadline):
+                result.error = result.error or "not confirmed"
+                await self._fill_nonce(result.nonce, gas_price)
+                return result
+
+            try:
+                tx_hash = await self._send(job, result.nonce, gas_price)
+            except ValueError as error:
+                message = str(error).lower()
+                if "underpriced" in message:
+                    result.attempts += 1
+                    gas_price = int(gas_price * GAS_PRICE_BUMP)
+                    continue
+                if ("nonce too low" in message or "already known" in message) and sent:
+                    # A previous attempt was mined or is still pending in the meantime
+                    tx_hash = sent[-1]
+                else:
+                    result.error = str(error)
+                    await self._fill_nonce(result.nonce, gas_price)
+                    return result
+
+            result.attempts += 1
+            if tx_hash not in sent:
+                sent.append(tx_hash)
+            if result.submitted_at is None:
+                result.submitted_at = time.monotonic()
+                deadline = result.submitted_at + self.confirmation_timeout
+
+            receipt = await self._wait_for_receipt(sent, deadline)
+            if receipt is None:
+                # Dropped or stuck, replace it with the same nonce and a higher gas price
+                gas_price = int(gas_price * GAS_PRICE_BUMP)
+                continue
+
+            result.confirmed_at = time.monotonic()
+            result.tx_hash = receipt["transactionHash"].hex()
+            if receipt["status"] != 1:
+                result.error = "reverted"
+                return result
+            result.token_id = self._token_id(receipt)
+        return result
+
+    async def _send(self, job, nonce, gas_price):
+        loop = asyncio.get_running_loop()
+        function = self.contract.functions.mintNFTFromAddress(
+            Web3.toChecksumAddress(str(job.recipient)), self.nft_contract_address, job.token_uri, self.fee)
+        params = {"from": self.account.address, "nonce": nonce, "gasPrice": gas_price}
+
+        def build_and_send():
+            params["gas"] = int(function.estimateGas(params) * GAS_MARGIN)
+            transaction = function.buildTransaction(params)
+            signed = self.account.sign_transaction(transaction)
+            return web3.eth.send_raw_transaction(signed.rawTransaction).hex()
+
+        return await loop.run_in_executor(None, build_and_send)
+
+    async def _wait_for_receipt(self, tx_hashes, deadline):
+        """
+        Polls the receipts of every transaction sent for a nonce, since any of them can be mined.
+        Returns None when none of them is mined after resend_after seconds or at the deadline
+        """
+        loop = asyncio.get_running_loop()
+        give_up = min(time.monotonic() + self.resend_after, deadline)
+        while True:
+            for tx_hash in tx_hashes:
+                try:
+                    return await loop.run_in_executor(None, web3.eth.get_transaction_receipt, tx_hash)
+                except TransactionNotFound:
+                    pass
+                except (OSError, ValueError):
+                    # A transient RPC failure, the receipt is checked again on the next poll
+                    pass
+
+            if time.monotonic() > give_up:
+                return None
+            await asyncio.sleep(self.poll_interval)
+
+    async def _fill_nonce(self, nonce, gas_price):
+        """
+        Sends an empty transaction with the nonce of a failed job so that
+        the transactions with the following nonces are not stuck behind it
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            chain_id = await loop.run_in_executor(None, lambda: web3.eth.chain_id)
+            transaction = {
+                "to": self.account.address,
+                "value": 0,
+                "gas": 21000,
+                "gasPrice": int(gas_price * GAS_PRICE_BUMP),
+                "nonce": nonce,
+                "chainId": chain_id,
+            }
+            signed = self.account.sign_transaction(transaction)
+            await loop.run_in_executor(None, web3.eth.send_raw_transaction, signed.rawTransaction)
+        except (OSError, ValueError):
+            # The nonce has already been used, or the node cannot be reached
+            pass
+
+    def _token_id(self, receipt):
+        for event in self.contract.events.NFTCreated().processReceipt(receipt):
+            if event["address"] == self.factory_address:
+                return event["args"]["tokenId"]
+        return None
+
+
+def percentile(values, fraction):
+    """
+    Returns the value below which the given fraction of the sorted values falls
+    """
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(results, elapsed):
+    """
+    Returns the mints per second and the p50 / p99 confirmation latency of a run
+    """
+    latencies = [result.latency for result in results if result.token_id is not None]
+    return {
+        "minted": len(latencies),
+        "failed": len(results) - len(latencies),
+        "mints_per_second": len(latencies) / elapsed if elapsed else 0,
+        "p50_latency": percentile(latencies, 0.5) if latencies else None,
+        "p99_latency": percentile(latencies, 0.99) if latencies else None,
+    }
+
+
+def run(minter, jobs):
+    """
+    Runs the minter on the jobs and returns the results together with the summary of the run
+    """
+    started = time.monotonic()
+    results = asyncio.run(minter.mint_all(jobs))
+    return results, summarize(results, time.monotonic() - started)
+
+
+def main(nft_contract_address, jobs_path, max_in_flight=16):
+    """
+    Mints the (recipient, tokenURI) rows of a CSV file with the latest deployed factory.
+    The private key of the whitelisted user is read from the PRIVATE_KEY environment variable
+    """
+    with open(jobs_path, newline="") as jobs_file:
+        jobs = [MintJob(row[0], row[1]) for row in csv.reader(jobs_file) if row]
+
+    minter = BulkMinter(GenericNFTFactory[-1], nft_contract_address, os.environ["PRIVATE_KEY"],
+                        max_in_flight=int(max_in_flight))
+    results, summary = run(minter, jobs)
+    for result in results:
+        if result.error:
+            print(f"{result.job.recipient} {result.job.token_uri}: {result.error}")
+    print(summary)
@@ -0,0 +1,55 @@
+from brownie import GenericNFT, GenericNFTFactory, web3
+from scripts.helpful_scripts import get_account
+
+import json
+
+# EIP-170 limit of the runtime bytecode
+MAX_RUNTIME_SIZE = 24576
+
+
+def measure(contract_type, *args, account=None):
+    """
+    Deploys the contract and returns its deployment gas, init code size and runtime bytecode size
+    """
+    account = account or get_account()
+    contract = contract_type.deploy(*args, {"from": account})
+    return {
+        "deployment_gas": contract.tx.gas_used,
+        "initcode_size": len(bytes.fromhex(contract_type.bytecode)),
+        "runtime_size": len(web3.eth.get_code(contract.address)),
+    }
+
+
+def deployment_report(account=None):
+    """
+    Measures the factory and the NFT contract as compiled in the current tree
+    """
+    account = account or get_account()
+    return {
+        "GenericNFTFactory": measure(GenericNFTFactory, 1, 1, 1, account.address, account=account),
+        "GenericNFT": measure(GenericNFT, "GenericNFT", "GNFT", account=account),
+    }
+
+
+def main(output_path=None, baseline_path=None):
+    """
+    Prints the deployment report on the local chain. The report is written to output_path
+    when given, and compared with the report of another revision stored in baseline_path
+    """
+    report = deployment_report()
+    baseline = {}
+    if baseline_path is not None:
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    for name, measures in report.items():
+        for measure_name, value in measures.items():
+            before = baseline.get(name, {}).get(measure_name)
+            change = "" if before is None else f" (before {before}, {value - before:+d})"
+            print(f"{name} {measure_name}: {value}{change}")
+        if measures["runtime_size"] > MAX_RUNTIME_SIZE:
+            print(f"{name} exceeds the runtime size limit of {MAX_RUNTIME_SIZE} bytes")
+
+    if output_path is not None:
+        with open(output_path, "w") as output_file:
+            json.dump(report, output_file, indent=2)
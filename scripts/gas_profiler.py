@@ -0,0 +1,202 @@
+from brownie import chain
+
+import json
+
+TRANSACTION = "<transaction>"
+# Gas not spent by any opcode: the intrinsic cost of the transaction minus the refunds
+OVERHEAD = "<intrinsic gas and refunds>"
+
+
+class ProfileNode:
+    """
+    Gas attributed to a function for a given call stack.
+    Calls to the same function from the same stack are merged, as in a flame graph
+    """
+    def __init__(self, name, kind, address=None):
+        """
+        name -> The source-level function, e.g. GenericNFT.mintNFT
+        kind -> "call" for external calls, "internal" for internal calls
+        address -> The called contract, for external calls
+        """
+        self.name = name
+        self.kind = kind
+        self.address = address
+        self.self_gas = 0
+        self.calls = 0
+        self.children = {}
+
+    @property
+    def gas(self):
+        """
+        The gas used by the function including the functions it calls
+        """
+        return self.self_gas + sum(child.gas for child in self.children.values())
+
+    def child(self, name, kind, address=None):
+        key = (name, kind, address)
+        if key not in self.children:
+            self.children[key] = ProfileNode(name, kind, address)
+        return self.children[key]
+
+    def find(self, name):
+        """
+        Returns every node of the tree with the given name
+        """
+        found = [self] if self.name == name else []
+        for child in self.children.values():
+            found.extend(child.find(name))
+        return found
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "address": self.address,
+            "gas": self.gas,
+            "selfGas": self.self_gas,
+            "calls": self.calls,
+            "children": [child.to_dict() for child in self.sorted_children()],
+        }
+
+    def sorted_children(self):
+        return sorted(self.children.values(), key=lambda child: child.gas, reverse=True)
+
+
+def _step_cost(trace, index):
+    """
+    Returns the gas charged to a step of the trace. The gas forwarded by a call
+    is left out, since it is charged to the steps of the called contract
+    """
+    step = trace[index]
+    following = trace[index + 1] if index + 1 < len(trace) else None
+    if following is None or following["depth"] < step["depth"]:
+        return step["gasCost"]
+    if following["depth"] == step["depth"]:
+        return step["gas"] - following["gas"]
+
+    end = next(
+        (position for position in range(index + 1, len(trace)) if trace[position]["depth"] <= step["depth"]),
+        None)
+    if end is None:
+        return step["gasCost"]
+    last = trace[end - 1]
+    callee_used = following["gas"] - (last["gas"] - last["gasCost"])
+    return step["gas"] - trace[end]["gas"] - callee_used
+
+
+def profile_trace(trace, gas_used):
+    """
+    Builds the profile of an expanded brownie trace, where every step reports
+    the source-level function (fn), the external call depth (depth) and
+    the internal call depth (jumpDepth) it belongs to
+    trace -> The steps of the trace
+    gas_used -> The gas used by the transaction
+    """
+    root = ProfileNode(TRANSACTION, "transaction")
+    root.calls = 1
+    # Open frames as (depth, jumpDepth, fn, node)
+    stack = []
+
+    for index, step in enumerate(trace):
+        position = (step["depth"], step["jumpDepth"])
+        fn = step.get("fn") or f"{step.get('contractName') or step['address']}.<unknown>"
+
+        while stack and stack[-1][:2] > position:
+            stack.pop()
+        # A different function at the same depth, e.g. after an inlined modifier
+        if stack and stack[-1][:2] == position and stack[-1][2] != fn:
+            stack.pop()
+
+        if not stack or stack[-1][:2] != position:
+            if not stack or stack[-1][0] != step["depth"]:
+                node = (stack[-1][3] if stack else root).child(fn, "call", step["address"])
+            else:
+                node = stack[-1][3].child(fn, "internal")
+            node.calls += 1
+            stack.append(position + (fn, node))
+
+        stack[-1][3].self_gas += _step_cost(trace, index)
+
+    overhead = root.child(OVERHEAD, "transaction")
+    overhead.calls = 1
+    overhead.self_gas = gas_used - root.gas
+    return root
+
+
+def profile_transaction(tx):
+    """
+    Replays a transaction of the connected chain with debug_traceTransaction
+    and returns its profile. The node must support call tracing, as the local dev chain does
+    tx -> The TransactionReceipt or the hash of the transaction
+    """
+    if isinstance(tx, str):
+        tx = chain.get_transaction(tx)
+    return profile_trace(tx.trace, tx.gas_used)
+
+
+def render_text(root, min_share=0.0):
+    """
+    Renders the profile as an indented tree with the inclusive gas, its share of
+    the transaction, the gas spent in the function itself and the number of calls.
+    Nodes below min_share of the transaction gas are omitted
+    """
+    total = root.gas or 1
+    lines = [f"{'share':>7} {'gas':>9} {'self':>9} {'calls':>5}  function"]
+
+    def render(node, indent):
+        if node is not root and node.gas < total * min_share:
+            return
+        name = node.name if node.kind != "call" else f"{node.name} @ {node.address}"
+        lines.append(
+            f"{node.gas / total:7.1%} {node.gas:>9} {node.self_gas:>9} {node.calls:>5}  {'  ' * indent}{name}")
+        for child in node.sorted_children():
+            render(child, indent + 1)
+
+    render(root, 0)
+    return "\n".join(lines)
+
+
+def render_folded(root):
+    """
+    Renders the profile as folded stacks, one "caller;callee gas" line for each stack,
+    the input format of flamegraph.pl and speedscope
+    """
+    lines = []
+
+    def render(node, path):
+        path = path + [node.name]
+        if node.self_gas > 0:
+            lines.append(f"{';'.join(path)} {node.self_gas}")
+        for child in node.children.values():
+            render(child, path)
+
+    render(root, [])
+    return "\n".join(lines)
+
+
+def save_profile(root, path):
+    """
+    Writes the profile to path as JSON (.json), folded stacks (.folded) or text tree (any other extension)
+    """
+    path = str(path)
+    if path.endswith(".json"):
+        content = json.dumps(root.to_dict(), indent=2)
+    elif path.endswith(".folded"):
+        content = render_folded(root)
+    else:
+        content = render_text(root)
+    with open(path, "w") as output_file:
+        output_file.write(content + "\n")
+
+
+def main(tx_hash, output_path=None, min_share=0.0):
+    """
+    Profiles a transaction of the local dev chain and prints the text tree,
+    or writes the profile to output_path in the format given by its extension
+    """
+    root = profile_transaction(tx_hash)
+    if output_path is None:
+        print(render_text(root, float(min_share)))
+    else:
+        save_profile(root, output_path)
+        print(f"Profile of {tx_hash} written to {output_path}")
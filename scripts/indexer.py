@@ -0,0 +1,413 @@
+from brownie import GenericNFTFactory, web3
+from web3 import Web3
+
+import sqlite3
+
+# Blocks requested to the node with each eth_getLogs call
+DEFAULT_BATCH_SIZE = 2000
+# Blocks behind the head that are not indexed yet, since they can still be reorganized
+DEFAULT_CONFIRMATIONS = 64
+
+INDEXED_EVENTS = [
+    "Deposit",
+    "CreditUsed",
+    "CreditWithdrawn",
+    "NFTCreated",
+    "NFTDeleted",
+    "AttributesUpdated",
+    "FeeChanged",
+    "TokenChanged",
+    "ContractAdmitted",
+    "ContractReleased",
+    "AddedToWhitelist",
+    "RemovedFromWhitelist",
+    "CollectionCreated",
+    "VoucherRedeemed",
+    "VoucherCancelled",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    factory TEXT PRIMARY KEY,
+    last_block INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contracts (
+    collection TEXT PRIMARY KEY,
+    user TEXT NOT NULL,
+    flags INTEGER NOT NULL,
+    admitted_block INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contracts_user ON contracts (user);
+CREATE TABLE IF NOT EXISTS whitelist (
+    user TEXT PRIMARY KEY,
+    added_block INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deposits (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    sender TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS deposits_timestamp ON deposits (timestamp);
+CREATE TABLE IF NOT EXISTS credit_uses (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    sender TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS credit_withdrawals (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    recipient TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS admissions (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    collection TEXT NOT NULL,
+    user TEXT NOT NULL,
+    fee TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS mints (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    collection TEXT NOT NULL,
+    token_id TEXT NOT NULL,
+    caller TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    fee TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS mints_collection_timestamp ON mints (collection, timestamp);
+CREATE TABLE IF NOT EXISTS deletions (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    collection TEXT NOT NULL,
+    token_id TEXT NOT NULL,
+    caller TEXT NOT NULL,
+    fee TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS attribute_updates (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    collection TEXT NOT NULL,
+    token_id TEXT NOT NULL,
+    caller TEXT NOT NULL,
+    old_uri TEXT NOT NULL,
+    new_uri TEXT NOT NULL,
+    fee TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS collections_created (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    owner TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS voucher_redemptions (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    signer TEXT NOT NULL,
+    nonce TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    token_id TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS voucher_redemptions_signer ON voucher_redemptions (signer, nonce);
+CREATE TABLE IF NOT EXISTS voucher_cancellations (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    signer TEXT NOT NULL,
+    nonce TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS voucher_cancellations_signer ON voucher_cancellations (signer, nonce);
+CREATE TABLE IF NOT EXISTS fee_changes (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    old_value TEXT NOT NULL,
+    new_value TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS token_changes (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    old_token TEXT NOT NULL,
+    new_token TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+"""
+
+
+def event_topic(event_abi):
+    """
+    Returns the topic identifying the given event ABI entry
+    """
+    types = ",".join(argument["type"] for argument in event_abi["inputs"])
+    return Web3.keccak(text=f"{event_abi['name']}({types})").hex()
+
+
+class FactoryIndexer:
+    """
+    Streams the logs of a GenericNFTFactory into a SQLite database.
+    Amounts and token ids are stored as decimal strings since they do not fit SQLite integers.
+    Every row is built from the factory logs alone, with a single eth_getLogs call per batch.
+    Only blocks with enough confirmations are indexed, so that the rows are never reorganized
+    """
+    def __init__(self, factory_address, database=":memory:", batch_size=DEFAULT_BATCH_SIZE,
+                 confirmations=DEFAULT_CONFIRMATIONS):
+        """
+        factory_address -> The address of the factory to be indexed
+        database -> The path of the SQLite database, created if missing
+        batch_size -> The number of blocks requested with each eth_getLogs call
+        confirmations -> The number of blocks behind the head that are left to the next sync
+        """
+        self.factory_address = Web3.toChecksumAddress(str(factory_address))
+        self.batch_size = batch_size
+        self.confirmations = confirmations
+        self.contract = web3.eth.contract(address=self.factory_address, abi=GenericNFTFactory.abi)
+        self.events = {
+            event_topic(entry): entry["name"]
+            for entry in GenericNFTFactory.abi
+            if entry["type"] == "event" and entry["name"] in INDEXED_EVENTS
+        }
+        self.connection = sqlite3.connect(database)
+        self.connection.executescript(SCHEMA)
+        self._timestamps = {}
+
+    def close(self):
+        self.connection.close()
+
+    @property
+    def last_block(self):
+        """
+        The last block already indexed, or None when nothing was indexed yet
+        """
+        row = self.connection.execute(
+            "SELECT last_block FROM checkpoints WHERE factory = ?", (self.factory_address,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def sync(self, from_block=0, to_block=None):
+        """
+        Indexes the logs from the checkpoint, or from from_block when nothing was indexed yet,
+        up to to_block or the latest confirmed block, whichever comes first. Each batch is
+        committed together with its checkpoint, so an interrupted sync resumes from the last
+        committed batch. Returns the number of indexed factory logs
+        """
+        confirmed_block = web3.eth.block_number - self.confirmations
+        to_block = confirmed_block if to_block is None else min(to_block, confirmed_block)
+        if self.last_block is not None:
+            from_block = self.last_block + 1
+
+        indexed = 0
+        for start in range(from_block, to_block + 1, self.batch_size):
+            end = min(start + self.batch_size - 1, to_block)
+            with self.connection:
+                indexed += self._index_range(start, end)
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO checkpoints (factory, last_block) VALUES (?, ?)",
+                    (self.factory_address, end),
+                )
+        return indexed
+
+    def _index_range(self, from_block, to_block):
+        logs = web3.eth.get_logs({
+            "address": self.factory_address,
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [list(self.events)],
+        })
+
+        for log in logs:
+            name = self.events[log["topics"][0].hex()]
+            args = self.contract.events[name]().processLog(log)["args"]
+            row = (
+                log["transactionHash"].hex(),
+                log["logIndex"],
+                log["blockNumber"],
+                self._timestamp(log["blockNumber"]),
+            )
+
+            if name == "Deposit":
+                self._insert("deposits", row + (args["_from"], str(args["_value"])))
+            elif name == "CreditUsed":
+                self._insert("credit_uses", row + (args["_from"], str(args["_value"])))
+            elif name == "CreditWithdrawn":
+                self._insert("credit_withdrawals", row + (args["_to"], str(args["_value"])))
+            elif name == "AddedToWhitelist":
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO whitelist (user, added_block) VALUES (?, ?)",
+                    (args["user"], log["blockNumber"]),
+                )
+            elif name == "RemovedFromWhitelist":
+                self.connection.execute("DELETE FROM whitelist WHERE user = ?", (args["user"],))
+            elif name == "CollectionCreated":
+                self._insert("collections_created", row + (args["_owner"], args["_collection"]))
+            elif name == "VoucherRedeemed":
+                self._insert("voucher_redemptions", row + (
+                    args["signer"], str(args["nonce"]), args["nftContractAddress"], str(args["tokenId"])))
+            elif name == "VoucherCancelled":
+                self._insert("voucher_cancellations", row + (args["signer"], str(args["nonce"])))
+            elif name == "ContractAdmitted":
+                self._insert("admissions", row + (args["nftContractAddress"], args["user"], str(args["fee"])))
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO contracts (collection, user, flags, admitted_block)"
+                    " VALUES (?, ?, ?, ?)",
+                    (args["nftContractAddress"], args["user"], args["flags"], log["blockNumber"]),
+                )
+            elif name == "ContractReleased":
+                self.connection.execute(
+                    "DELETE FROM contracts WHERE collection = ?", (args["nftContractAddress"],))
+            elif name == "NFTCreated":
+                self._insert("mints", row + (
+                    args["nftContractAddress"], str(args["tokenId"]), args["caller"],
+                    args["recipient"], str(args["fee"])))
+            elif name == "NFTDeleted":
+                self._insert("deletions", row + (
+                    args["nftContractAddress"], str(args["tokenId"]), args["caller"], str(args["fee"])))
+            elif name == "AttributesUpdated":
+                self._insert("attribute_updates", row + (
+                    args["nftContractAddress"], str(args["tokenId"]), args["caller"],
+                    args["oldURI"], args["newURI"], str(args["fee"])))
+            elif name == "FeeChanged":
+                self._insert("fee_changes", row + (str(args["oldValue"]), str(args["newValue"])))
+            elif name == "TokenChanged":
+                self._insert("token_changes", row + (args["oldToken"], args["newToken"]))
+        return len(logs)
+
+    def _insert(self, table, values):
+        placeholders = ", ".join("?" * len(values))
+        self.connection.execute(f"INSERT OR IGNORE INTO {table} VALUES ({placeholders})", values)
+
+    def _timestamp(self, block_number):
+        if block_number not in self._timestamps:
+            self._timestamps[block_number] = web3.eth.get_block(block_number)["timestamp"]
+        return self._timestamps[block_number]
+
+    def contracts_of_user(self, user):
+        """
+        Returns the NFT contracts operated by the user through the factory
+        """
+        rows = self.connection.execute(
+            "SELECT collection FROM contracts WHERE user = ? ORDER BY admitted_block, collection",
+            (Web3.toChecksumAddress(str(user)),),
+        )
+        return [row[0] for row in rows]
+
+    def user_of_contract(self, collection):
+        """
+        Returns the user operating the NFT contract, or None when unknown
+        """
+        row = self.connection.execute(
+            "SELECT user FROM contracts WHERE collection = ?",
+            (Web3.toChecksumAddress(str(collection)),),
+        ).fetchone()
+        return row[0] if row else None
+
+    def whitelist(self):
+        """
+        Returns the users in the whitelist, in the order they were added
+        """
+        rows = self.connection.execute("SELECT user FROM whitelist ORDER BY added_block, user")
+        return [row[0] for row in rows]
+
+    def is_whitelisted(self, user):
+        row = self.connection.execute(
+            "SELECT 1 FROM whitelist WHERE user = ?", (Web3.toChecksumAddress(str(user)),)).fetchone()
+        return row is not None
+
+    def collections_created(self, owner):
+        """
+        Returns the collections created through the factory by the owner
+        """
+        rows = self.connection.execute(
+            "SELECT collection FROM collections_created WHERE owner = ? ORDER BY block_number, log_index",
+            (Web3.toChecksumAddress(str(owner)),),
+        )
+        return [row[0] for row in rows]
+
+    def is_voucher_nonce_used(self, signer, nonce):
+        """
+        Returns whether the voucher nonce of the signer was redeemed or cancelled
+        """
+        parameters = (Web3.toChecksumAddress(str(signer)), str(nonce))
+        for table in ("voucher_redemptions", "voucher_cancellations"):
+            row = self.connection.execute(
+                f"SELECT 1 FROM {table} WHERE signer = ? AND nonce = ?", parameters).fetchone()
+            if row is not None:
+                return True
+        return False
+
+    def mints_per_day(self, collection=None):
+        """
+        Returns (collection, day, mints) rows, with day formatted as YYYY-MM-DD in UTC.
+        Only the given collection is returned when provided
+        """
+        query = (
+            "SELECT collection, date(timestamp, 'unixepoch') AS day, COUNT(*) FROM mints"
+            " {} GROUP BY collection, day ORDER BY collection, day"
+        )
+        if collection is None:
+            return self.connection.execute(query.format("")).fetchall()
+        return self.connection.execute(
+            query.format("WHERE collection = ?"), (Web3.toChecksumAddress(str(collection)),)
+        ).fetchall()
+
+    def fees_collected(self, since=None, until=None):
+        """
+        Returns the total fees paid for admissions, mints, edits and deletions, whether
+        transferred or taken from credits, optionally limited to since <= timestamp < until.
+        Credits deposited and not spent yet are not fees
+        """
+        conditions = "WHERE timestamp >= ?"
+        parameters = [0 if since is None else since]
+        if until is not None:
+            conditions += " AND timestamp < ?"
+            parameters.append(until)
+
+        total = 0
+        for table in ("admissions", "mints", "attribute_updates", "deletions"):
+            rows = self.connection.execute(f"SELECT fee FROM {table} {conditions}", parameters)
+            total += sum(int(row[0]) for row in rows)
+        return total
+
+
+def main():
+    """
+    Indexes the latest deployed factory into factory_events.db
+    """
+    indexer = FactoryIndexer(GenericNFTFactory[-1], "factory_events.db")
+    indexed = indexer.sync()
+    print(f"Indexed {indexed} logs up to block {indexer.last_block}")
+    indexer.close()
@@ -0,0 +1,203 @@
+from brownie import GenericNFTFactory, web3
+from scripts.helpful_scripts import get_account
+from web3 import Web3
+
+import csv
+import json
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Registry functions of version 1 of the factory, which emits no admission
+# events and has no getter listing the admitted contracts
+LEGACY_FACTORY_ABI = [
+    {
+        "name": "admitToWhitelist", "type": "function", "stateMutability": "nonpayable",
+        "inputs": [{"name": "nftContractAddressOwner", "type": "address"},
+                   {"name": "nftContractAddress", "type": "address"}],
+        "outputs": [],
+    },
+    {
+        "name": "applyToWhitelist", "type": "function", "stateMutability": "payable",
+        "inputs": [{"name": "nftContractAddress", "type": "address"},
+                   {"name": "_admissionFee", "type": "uint256"}],
+        "outputs": [],
+    },
+    {
+        "name": "getUserOfContract", "type": "function", "stateMutability": "nonpayable",
+        "inputs": [{"name": "contractAddress", "type": "address"}],
+        "outputs": [{"name": "", "type": "address"}],
+    },
+]
+
+
+def leaf_hash(owner, nft_contract):
+    """
+    Returns the leaf verified by claimMigration:
+    keccak256(bytes.concat(keccak256(abi.encode(owner, nftContract))))
+    """
+    encoded = b"".join(bytes(12) + bytes.fromhex(Web3.toChecksumAddress(str(address))[2:])
+                       for address in (owner, nft_contract))
+    return Web3.keccak(Web3.keccak(encoded))
+
+
+def hash_pair(left, right):
+    """
+    Hashes two nodes in sorted order, as OpenZeppelin MerkleProof does
+    """
+    return Web3.keccak(min(left, right) + max(left, right))
+
+
+class MigrationTree:
+    """
+    Merkle tree of the (owner, NFT contract) pairs admitted to the factory by claimMigration.
+    A node without sibling is moved to the next level unchanged
+    """
+    def __init__(self, pairs):
+        """
+        pairs -> The (owner, NFT contract) pairs to be migrated
+        """
+        self.pairs = sorted({
+            (Web3.toChecksumAddress(str(owner)), Web3.toChecksumAddress(str(nft_contract)))
+            for owner, nft_contract in pairs
+        })
+        if not self.pairs:
+            raise ValueError("The migration needs at least one contract")
+
+        self.levels = [sorted(leaf_hash(owner, nft_contract) for owner, nft_contract in self.pairs)]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            self.levels.append([
+                hash_pair(level[index], level[index + 1]) if index + 1 < len(level) else level[index]
+                for index in range(0, len(level), 2)
+            ])
+
+    @property
+    def root(self):
+        return self.levels[-1][0]
+
+    def proof(self, owner, nft_contract):
+        """
+        Returns the proof of the pair as a list of 32 bytes values
+        """
+        index = self.levels[0].index(leaf_hash(owner, nft_contract))
+        proof = []
+        for level in self.levels[:-1]:
+            sibling = index + 1 if index % 2 == 0 else index - 1
+            if sibling < len(level):
+                proof.append(level[sibling])
+            index //= 2
+        return proof
+
+    def to_json(self):
+        """
+        Returns the root and the proof of every contract, keyed by contract address
+        """
+        return {
+            "root": self.root.hex(),
+            "claims": {
+                nft_contract: {
+                    "owner": owner,
+                    "proof": [node.hex() for node in self.proof(owner, nft_contract)],
+                }
+                for owner, nft_contract in self.pairs
+            },
+        }
+
+
+def pairs_from_csv(path):
+    """
+    Reads the (owner, NFT contract) pairs from the rows of a CSV file
+    """
+    with open(path, newline="") as pairs_file:
+        return [(row[0], row[1]) for row in csv.reader(pairs_file) if row]
+
+
+def contracts_from_csv(path):
+    """
+    Reads the candidate NFT contracts from the first column of a CSV file,
+    such as the list of contracts that interacted with the old factory exported from an explorer
+    """
+    with open(path, newline="") as contracts_file:
+        return [row[0] for row in csv.reader(contracts_file) if row]
+
+
+def contracts_from_traces(factory, from_block, to_block, batch_size=10000):
+    """
+    Returns the contracts passed to admitToWhitelist and applyToWhitelist between from_block
+    and to_block, including the internal calls made by other contracts, with trace_filter.
+    Returns None when the node does not support trace_filter
+    """
+    candidates = {}
+    for batch_start in range(from_block, to_block + 1, batch_size):
+        batch_end = min(batch_start + batch_size - 1, to_block)
+        try:
+            traces = web3.manager.request_blocking("trace_filter", [{
+                "fromBlock": hex(batch_start),
+                "toBlock": hex(batch_end),
+                "toAddress": [factory.address],
+            }])
+        except ValueError:
+            # Only archive nodes with the trace module answer trace_filter
+            return None
+
+        for trace in traces:
+            action = trace["action"]
+            if trace.get("error") or action.get("callType") != "call":
+                continue
+            try:
+                function, arguments = factory.decode_function_input(action["input"])
+            except ValueError:
+                # Not a registry function
+                continue
+            if function.fn_name in ("admitToWhitelist", "applyToWhitelist"):
+                candidates[Web3.toChecksumAddress(arguments["nftContractAddress"])] = None
+    return list(candidates)
+
+
+def pairs_from_factory(factory_address, account=None, from_block=0, to_block=None, candidates=None):
+    """
+    Rebuilds the (owner, NFT contract) pairs currently admitted to a version 1 factory.
+    The candidate contracts are read with trace_filter from the admitToWhitelist and
+    applyToWhitelist calls made to the factory between from_block and to_block, or taken
+    from candidates when the node has no trace module. Each one is kept with the user
+    returned by getUserOfContract, called by the owner of the factory, so released
+    contracts and candidates that were never admitted are dropped
+    """
+    account = account or get_account()
+    factory = web3.eth.contract(address=Web3.toChecksumAddress(str(factory_address)), abi=LEGACY_FACTORY_ABI)
+    if candidates is None:
+        if to_block is None:
+            to_block = web3.eth.block_number
+        candidates = contracts_from_traces(factory, from_block, to_block)
+        if candidates is None:
+            raise ValueError("The node does not support trace_filter, the candidate contracts must be provided")
+
+    pairs = []
+    for nft_contract in dict.fromkeys(Web3.toChecksumAddress(str(address)) for address in candidates):
+        user = factory.functions.getUserOfContract(nft_contract).call({"from": account.address})
+        if user != ZERO_ADDRESS:
+            pairs.append((user, nft_contract))
+    return pairs
+
+
+def main(source, output_path="migration.json", publish=False, from_block=0, candidates_path=None):
+    """
+    Builds the migration tree from a CSV file or from the address of a version 1 factory,
+    read from from_block, and writes the root and the proofs to output_path.
+    The pairs of a factory are read as its owner, the account of get_account, from the
+    candidate contracts of candidates_path when given, or else from the traces of the node.
+    When publish is set the root is set on the latest deployed factory
+    """
+    if Web3.isAddress(source):
+        candidates = contracts_from_csv(candidates_path) if candidates_path else None
+        pairs = pairs_from_factory(source, from_block=int(from_block), candidates=candidates)
+    else:
+        pairs = pairs_from_csv(source)
+    tree = MigrationTree(pairs)
+
+    with open(output_path, "w") as output_file:
+        json.dump(tree.to_json(), output_file, indent=2)
+    print(f"Migration root {tree.root.hex()} for {len(tree.pairs)} contracts written to {output_path}")
+
+    if publish:
+        GenericNFTFactory[-1].setMigrationRoot(tree.root, {"from": get_account()})
@@ -0,0 +1,269 @@
+from brownie import GenericNFTFactory, accounts
+from web3 import Web3
+
+import base64
+import csv
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# Largest file stored as a single block by `ipfs add`, larger files are chunked
+MAX_BLOCK_SIZE = 262144
+CID_VERSION = 1
+RAW_CODEC = 0x55
+DAG_PB_CODEC = 0x70
+SHA2_256 = 0x12
+METADATA_FILE = "metadata.json"
+
+# Manifest items sent to a worker with each task
+DEFAULT_BATCH_SIZE = 1000
+# Tokens minted with each mintBatchFromAddress transaction
+DEFAULT_CHUNK_SIZE = 50
+
+
+def _varint(value):
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _field(number, value):
+    """
+    Encodes a length-delimited protobuf field
+    """
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def cid_bytes(codec, block):
+    """
+    Returns the binary CIDv1 of a block hashed with sha2-256
+    """
+    return bytes([CID_VERSION, codec, SHA2_256, 32]) + hashlib.sha256(block).digest()
+
+
+def cid_string(cid):
+    """
+    Encodes a binary CID in lowercase base32 with the multibase prefix, e.g. bafy...
+    """
+    return "b" + base64.b32encode(cid).decode().lower().rstrip("=")
+
+
+def cid_digest(cid):
+    """
+    Returns the sha2-256 digest of a base32 CIDv1 built by directory_cid, as stored
+    by mintNFTWithCIDFromAddress with the default compact format of the collections
+    """
+    raw = base64.b32decode(cid[1:].upper() + "=" * (-len(cid[1:]) % 8))
+    if raw[:4] != bytes([CID_VERSION, DAG_PB_CODEC, SHA2_256, 32]):
+        raise ValueError(f"{cid} is not a sha2-256 dag-pb CIDv1")
+    return raw[4:]
+
+
+def directory_cid(name, content):
+    """
+    Returns the CID of a directory holding a single file, as computed by
+    `ipfs add --cid-version 1 --wrap-with-directory` without contacting any node:
+    the file is a raw block and the directory a dag-pb UnixFS node linking to it
+    """
+    if len(content) > MAX_BLOCK_SIZE:
+        raise ValueError(f"{name} is larger than a single block")
+
+    link = (_field(1, cid_bytes(RAW_CODEC, content))
+            + _field(2, name.encode())
+            + _varint(3 << 3) + _varint(len(content)))
+    # Links are encoded before the UnixFS data (Type: Directory)
+    node = _field(2, link) + _field(1, bytes([0x08, 0x01]))
+    return cid_string(cid_bytes(DAG_PB_CODEC, node))
+
+
+def build_metadata(item):
+    """
+    Builds the metadata.json content of a manifest item, every field except the recipient.
+    Keys are sorted and separators compact, so the same item always has the same CID
+    """
+    metadata = {key: value for key, value in item.items() if key != "recipient"}
+    return json.dumps(metadata, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def process_batch(items, output_dir=None):
+    """
+    Builds the metadata of the items and returns their (recipient, tokenURI) jobs.
+    When output_dir is given the files are written to output_dir/<CID>/metadata.json,
+    ready to be pinned as they are
+    """
+    jobs = []
+    for item in items:
+        content = build_metadata(item)
+        cid = directory_cid(METADATA_FILE, content)
+        if output_dir is not None:
+            directory = os.path.join(output_dir, cid)
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, METADATA_FILE), "wb") as metadata_file:
+                metadata_file.write(content)
+        jobs.append((item["recipient"], f"ipfs://{cid}/{METADATA_FILE}"))
+    return jobs
+
+
+def read_manifest(path, skip=0):
+    """
+    Streams the items of a JSON lines manifest, one object with a recipient per line
+    """
+    with open(path) as manifest_file:
+        for line in islice((line for line in manifest_file if line.strip()), skip, None):
+            yield json.loads(line)
+
+
+def _batches(items, size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def completed_jobs(jobs_path):
+    """
+    Returns the number of complete rows of a job file, dropping a row
+    left incomplete by an interrupted run
+    """
+    if not os.path.exists(jobs_path):
+        return 0
+
+    with open(jobs_path, "rb+") as jobs_file:
+        content = jobs_file.read()
+        complete = content.rfind(b"\n") + 1
+        if complete < len(content):
+            jobs_file.truncate(complete)
+    return content[:complete].count(b"\n")
+
+
+def build_jobs(manifest_path, jobs_path, output_dir=None, workers=None,
+               batch_size=DEFAULT_BATCH_SIZE, max_pending=None):
+    """
+    Computes the token URIs of every item of the manifest in a process pool and
+    appends the (recipient, tokenURI) rows to the job file, in the manifest order.
+    Items already in the job file are skipped, so an interrupted run resumes where it stopped.
+    At most max_pending batches are in memory, whatever the size of the manifest.
+    Returns the number of rows added
+    """
+    workers = workers or os.cpu_count()
+    max_pending = max_pending or 2 * workers
+    done = completed_jobs(jobs_path)
+    added = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            open(jobs_path, "a", newline="") as jobs_file:
+        writer = csv.writer(jobs_file)
+        pending = deque()
+
+        def write_oldest():
+            rows = pending.popleft().result()
+            writer.writerows(rows)
+            jobs_file.flush()
+            return len(rows)
+
+        for batch in _batches(read_manifest(manifest_path, skip=done), batch_size):
+            if len(pending) >= max_pending:
+                added += write_oldest()
+            pending.append(executor.submit(process_batch, batch, output_dir))
+        while pending:
+            added += write_oldest()
+    return added
+
+
+def read_jobs(jobs_path, skip=0):
+    """
+    Streams the (recipient, tokenURI) rows of a job file
+    """
+    with open(jobs_path, newline="") as jobs_file:
+        for row in islice(csv.reader(jobs_file), skip, None):
+            if row:
+                yield row[0], row[1]
+
+
+def minted_jobs(progress_path):
+    if not os.path.exists(progress_path):
+        return 0
+    with open(progress_path) as progress_file:
+        return int(progress_file.read().strip() or 0)
+
+
+def _save_progress(progress_path, minted):
+    # Replaced atomically, so that an interruption never loses the progress
+    with open(progress_path + ".tmp", "w") as progress_file:
+        progress_file.write(str(minted))
+    os.replace(progress_path + ".tmp", progress_path)
+
+
+def mint_jobs(factory, nft_contract_address, jobs_path, account, chunk_size=DEFAULT_CHUNK_SIZE,
+              fee=None, progress_path=None):
+    """
+    Mints the rows of a job file with mintBatchFromAddress, chunk_size tokens for each transaction.
+    The number of minted rows is stored in progress_path after every chunk, so an
+    interrupted run resumes from the first chunk that was not minted.
+    The fees must be covered beforehand, with credits or with an allowance for the whole run.
+    Returns the ids of the tokens minted by this run
+    """
+    progress_path = progress_path or jobs_path + ".minted"
+    fee = factory.fee() if fee is None else fee
+    minted = minted_jobs(progress_path)
+    token_ids = []
+
+    for chunk in _batches(read_jobs(jobs_path, skip=minted), chunk_size):
+        recipients = [Web3.toChecksumAddress(recipient) for recipient, _ in chunk]
+        uris = [uri for _, uri in chunk]
+        tx = factory.mintBatchFromAddress(recipients, nft_contract_address, uris, fee * len(chunk), {"from": account})
+        tx.wait(1)
+        token_ids.extend(tx.return_value)
+
+        minted += len(chunk)
+        _save_progress(progress_path, minted)
+    return token_ids
+
+
+def benchmark(item_count=20000, workers=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Computes the URIs of item_count generated items without writing any file.
+    Returns the items per second and the items per second per core
+    """
+    workers = workers or os.cpu_count()
+    items = (
+        {"recipient": "0x" + format(index + 1, "040x"), "name": f"Token #{index}",
+         "image": f"ipfs://bafybeigdyrzt5sfp7udm7hu76uh7y26nf3efuylqabf3oclgtqy55fbzdi/{index}.png",
+         "attributes": [{"trait_type": "Index", "value": index}]}
+        for index in range(item_count)
+    )
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        processed = sum(len(jobs) for jobs in executor.map(process_batch, _batches(items, batch_size)))
+    elapsed = time.perf_counter() - started
+    return {
+        "items": processed,
+        "workers": workers,
+        "items_per_second": processed / elapsed,
+        "items_per_second_per_core": processed / elapsed / workers,
+    }
+
+
+def main(manifest_path, jobs_path, output_dir="metadata", nft_contract_address=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Builds the metadata files and the job file of a manifest and, when an NFT contract
+    is given, mints the jobs with the latest deployed factory.
+    The private key of the whitelisted user is read from the PRIVATE_KEY environment variable
+    """
+    added = build_jobs(manifest_path, jobs_path, output_dir)
+    print(f"{added} jobs added to {jobs_path}, metadata written to {output_dir}")
+
+    if nft_contract_address is not None:
+        account = accounts.add(os.environ["PRIVATE_KEY"])
+        token_ids = mint_jobs(GenericNFTFactory[-1], nft_contract_address, jobs_path, account, int(chunk_size))
+        print(f"{len(token_ids)} tokens minted")
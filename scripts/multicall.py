@@ -0,0 +1,99 @@
+from brownie import Contract
+from hexbytes import HexBytes
+
+# Multicall3 is deployed at the same address on Polygon, Mumbai and most other networks
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+# Calls sent with each eth_call, to stay below the limits of the nodes
+DEFAULT_MAX_CALLS = 500
+
+MULTICALL3_ABI = [{
+    "name": "aggregate3",
+    "type": "function",
+    "stateMutability": "view",
+    "inputs": [{
+        "name": "calls",
+        "type": "tuple[]",
+        "components": [
+            {"name": "target", "type": "address"},
+            {"name": "allowFailure", "type": "bool"},
+            {"name": "callData", "type": "bytes"},
+        ],
+    }],
+    "outputs": [{
+        "name": "returnData",
+        "type": "tuple[]",
+        "components": [
+            {"name": "success", "type": "bool"},
+            {"name": "returnData", "type": "bytes"},
+        ],
+    }],
+}]
+
+
+class Multicall:
+    """
+    Batches read calls to any contract into a single eth_call to Multicall3.
+    The calls are executed by the Multicall3 contract, so functions restricted
+    to the owner fail even when the aggregation is sent by the owner
+    """
+    def __init__(self, address=MULTICALL3_ADDRESS, max_calls=DEFAULT_MAX_CALLS):
+        """
+        address -> The address of the Multicall3 contract
+        max_calls -> The number of calls sent with each eth_call
+        """
+        self.aggregator = Contract.from_abi("Multicall3", address, MULTICALL3_ABI)
+        self.max_calls = max_calls
+        self.calls = []
+
+    def add(self, method, *args):
+        """
+        Queues a read call and returns its position in the results.
+        method is a brownie contract method, e.g. factory.fee or nft.tokenURI,
+        and overloaded functions must be selected by their types,
+        e.g. factory.checkWhitelistAdmission["address"]
+        """
+        self.calls.append((method, args))
+        return len(self.calls) - 1
+
+    def execute(self, block_identifier=None):
+        """
+        Runs the queued calls and returns their decoded results in the same order.
+        Calls that revert return None. The queue is emptied
+        """
+        calls, self.calls = self.calls, []
+        results = []
+        for start in range(0, len(calls), self.max_calls):
+            batch = calls[start:start + self.max_calls]
+            encoded = [(method._address, True, method.encode_input(*args)) for method, args in batch]
+            returned = self.aggregator.aggregate3.call(encoded, block_identifier=block_identifier)
+            for (method, _), (success, return_data) in zip(batch, returned):
+                results.append(method.decode_output(HexBytes(return_data).hex()) if success else None)
+        return results
+
+
+def factory_status(multicall, factory, collections=(), token_ids=()):
+    """
+    Reads the configuration of the factory, the lock of every collection and
+    the URI of the given tokens of every collection with a single aggregation.
+    Tokens that do not exist have None as URI
+    """
+    for name in ("fee", "admissionFee", "editingFee", "depositToken", "latestAddress"):
+        multicall.add(getattr(factory, name))
+    for collection in collections:
+        multicall.add(collection.locked)
+        for token_id in token_ids:
+            multicall.add(collection.tokenURI, token_id)
+
+    results = iter(multicall.execute())
+    status = {
+        name: next(results)
+        for name in ("fee", "admissionFee", "editingFee", "depositToken", "latestAddress")
+    }
+    status["collections"] = {
+        collection.address: {
+            "locked": next(results),
+            "tokenURIs": {token_id: next(results) for token_id in token_ids},
+        }
+        for collection in collections
+    }
+    return status
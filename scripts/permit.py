@@ -0,0 +1,66 @@
+from brownie import chain
+from eth_account import Account
+from eth_account.messages import encode_structured_data
+
+
+def build_permit(token, owner, spender, value, deadline, nonce=None, version="1"):
+    """
+    Builds the EIP-712 typed data of an EIP-2612 permit
+    token -> The ERC20Permit contract
+    owner -> The address of the token owner
+    spender -> The address allowed to spend the tokens
+    value -> The amount to be approved
+    deadline -> The timestamp after which the permit is not valid anymore
+    nonce -> The permit nonce of the owner, read from the token when not provided
+    """
+    if nonce is None:
+        nonce = token.nonces(owner)
+
+    return {
+        "types": {
+            "EIP712Domain": [
+                {"name": "name", "type": "string"},
+                {"name": "version", "type": "string"},
+                {"name": "chainId", "type": "uint256"},
+                {"name": "verifyingContract", "type": "address"},
+            ],
+            "Permit": [
+                {"name": "owner", "type": "address"},
+                {"name": "spender", "type": "address"},
+                {"name": "value", "type": "uint256"},
+                {"name": "nonce", "type": "uint256"},
+                {"name": "deadline", "type": "uint256"},
+            ],
+        },
+        "primaryType": "Permit",
+        "domain": {
+            "name": token.name(),
+            "version": version,
+            "chainId": chain.id,
+            "verifyingContract": str(token.address),
+        },
+        "message": {
+            "owner": str(owner),
+            "spender": str(spender),
+            "value": value,
+            "nonce": nonce,
+            "deadline": deadline,
+        },
+    }
+
+
+def sign_permit(token, private_key, spender, value, deadline, nonce=None, version="1"):
+    """
+    Signs an EIP-2612 permit with the given private key.
+    Returns the (deadline, v, r, s) arguments expected by the factory *WithPermit functions
+    """
+    owner = Account.from_key(private_key).address
+    permit = build_permit(token, owner, spender, value, deadline, nonce, version)
+    signed = Account.sign_message(encode_structured_data(permit), private_key)
+
+    return (
+        deadline,
+        signed.v,
+        signed.r.to_bytes(32, "big"),
+        signed.s.to_bytes(32, "big"),
+    )
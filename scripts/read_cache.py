@@ -0,0 +1,240 @@
+from brownie import GenericNFT, GenericNFTFactory, web3
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+
+from collections import OrderedDict
+
+# Tokens and collections kept in memory
+DEFAULT_MAX_ENTRIES = 10000
+
+# Events invalidating a token: (topic of the collection, topic of the token id).
+# Events emitted by the collections have None, the collection is the log address
+TOKEN_EVENTS = {
+    "AttributesUpdated(address,uint256,address,string,string,uint256)": (1, 2),
+    "NFTCreated(address,uint256,address,address,uint256)": (1, 2),
+    "NFTDeleted(address,uint256,address,uint256)": (1, 2),
+    "Transfer(address,address,uint256)": (None, 3),
+}
+# Events invalidating the entry of a collection: (topic of the collection, whole collection)
+COLLECTION_EVENTS = {
+    "ContractAdmitted(address,address,uint8,uint256)": (2, False),
+    "ContractReleased(address,address)": (2, False),
+    "LockChanged(bool)": (None, False),
+    "CompactURIFormatChanged(string,bytes4,string)": (None, True),
+}
+# ERC-4906 events, for collections that emit them when their owner edits a token directly
+METADATA_UPDATE = "MetadataUpdate(uint256)"
+BATCH_METADATA_UPDATE = "BatchMetadataUpdate(uint256,uint256)"
+
+
+def signature_topic(signature):
+    return Web3.keccak(text=signature).hex()
+
+
+def topic_address(topic):
+    return Web3.toChecksumAddress("0x" + bytes(topic)[-20:].hex())
+
+
+def topic_int(topic):
+    return int.from_bytes(bytes(topic), "big")
+
+
+class LRUCache:
+    """
+    Mapping with bounded size, evicting the least recently used key when full
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Returns the value of the key, marked as the most recently used, or None when missing
+        """
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key):
+        """
+        Removes the key, returning True when it was cached
+        """
+        return self.entries.pop(key, None) is not None
+
+
+class CollectionReadCache:
+    """
+    Read-through cache of the token and collection lookups served for the collections
+    of a factory. Entries are keyed by (collection, tokenId), with tokenId None for
+    the values of the whole collection, and are dropped by the events that change them,
+    read with sync. Values can be stale only for the blocks not synced yet
+    """
+    def __init__(self, factory_address, max_entries=DEFAULT_MAX_ENTRIES, from_block=None):
+        """
+        factory_address -> The address of the factory operating the collections
+        max_entries -> The number of tokens and collections kept in memory
+        from_block -> The first block whose events are read by sync, the next block when not provided
+        """
+        self.factory_address = Web3.toChecksumAddress(str(factory_address))
+        self.factory = web3.eth.contract(address=self.factory_address, abi=GenericNFTFactory.abi)
+        self.cache = LRUCache(max_entries)
+        self.collections = {}
+        self.next_block = web3.eth.block_number + 1 if from_block is None else from_block
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self.token_topics = {signature_topic(signature): positions for signature, positions in TOKEN_EVENTS.items()}
+        self.collection_topics = {
+            signature_topic(signature): positions for signature, positions in COLLECTION_EVENTS.items()}
+        self.metadata_update_topic = signature_topic(METADATA_UPDATE)
+        self.batch_metadata_update_topic = signature_topic(BATCH_METADATA_UPDATE)
+        self.topics = (list(self.token_topics) + list(self.collection_topics)
+                       + [self.metadata_update_topic, self.batch_metadata_update_topic])
+
+    def token_uri(self, collection, token_id):
+        """
+        Returns the URI of the token, or None when the token does not exist
+        """
+        return self._read(collection, token_id, "tokenURI", lambda contract: contract.functions.tokenURI(token_id))
+
+    def owner_of(self, collection, token_id):
+        """
+        Returns the owner of the token, or None when the token does not exist
+        """
+        return self._read(collection, token_id, "ownerOf", lambda contract: contract.functions.ownerOf(token_id))
+
+    def locked(self, collection):
+        return self._read(collection, None, "locked", lambda contract: contract.functions.locked())
+
+    def user_of_contract(self, collection):
+        """
+        Returns the user operating the collection through the factory,
+        the zero address when the collection is not registered
+        """
+        return self._read(collection, None, "user",
+                          lambda contract: self.factory.functions.getContractInfo(contract.address), 0)
+
+    def _read(self, collection, token_id, field, function, output=None):
+        collection = Web3.toChecksumAddress(str(collection))
+        key = (collection, token_id)
+        entry = self.cache.get(key)
+        if entry is not None and field in entry:
+            self.hits += 1
+            return entry[field]
+
+        self.misses += 1
+        try:
+            value = function(self._contract(collection)).call()
+        except (ContractLogicError, ValueError):
+            # Reverted, e.g. for tokens that do not exist
+            value = None
+        if output is not None and value is not None:
+            value = value[output]
+
+        if entry is None:
+            entry = {}
+            self.cache.put(key, entry)
+        entry[field] = value
+        return value
+
+    def _contract(self, collection):
+        if collection not in self.collections:
+            self.collections[collection] = web3.eth.contract(address=collection, abi=GenericNFT.abi)
+        return self.collections[collection]
+
+    def sync(self, to_block=None):
+        """
+        Reads the events of the factory and of the collections read so far,
+        up to to_block or the latest block, and drops the entries they change.
+        Returns the number of dropped entries
+        """
+        if to_block is None:
+            to_block = web3.eth.block_number
+        if to_block < self.next_block:
+            return 0
+
+        logs = web3.eth.get_logs({
+            "address": [self.factory_address] + list(self.collections),
+            "fromBlock": self.next_block,
+            "toBlock": to_block,
+            "topics": [self.topics],
+        })
+        self.next_block = to_block + 1
+
+        invalidated = 0
+        for log in logs:
+            invalidated += self._invalidate(log)
+        self.invalidations += invalidated
+        return invalidated
+
+    def _invalidate(self, log):
+        topics = log["topics"]
+        topic = topics[0].hex()
+        from_factory = log["address"] == self.factory_address
+
+        if topic in self.token_topics:
+            collection_position, token_position = self.token_topics[topic]
+            if from_factory == (collection_position is None):
+                return 0
+            collection = log["address"] if collection_position is None else topic_address(topics[collection_position])
+            return int(self.cache.pop((collection, topic_int(topics[token_position]))))
+
+        if topic in self.collection_topics:
+            collection_position, whole_collection = self.collection_topics[topic]
+            if from_factory == (collection_position is None):
+                return 0
+            collection = log["address"] if collection_position is None else topic_address(topics[collection_position])
+            if whole_collection:
+                return self._invalidate_collection(collection)
+            return int(self.cache.pop((collection, None)))
+
+        if from_factory:
+            return 0
+        data = bytes(log["data"])
+        if topic == self.metadata_update_topic:
+            return int(self.cache.pop((log["address"], topic_int(data[:32]))))
+        if topic == self.batch_metadata_update_topic:
+            return self._invalidate_collection(log["address"], topic_int(data[:32]), topic_int(data[32:64]))
+        return 0
+
+    def _invalidate_collection(self, collection, first_token_id=0, last_token_id=None):
+        """
+        Drops the cached tokens of the collection with ids in the given range
+        """
+        keys = [
+            key for key in self.cache.entries
+            if key[0] == collection and key[1] is not None and key[1] >= first_token_id
+            and (last_token_id is None or key[1] <= last_token_id)
+        ]
+        for key in keys:
+            self.cache.pop(key)
+        return len(keys)
+
+    @property
+    def metrics(self):
+        """
+        Returns the hits, the misses, the hit rate, the evictions and the invalidations
+        since the cache was created, together with the current number of entries
+        """
+        reads = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / reads if reads else 0,
+            "evictions": self.cache.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self.cache),
+        }
@@ -0,0 +1,117 @@
+from brownie import GenericNFTFactory, chain
+from eth_account import Account
+from eth_account.messages import encode_structured_data
+from web3 import Web3
+
+import csv
+import json
+import os
+import secrets
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+# Seconds for which the vouchers generated by main can be redeemed
+DEFAULT_VALIDITY = 30 * 24 * 3600
+
+
+def build_voucher(factory, nft_contract, token_uri, fee, expiry, nonce, recipient=ZERO_ADDRESS):
+    """
+    Builds the EIP-712 typed data of a voucher redeemed with redeemVoucher
+    factory -> The factory where the voucher is redeemed
+    nft_contract -> The NFT contract the signer applied for
+    token_uri -> The URI of the token to be minted
+    fee -> The minting fee paid by the redeemer, not lower than the fee of the factory
+    expiry -> The timestamp after which the voucher is not valid anymore
+    nonce -> Any number not used yet by the signer, each nonce can be redeemed once
+    recipient -> The address receiving the token, or the zero address to let anyone claim it
+    """
+    return {
+        "types": {
+            "EIP712Domain": [
+                {"name": "name", "type": "string"},
+                {"name": "version", "type": "string"},
+                {"name": "chainId", "type": "uint256"},
+                {"name": "verifyingContract", "type": "address"},
+            ],
+            "MintVoucher": [
+                {"name": "nftContractAddress", "type": "address"},
+                {"name": "recipient", "type": "address"},
+                {"name": "tokenURI", "type": "string"},
+                {"name": "fee", "type": "uint256"},
+                {"name": "expiry", "type": "uint256"},
+                {"name": "nonce", "type": "uint256"},
+            ],
+        },
+        "primaryType": "MintVoucher",
+        "domain": {
+            "name": "GenericNFTFactory",
+            "version": "1",
+            "chainId": chain.id,
+            "verifyingContract": Web3.toChecksumAddress(str(factory)),
+        },
+        "message": {
+            "nftContractAddress": Web3.toChecksumAddress(str(nft_contract)),
+            "recipient": Web3.toChecksumAddress(str(recipient)),
+            "tokenURI": token_uri,
+            "fee": fee,
+            "expiry": expiry,
+            "nonce": nonce,
+        },
+    }
+
+
+def sign_voucher(factory, private_key, nft_contract, token_uri, fee, expiry, nonce, recipient=ZERO_ADDRESS):
+    """
+    Signs a voucher with the private key of the user of the NFT contract.
+    Returns the (voucher, signature) arguments expected by redeemVoucher
+    """
+    voucher = build_voucher(factory, nft_contract, token_uri, fee, expiry, nonce, recipient)
+    signed = Account.sign_message(encode_structured_data(voucher), private_key)
+
+    message = voucher["message"]
+    return (
+        (
+            message["nftContractAddress"],
+            message["recipient"],
+            message["tokenURI"],
+            message["fee"],
+            message["expiry"],
+            message["nonce"],
+        ),
+        signed.signature,
+    )
+
+
+def generate_vouchers(factory, private_key, nft_contract, jobs, fee, expiry, first_nonce=None):
+    """
+    Signs a voucher for every (recipient, tokenURI) job, with consecutive nonces.
+    An empty recipient makes the voucher redeemable by anyone.
+    Random nonces are used when first_nonce is not provided, so that runs never collide
+    """
+    if first_nonce is None:
+        first_nonce = secrets.randbits(128) << 64
+
+    vouchers = []
+    for index, (recipient, token_uri) in enumerate(jobs):
+        voucher, signature = sign_voucher(factory, private_key, nft_contract, token_uri, fee, expiry,
+                                          first_nonce + index, recipient or ZERO_ADDRESS)
+        vouchers.append({"voucher": voucher, "signature": signature.hex()})
+    return vouchers
+
+
+def main(nft_contract_address, jobs_path, output_path="vouchers.json", validity=DEFAULT_VALIDITY):
+    """
+    Signs a voucher for every (recipient, tokenURI) row of a CSV file for the latest deployed
+    factory, at its current minting fee, and writes them to output_path.
+    The private key of the whitelisted user is read from the PRIVATE_KEY environment variable
+    """
+    with open(jobs_path, newline="") as jobs_file:
+        jobs = [(row[0], row[1]) for row in csv.reader(jobs_file) if row]
+
+    factory = GenericNFTFactory[-1]
+    expiry = chain.time() + int(validity)
+    vouchers = generate_vouchers(factory.address, os.environ["PRIVATE_KEY"], nft_contract_address,
+                                 jobs, factory.fee(), expiry)
+
+    with open(output_path, "w") as output_file:
+        json.dump(vouchers, output_file, indent=2)
+    print(f"{len(vouchers)} vouchers valid until {expiry} written to {output_path}")
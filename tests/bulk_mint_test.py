@@ -0,0 +1,140 @@
+from brownie import accounts
+from scripts.helpful_scripts import get_account, deploy_mocks
+from scripts.bulk_mint import BulkMinter, MintJob, run
+from web3 import Web3
+
+import pytest
+import time
+
+TEST_URI = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5a/metadata.json"
+# Fees are kept low so that the mock token supply covers the load test
+ADMISSION_FEE = Web3.toWei(50, "gwei")
+MINTING_FEE = Web3.toWei(29, "gwei")
+EDITING_FEE = Web3.toWei(23, "gwei")
+MINTER_KEY = "0x" + "33" * 32
+LOAD_TEST_JOBS = 100
+
+
+@pytest.fixture(scope="module")
+def fees():
+    return (ADMISSION_FEE, MINTING_FEE, EDITING_FEE)
+
+
+@pytest.fixture(scope="module")
+def minter_setup(factory, mocks, nft_user):
+    """
+    A whitelisted user with a known private key, its NFT contract owned by the factory
+    and an allowance covering the load test
+    """
+    mock_usdt, _, _ = mocks
+    minter = accounts.add(MINTER_KEY)
+    get_account(index=0).transfer(minter, Web3.toWei(10, "ether"))
+    mock_usdt.transfer(minter, ADMISSION_FEE + MINTING_FEE * LOAD_TEST_JOBS, {"from": nft_user})
+    _, _, mock_nft = deploy_mocks(account=minter)
+
+    mock_usdt.approve(factory.address, ADMISSION_FEE + MINTING_FEE * LOAD_TEST_JOBS, {"from": minter})
+    factory.applyToWhitelist(mock_nft.address, ADMISSION_FEE, {"from": minter})
+    mock_nft.transferOwnership(factory.address, {"from": minter})
+    return minter, mock_nft
+
+
+def test_bulk_mint_load(factory, minter_setup):
+    """
+    Load test of the pipelined minter, reporting mints per second
+    and p50 / p99 confirmation latency
+    """
+    minter, mock_nft = minter_setup
+    recipients = [get_account(index=index % 4 + 3) for index in range(LOAD_TEST_JOBS)]
+    jobs = [MintJob(recipient.address, f"{TEST_URI}#{index}") for index, recipient in enumerate(recipients)]
+
+    bulk_minter = BulkMinter(factory.address, mock_nft.address, MINTER_KEY, max_in_flight=16)
+    results, summary = run(bulk_minter, jobs)
+    print(f"{summary['mints_per_second']:.1f} mints/s, p50 {summary['p50_latency']:.3f}s, "
+          f"p99 {summary['p99_latency']:.3f}s")
+
+    assert summary["minted"] == LOAD_TEST_JOBS
+    assert summary["failed"] == 0
+    assert sorted(result.nonce for result in results) == list(
+        range(results[0].nonce, results[0].nonce + LOAD_TEST_JOBS))
+    assert sorted(result.token_id for result in results) == list(range(1, LOAD_TEST_JOBS + 1))
+    for result in results:
+        assert mock_nft.ownerOf(result.token_id) == result.job.recipient
+        assert mock_nft.tokenURI(result.token_id) == result.job.token_uri
+    assert factory.getContractInfo(mock_nft.address)[2] == LOAD_TEST_JOBS
+
+
+def test_bulk_mint_reports_reverted_jobs(factory, minter_setup):
+    """
+    Testing that a job reverting on chain does not stop the following ones
+    """
+    minter, mock_nft = minter_setup
+    jobs = [(minter.address, TEST_URI), (minter.address, TEST_URI)]
+
+    # The fee is lower than the minting fee, so every mint reverts
+    bulk_minter = BulkMinter(factory.address, mock_nft.address, MINTER_KEY, fee=MINTING_FEE - 1)
+    results, summary = run(bulk_minter, jobs)
+
+    assert summary["minted"] == 0
+    assert all(result.error for result in results)
+    assert mock_nft.balanceOf(minter) == 0
+
+
+class UnreachableNodeMinter(BulkMinter):
+    """
+    A minter whose node fails to send the transactions of some token URIs,
+    or accepts them without ever mining them
+    """
+    def __init__(self, *args, failing_uri=None, dropped_uri=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failing_uri = failing_uri
+        self.dropped_uri = dropped_uri
+        self.dropped_sends = 0
+
+    async def _send(self, job, nonce, gas_price):
+        if job.token_uri == self.failing_uri:
+            raise ConnectionError("connection reset by peer")
+        if job.token_uri == self.dropped_uri:
+            self.dropped_sends += 1
+            return "0x" + f"{self.dropped_sends:064x}"
+        return await super()._send(job, nonce, gas_price)
+
+
+def test_bulk_mint_isolates_rpc_errors(factory, minter_setup):
+    """
+    Testing that an RPC error other than a rejected transaction fails only its job
+    and that its nonce is filled so the following jobs are mined
+    """
+    minter, mock_nft = minter_setup
+    jobs = [(minter.address, f"{TEST_URI}#{index}") for index in range(3)]
+
+    bulk_minter = UnreachableNodeMinter(
+        factory.address, mock_nft.address, MINTER_KEY, max_in_flight=1, failing_uri=jobs[1][1])
+    results, summary = run(bulk_minter, jobs)
+
+    assert summary["minted"] == 2
+    assert results[1].token_id is None
+    assert "connection reset by peer" in results[1].error
+    assert mock_nft.ownerOf(results[2].token_id) == minter
+
+
+def test_bulk_mint_resends_and_gives_up_on_timeout(factory, minter_setup):
+    """
+    Testing that a transaction that is never mined is replaced with the same nonce
+    until the confirmation timeout, and that the following jobs are not stuck behind it
+    """
+    minter, mock_nft = minter_setup
+    jobs = [(minter.address, f"{TEST_URI}#dropped"), (minter.address, TEST_URI)]
+
+    bulk_minter = UnreachableNodeMinter(
+        factory.address, mock_nft.address, MINTER_KEY, max_in_flight=1, dropped_uri=jobs[0][1],
+        confirmation_timeout=1, resend_after=0.2, max_attempts=100)
+    started = time.monotonic()
+    results, summary = run(bulk_minter, jobs)
+
+    assert time.monotonic() - started < 10
+    assert results[0].error == "not confirmed"
+    assert 1 < results[0].attempts < 100
+    assert bulk_minter.dropped_sends == results[0].attempts
+    assert summary["minted"] == 1
+    assert results[1].nonce == results[0].nonce + 1
+    assert mock_nft.ownerOf(results[1].token_id) == minter
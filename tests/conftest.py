@@ -0,0 +1,155 @@
+from brownie import history, network
+from brownie._config import CONFIG
+from scripts.helpful_scripts import get_account, deploy_mocks, LOCAL_BLOCKCHAIN_ENVIRONMENTS
+from scripts.deploy import deploy_generic_factory
+
+import pytest
+import time
+
+# Port of the local chain launched by the first xdist worker.
+# Worker gwN launches its own chain on DEV_CHAIN_BASE_PORT + N
+DEV_CHAIN_BASE_PORT = 8545
+# Block gas limit of the local chain, large enough for the batch benchmarks with 500 entries
+DEV_CHAIN_GAS_LIMIT = 100000000
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--update-gas-snapshot",
+        action="store_true",
+        default=False,
+        help="Overwrite tests/gas_snapshot.json with the gas used by the benchmarks"
+    )
+    parser.addoption(
+        "--gas-profile-dir",
+        action="store",
+        default=None,
+        help="Write the per-function gas profile of every benchmarked transaction to this directory"
+    )
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config):
+    """
+    Raises the block gas limit of the local chain and sets up sharding with `brownie test -n <workers>`.
+    Each module is sent as a whole to a single worker, so its deployments and
+    the gas snapshot are never shared between processes, and each worker
+    launches (and kills when done) its own local chain on a separate port
+    """
+    if config.getoption("numprocesses", None):
+        config.option.dist = "loadscope"
+
+    network_name = CONFIG.argv.get("network") or CONFIG.settings["networks"]["default"]
+    if network_name not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        return
+
+    cmd_settings = CONFIG.networks[network_name]["cmd_settings"]
+    cmd_settings["gas_limit"] = DEV_CHAIN_GAS_LIMIT
+    if hasattr(config, "workerinput"):
+        worker_index = int(config.workerinput["workerid"].lstrip("gw"))
+        cmd_settings["port"] = DEV_CHAIN_BASE_PORT + worker_index
+
+
+def pytest_sessionstart(session):
+    session.config._suite_started = time.perf_counter()
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """
+    Reports the wall-clock time of the session and the transactions sent to the chain,
+    the two numbers compared when changing how the tests deploy their contracts
+    """
+    if not hasattr(config, "_suite_started"):
+        return
+    elapsed = time.perf_counter() - config._suite_started
+    terminalreporter.write_line(
+        f"suite wall-clock: {elapsed:.1f} s, {len(history)} transactions"
+        + (f" on worker {config.workerinput['workerid']}" if hasattr(config, "workerinput") else ""))
+
+
+@pytest.fixture(scope="module", autouse=True)
+def local_only(module_isolation):
+    """
+    Skips the module outside of the local environment, before anything is deployed.
+    The chain is reverted when the module is done
+    """
+    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
+        pytest.skip("Only in local environment")
+
+
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation):
+    """
+    Every test runs against a snapshot of the chain taken after the
+    module fixtures are deployed, and reverted when the test is done
+    """
+    pass
+
+
+@pytest.fixture(scope="module")
+def nft_user():
+    """
+    The user applying to the factory. It owns the whole supply of the mock tokens
+    """
+    return get_account(index=1)
+
+
+@pytest.fixture(scope="module")
+def factory_owner():
+    return get_account(index=2)
+
+
+@pytest.fixture(scope="module")
+def mocks(nft_user):
+    """
+    Mock USDT, mock USDC and mock NFT deployed by the NFT user
+    """
+    return deploy_mocks(account=nft_user)
+
+
+@pytest.fixture(scope="module")
+def factory(mocks, factory_owner, fees):
+    """
+    A factory using the mock USDT as deposit token.
+    The admission, minting and editing fees come from the fees fixture of each module
+    """
+    mock_usdt, _, _ = mocks
+    admission_fee, minting_fee, editing_fee = fees
+
+    return deploy_generic_factory(
+        factory_owner,
+        admission_fee,
+        minting_fee,
+        editing_fee,
+        mock_usdt.address,
+        force=True
+    )
+
+
+@pytest.fixture(scope="module")
+def registered(nft_user, factory_owner, fees):
+    """
+    Separate mocks and factory where the NFT user has already applied to the
+    whitelist with the mock NFT and transferred its ownership to the factory.
+    Returns the factory, the mock USDT and the mock NFT
+    """
+    mock_usdt, _, mock_nft = deploy_mocks(account=nft_user)
+    admission_fee, minting_fee, editing_fee = fees
+
+    factory = deploy_generic_factory(
+        factory_owner,
+        admission_fee,
+        minting_fee,
+        editing_fee,
+        mock_usdt.address,
+        force=True
+    )
+
+    tx = mock_usdt.approve(factory.address, admission_fee, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.applyToWhitelist(mock_nft.address, admission_fee, {"from": nft_user})
+    tx.wait(1)
+    tx = mock_nft.transferOwnership(factory.address, {'from': nft_user})
+    tx.wait(1)
+
+    return factory, mock_usdt, mock_nft
@@ -1,41 +1,58 @@
-from brownie import GenericNFTFactory, accounts, exceptions, network
+from brownie import GenericNFT, GenericNFTFactory, accounts, chain, exceptions, network
 from scripts.helpful_scripts import get_account, deploy_mocks, LOCAL_BLOCKCHAIN_ENVIRONMENTS
 from web3 import Web3
 from web3 import eth
 from scripts.deploy import deploy_generic_factory
+from scripts.permit import sign_permit
 
+import base64
 import pytest
 
 TEST_URI = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5a/metadata.json"
 TEST_URI2 = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5b/metadata.json"
+# Directory CID in the default compact format, dag-pb as built by scripts/metadata_pipeline.py
+CID_URI = "ipfs://bafybeib4fmtj7jbc66wap5bg3op2weyjcmb5stqz7bfhqxphfgmonwum7a/metadata.json"
 KEPT_BALANCE = Web3.toWei(100, "ether")
 ADMISSION_FEE = Web3.toWei(50, "ether")
 MINTING_FEE = Web3.toWei(29, "ether")
 EDITING_FEE = Web3.toWei(23, "ether")
+CID_HEADER = bytes.fromhex("01701220")
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+# Fixed keys for the accounts signing permits, so that every run and every worker signs the same data
+PERMIT_USER_KEY = "0x" + "11" * 32
+OTHER_PERMIT_USER_KEY = "0x" + "22" * 32
 
-def test_deploy():
+
+@pytest.fixture(scope="module")
+def fees():
+    return (ADMISSION_FEE, MINTING_FEE, EDITING_FEE)
+
+
+def cid_digest(uri):
     """
-    Testing that the factory can be deployed properly and
-    attributes are initialized as expected
+    Extracts the 32 bytes digest from an ipfs://<CIDv1>/metadata.json URI
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip("Only in local environment")
+    cid = uri[len("ipfs://"):].split("/")[0][1:].upper()
+    raw = base64.b32decode(cid + "=" * (-len(cid) % 8))
+    assert raw[:4] == CID_HEADER
+    return raw[4:]
 
-    factory_owner = get_account(index=1)
-    token_owner = get_account(index=2)
 
-    mock_usdt, mock_usdc, mock_nft = deploy_mocks(
-        account=token_owner)
+def cid_uri(digest):
+    """
+    Builds the ipfs://<CIDv1>/metadata.json URI for the given digest
+    """
+    cid = base64.b32encode(CID_HEADER + digest).decode().lower().rstrip("=")
+    return "ipfs://b" + cid + "/metadata.json"
+
+
+def test_deploy(factory, mocks, factory_owner):
+    """
+    Testing that the factory can be deployed properly and
+    attributes are initialized as expected
+    """
+    mock_usdt, mock_usdc, mock_nft = mocks
 
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
-    
     expected_owner = factory_owner
 
     assert ADMISSION_FEE == factory.admissionFee()
@@ -46,27 +63,11 @@ def test_deploy():
 
 
 
-def test_add_to_whitelist():
+def test_add_to_whitelist(factory, factory_owner):
     """
-    Testing that addresses can be added to the whitelist 
+    Testing that addresses can be added to the whitelist
     and that only the owner can do so
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-            pytest.skip("Only in local environment")
-    
-    token_owner = get_account(index=1)
-    mock_usdt, mock_usdc, mock_nft = deploy_mocks(account=token_owner)
-    
-    factory_owner = get_account(index=2)
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
-
     whitelisted = get_account(index=3)
 
     factory.addToWhitelist(whitelisted, {'from': factory_owner})
@@ -81,27 +82,11 @@ def test_add_to_whitelist():
 
 
 
-def test_remove_from_whitelist():
+def test_remove_from_whitelist(factory, factory_owner):
     """
-    Testing that addresses can be removed from the whitelist 
+    Testing that addresses can be removed from the whitelist
     and that only the owner can do so
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-            pytest.skip("Only in local environment")
-    
-    token_owner = get_account(index=1)
-    mock_usdt, mock_usdc, mock_nft = deploy_mocks(account=token_owner)
-    
-    factory_owner = get_account(index=2)
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
-
     whitelisted_1 = get_account(index=3)
     factory.addToWhitelist(whitelisted_1, {'from': factory_owner})
     returned_whitelisted_1 = factory.getFromWhitelist.call(0, {'from': factory_owner})
@@ -123,26 +108,57 @@ def test_remove_from_whitelist():
 
 
 
-def test_set_fee():
+def test_batch_whitelist_operations(factory, mocks, nft_user, factory_owner):
     """
-    Testing that the deposit / minting fee can be changed properly 
+    Testing that addresses and contracts can be added, removed and admitted in
+    batches, skipping duplicates and missing entries, and that only the owner can do so
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-            pytest.skip("Only in local environment")
-    
-    token_owner = get_account(index=1)
-    mock_usdt, mock_usdc, mock_nft = deploy_mocks(account=token_owner)
-    
-    factory_owner = get_account(index=2)
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
+    _, _, mock_nft = mocks
+    _, _, mock_nft2 = deploy_mocks(account=nft_user)
+    members = [get_account(index=index) for index in range(3, 6)]
+
+    with pytest.raises(Exception):
+        factory.addToWhitelistBatch(members, {'from': nft_user})
+
+    tx = factory.addToWhitelistBatch(members + [members[0]], {'from': factory_owner})
+    assert tx.return_value == 3
+    assert len(tx.events["AddedToWhitelist"]) == 3
+    assert [factory.getFromWhitelist.call(index, {'from': factory_owner}) for index in range(3)] == members
+
+    tx = factory.addToWhitelistBatch(members[1:], {'from': factory_owner})
+    assert tx.return_value == 0
+
+    # The missing address and the duplicate are skipped
+    tx = factory.removeFromWhitelistBatch(
+        [members[0], nft_user, members[0], members[2]], {'from': factory_owner})
+    assert tx.return_value == 2
+    assert factory.getFromWhitelist.call(0, {'from': factory_owner}) == members[1]
+    # The whitelist is public, like getWhitelist
+    assert factory.getFromWhitelist(0, {'from': nft_user}) == members[1]
+    with pytest.raises(Exception):
+        factory.getFromWhitelist.call(1, {'from': factory_owner})
+
+    with pytest.raises(Exception):
+        factory.admitToWhitelistBatch([nft_user], [mock_nft, mock_nft2], {'from': factory_owner})
+    with pytest.raises(Exception):
+        factory.admitToWhitelistBatch([nft_user], [mock_nft], {'from': nft_user})
+
+    tx = factory.admitToWhitelistBatch(
+        [nft_user, nft_user, nft_user], [mock_nft, mock_nft2, mock_nft], {'from': factory_owner})
+    assert tx.return_value == 2
+    assert factory.getContractsOfUser.call(nft_user, {"from": factory_owner}) == 2
+    assert factory.checkWhitelistAdmission.call({"from": nft_user})
+
+    tx = factory.admitToWhitelistBatch([nft_user], [mock_nft2], {'from': factory_owner})
+    assert tx.return_value == 0
+    assert factory.getContractsOfUser.call(nft_user, {"from": factory_owner}) == 2
+
 
+
+def test_set_fee(factory, factory_owner):
+    """
+    Testing that the deposit / minting fee can be changed properly
+    """
     assert MINTING_FEE == factory.fee()
 
     new_fee = Web3.toWei(89, "ether")
@@ -152,25 +168,11 @@ def test_set_fee():
 
 
 
-def test_set_deposit_token():
+def test_set_deposit_token(factory, mocks, factory_owner):
     """
     Testing that the deposit token can be changed properly
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-            pytest.skip("Only in local environment")
-    
-    token_owner = get_account(index=1)
-    mock_usdt, mock_usdc, mock_nft = deploy_mocks(account=token_owner)
-    
-    factory_owner = get_account(index=2)
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
+    mock_usdt, mock_usdc, mock_nft = mocks
 
     assert factory.depositToken() == mock_usdt
 
@@ -179,35 +181,19 @@ def test_set_deposit_token():
 
 
 
-def test_deposit():
+def test_deposit(factory, mocks, nft_user, factory_owner):
     """
     Testing that users can deposit to the factory contract
-    - deploy factory and mocks
     - transfer mock_usdt to users
     - approve spending for user
     - user deposits
     - check that factory balance equals the deposited amount
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-            pytest.skip("Only in local environment")
-    
-    token_owner = get_account(index=1)
-    mock_usdt, mock_usdc, mock_nft = deploy_mocks(account=token_owner)
-    
-    factory_owner = get_account(index=2)
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
+    mock_usdt, mock_usdc, mock_nft = mocks
 
     factory_user = get_account(index=3)
-    KEPT_BALANCE = Web3.toWei(100, "ether")
     mock_usdt.transfer(
-        factory_user.address, mock_usdt.totalSupply() - KEPT_BALANCE, {"from": token_owner}
+        factory_user.address, mock_usdt.totalSupply() - KEPT_BALANCE, {"from": nft_user}
     )
 
     amount = Web3.toWei(100, "ether")
@@ -225,33 +211,18 @@ def test_deposit():
 
 
 
-def test_withdraw():
+def test_withdraw(factory, mocks, nft_user, factory_owner):
     """
     Testing that the owner can withdraw the token balance of the contract
     - run all the steps for the test_deposit function
     - the factory owner calls the withdraw function
     - check that the deposited amount is now in the balance of the factory owner
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-            pytest.skip("Only in local environment")
-    
-    token_owner = get_account(index=1)
-    mock_usdt, mock_usdc, mock_nft = deploy_mocks(account=token_owner)
-    
-    factory_owner = get_account(index=2)
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
+    mock_usdt, mock_usdc, mock_nft = mocks
 
     factory_user = get_account(index=3)
-    KEPT_BALANCE = Web3.toWei(100, "ether")
     mock_usdt.transfer(
-        factory_user.address, mock_usdt.totalSupply() - KEPT_BALANCE, {"from": token_owner}
+        factory_user.address, mock_usdt.totalSupply() - KEPT_BALANCE, {"from": nft_user}
     )
 
     amount = Web3.toWei(100, "ether")
@@ -281,33 +252,16 @@ def test_withdraw():
     with pytest.raises(Exception):
         factory.withdraw({"from": factory_user})
 
-    
 
-def test_mint_nft():
+
+def test_mint_nft(factory, mocks, nft_user, factory_owner):
     """
     Testing that the NFT minting process works correctly
-    - deploy factory and mocks
-    - create user account
-    - factory onwer adds user account to whitelist
-    - mock_usdt are transferred to the user account
+    - user applies to the whitelist
+    - the ownership of the NFT contract is transferred to the factory
     - the user account calls the mintNFT function
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-            pytest.skip("Only in local environment")
-            
-    nft_user = get_account(index=1)
-    factory_owner = get_account(index=2)
-
-    mock_usdt, mock_usdc, mock_nft = deploy_mocks(account=nft_user)
-
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
+    mock_usdt, mock_usdc, mock_nft = mocks
 
     admission_fee = factory.admissionFee({'from': nft_user})
 
@@ -316,7 +270,7 @@ def test_mint_nft():
 
     tx = factory.applyToWhitelist(
         mock_nft.address,
-        admission_fee, 
+        admission_fee,
         {"from": nft_user})
     tx.wait(1)
 
@@ -346,7 +300,7 @@ def test_mint_nft():
         nft_user.address,
         mock_nft.address,
         test_uri,
-        fee, 
+        fee,
         {"from": nft_user})
     tx.wait(1)
 
@@ -362,49 +316,12 @@ def test_mint_nft():
 
 
 
-def test_changeTokenURI():
+def test_changeTokenURI(registered, nft_user, factory_owner):
     """
     Testing that the owner can change the token URI properly.
-    Repeats all the steps of test_minting then tries to change the URI
+    Mints a token as in test_mint_nft then tries to change the URI
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-            pytest.skip("Only in local environment")
-            
-    nft_user = get_account(index=1)
-    factory_owner = get_account(index=2)
-
-    mock_usdt, mock_usdc, mock_nft = deploy_mocks(account=nft_user)
-
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
-
-    admission_fee = factory.admissionFee({'from': nft_user})
-
-    tx = mock_usdt.approve(factory.address, admission_fee, {"from": nft_user})
-    tx.wait(1)
-
-    tx = factory.applyToWhitelist(
-        mock_nft.address,
-        admission_fee, 
-        {"from": nft_user})
-    tx.wait(1)
-
-    # Transfer ownership of NFT contract to factory
-    # this allows the factory to mint the NFTs
-    owner_mock_nft = mock_nft.owner.call()
-    assert owner_mock_nft == nft_user
-
-    tx = mock_nft.transferOwnership(factory.address, {'from': nft_user})
-    tx.wait(1)
-
-    owner_mock_nft = mock_nft.owner.call()
-    assert owner_mock_nft == factory.address
+    factory, mock_usdt, mock_nft = registered
 
     fee = factory.fee({'from': nft_user})
 
@@ -418,7 +335,7 @@ def test_changeTokenURI():
         nft_user.address,
         mock_nft.address,
         test_uri,
-        fee, 
+        fee,
         {"from": nft_user})
     tx.wait(1)
 
@@ -432,8 +349,8 @@ def test_changeTokenURI():
     new_test_uri = TEST_URI2
     factory.changeTokenURI(
         mock_nft.address,
-        1, 
-        new_test_uri, 
+        1,
+        new_test_uri,
         editing_fee,
         {'from': nft_user})
 
@@ -441,45 +358,8 @@ def test_changeTokenURI():
 
 
 
-def test_deleteNFT():
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-            pytest.skip("Only in local environment")
-            
-    nft_user = get_account(index=1)
-    factory_owner = get_account(index=2)
-
-    mock_usdt, mock_usdc, mock_nft = deploy_mocks(account=nft_user)
-
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
-
-    admission_fee = factory.admissionFee({'from': nft_user})
-
-    tx = mock_usdt.approve(factory.address, admission_fee, {"from": nft_user})
-    tx.wait(1)
-
-    tx = factory.applyToWhitelist(
-        mock_nft.address,
-        admission_fee, 
-        {"from": nft_user})
-    tx.wait(1)
-
-    # Transfer ownership of NFT contract to factory
-    # this allows the factory to mint the NFTs
-    owner_mock_nft = mock_nft.owner.call()
-    assert owner_mock_nft == nft_user
-
-    tx = mock_nft.transferOwnership(factory.address, {'from': nft_user})
-    tx.wait(1)
-
-    owner_mock_nft = mock_nft.owner.call()
-    assert owner_mock_nft == factory.address
+def test_deleteNFT(registered, nft_user, factory_owner):
+    factory, mock_usdt, mock_nft = registered
 
     fee = factory.fee({'from': nft_user})
 
@@ -493,7 +373,7 @@ def test_deleteNFT():
         nft_user.address,
         mock_nft.address,
         test_uri,
-        fee, 
+        fee,
         {"from": nft_user})
     tx.wait(1)
 
@@ -516,26 +396,12 @@ def test_deleteNFT():
 
 
 
-def test_apply_to_whitelist():
+def test_apply_to_whitelist(factory, mocks, nft_user):
     """
     Testing that a user can apply to the whitelist correctly
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip("Only in local environment")
-
-    factory_user = get_account(index=1)
-    mock_usdt, mock_usdc, mock_nft = deploy_mocks(account=factory_user)
-    
-    factory_owner = get_account(index=2)
-
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
+    mock_usdt, mock_usdc, mock_nft = mocks
+    factory_user = nft_user
 
     initial_balance = mock_usdt.balanceOf(factory.address)
 
@@ -549,7 +415,7 @@ def test_apply_to_whitelist():
 
     tx = factory.applyToWhitelist(
         mock_nft.address,
-        admission_fee, 
+        admission_fee,
         {"from": factory_user})
     tx.wait(1)
 
@@ -558,52 +424,49 @@ def test_apply_to_whitelist():
 
     assert mock_usdt.balanceOf(factory.address) == initial_balance + admission_fee
 
-    # Check that lower fees are not accepted
+    # Check that lower fees are not accepted, with enough balance and allowance for the full fee
     poor_factory_user = get_account(index=4)
-    
+    _, _, poor_mock_nft = deploy_mocks(account=poor_factory_user)
+
     insufficient_admission_fee = Web3.toWei(0.5, "ether")
 
     admitted = factory.checkWhitelistAdmission.call({"from": poor_factory_user})
     assert not admitted
 
-    # check that other users cannot withdraw
+    mock_usdt.transfer(poor_factory_user, admission_fee, {"from": factory_user})
+    tx = mock_usdt.approve(factory.address, admission_fee, {"from": poor_factory_user})
+    tx.wait(1)
     with pytest.raises(Exception):
         tx = factory.applyToWhitelist(
-            mock_nft.address,
-            insufficient_admission_fee, 
-            {"from": factory_user})
+            poor_mock_nft.address,
+            insufficient_admission_fee,
+            {"from": poor_factory_user})
         tx.wait(1)
 
-
     admitted = factory.checkWhitelistAdmission.call({"from": poor_factory_user})
     assert not admitted
 
+    # The same fee is rejected when the deposit is covered by credits
+    tx = factory.deposit(admission_fee, {"from": poor_factory_user})
+    tx.wait(1)
+    with pytest.raises(Exception):
+        factory.applyToWhitelist(poor_mock_nft.address, insufficient_admission_fee, {"from": poor_factory_user})
+
+    factory.applyToWhitelist(poor_mock_nft.address, admission_fee, {"from": poor_factory_user})
+    assert factory.checkWhitelistAdmission.call({"from": poor_factory_user})
 
 
-def test_claim_ownership():
+
+def test_claim_ownership(factory, mocks, nft_user, factory_owner):
     """
     Testing that someone who applied to the whitelist and granted
     ownership to the factory contract should be able to call the
     function to get the ownership back
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip("Only in local environment")
-
-    factory_user = get_account(index=1)
-    mock_usdt, mock_usdc, mock_nft = deploy_mocks(account=factory_user)
+    mock_usdt, mock_usdc, mock_nft = mocks
+    factory_user = nft_user
     _, _, mock_nft2 = deploy_mocks(account=factory_user)
 
-    factory_owner = get_account(index=2)
-
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
-
     initial_balance = mock_usdt.balanceOf(factory.address)
 
     admitted = factory.checkWhitelistAdmission.call({"from": factory_user})
@@ -616,13 +479,13 @@ def test_claim_ownership():
 
     tx = factory.applyToWhitelist(
         mock_nft.address,
-        admission_fee, 
+        admission_fee,
         {"from": factory_user})
     tx.wait(1)
 
     tx = factory.applyToWhitelist(
         mock_nft2.address,
-        admission_fee, 
+        admission_fee,
         {"from": factory_user})
     tx.wait(1)
 
@@ -664,10 +527,14 @@ def test_claim_ownership():
     admitted = factory.checkWhitelistAdmission.call({"from": factory_user})
     assert admitted
 
-    factory.claimOwnership(
+    tx = factory.claimOwnership(
         mock_nft2.address,
         {'from': factory_user})
 
+    # The last contract of the user also removes the user from the whitelist
+    assert tx.events["ContractReleased"]["nftContractAddress"] == mock_nft2.address
+    assert tx.events["RemovedFromWhitelist"]["user"] == factory_user
+
     owner_mock_nft2 = mock_nft2.owner.call()
     assert owner_mock_nft2 == factory_user
 
@@ -677,27 +544,14 @@ def test_claim_ownership():
     assert not admitted
 
 
-def test_set_get_latest_version():
+def test_set_get_latest_version(factory, mocks, nft_user, factory_owner):
     """
     Testing that the owner can set a different latest version
     and that any user can check the latest version
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip("Only in local environment")
-
-    factory_user = get_account(index=1)
-    mock_usdt, _, _ = deploy_mocks(account=factory_user)
-
-    factory_owner = get_account(index=2)
-
-    old_factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
+    mock_usdt, _, _ = mocks
+    factory_user = nft_user
+    old_factory = factory
 
     new_factory = deploy_generic_factory(
         factory_owner,
@@ -713,27 +567,12 @@ def test_set_get_latest_version():
     assert old_factory.getLatestVersion.call({"from": factory_user}) == new_factory.address
 
 
-def test_admit_to_whitelist():
+def test_admit_to_whitelist(factory, mocks, nft_user, factory_owner):
     """
     Testing that the owner can manually admit users and contracts
     """
-    if network.show_active() not in LOCAL_BLOCKCHAIN_ENVIRONMENTS:
-        pytest.skip("Only in local environment")
-
-    factory_user = get_account(index=1)
-    mock_usdt, _, mock_nft = deploy_mocks(account=factory_user)
-    _, _, mock_nft2 = deploy_mocks(account=factory_user)
-
-    factory_owner = get_account(index=2)
-
-    factory = deploy_generic_factory(
-        factory_owner,
-        ADMISSION_FEE,
-        MINTING_FEE,
-        EDITING_FEE,
-        mock_usdt.address,
-        force=True
-    )
+    mock_usdt, _, mock_nft = mocks
+    factory_user = nft_user
 
     factory.admitToWhitelist(
         factory_user,
@@ -767,9 +606,618 @@ def test_admit_to_whitelist():
         factory_user.address,
         mock_nft.address,
         test_uri,
-        fee, 
+        fee,
         {"from": factory_user})
     tx.wait(1)
 
 
+def test_mint_batch(registered, nft_user):
+    """
+    Testing that several NFTs can be minted in a single transaction
+    paying the aggregated fee once
+    """
+    factory, mock_usdt, mock_nft = registered
+    recipient = get_account(index=3)
+
+    recipients = [nft_user.address, recipient.address, nft_user.address]
+    token_uris = [TEST_URI, TEST_URI2, TEST_URI]
+    total_fee = factory.fee({'from': nft_user}) * len(recipients)
+
+    # The fee must cover every token of the batch
+    tx = mock_usdt.approve(factory.address, total_fee, {"from": nft_user})
+    tx.wait(1)
+    with pytest.raises(Exception):
+        factory.mintBatchFromAddress(
+            recipients, mock_nft.address, token_uris, total_fee - 1, {"from": nft_user})
+
+    # Recipients and URIs must match
+    with pytest.raises(Exception):
+        factory.mintBatchFromAddress(
+            recipients, mock_nft.address, token_uris[:2], total_fee, {"from": nft_user})
+
+    initial_fc_balance = mock_usdt.balanceOf(factory.address)
+
+    tx = factory.mintBatchFromAddress(
+        recipients,
+        mock_nft.address,
+        token_uris,
+        total_fee,
+        {"from": nft_user})
+    tx.wait(1)
+
+    assert tx.return_value == (1, 2, 3)
+    assert [event["tokenId"] for event in tx.events["NFTCreated"]] == [1, 2, 3]
+    assert [event["recipient"] for event in tx.events["NFTCreated"]] == recipients
+    assert [event["fee"] for event in tx.events["NFTCreated"]] == [total_fee, 0, 0]
+    assert all(event["nftContractAddress"] == mock_nft.address for event in tx.events["NFTCreated"])
+    assert len(tx.events["Deposit"]) == 1
+    assert mock_usdt.balanceOf(factory.address) == initial_fc_balance + total_fee
+
+    assert mock_nft.ownerOf(1) == nft_user.address
+    assert mock_nft.ownerOf(2) == recipient.address
+    assert mock_nft.ownerOf(3) == nft_user.address
+    assert mock_nft.tokenURI(2) == TEST_URI2
+    assert mock_nft.locked()
+
+
+def test_mint_consecutive(registered, nft_user):
+    """
+    Testing that consecutive tokens minted with a single owner write
+    behave like tokens minted one by one
+    """
+    factory, mock_usdt, mock_nft = registered
+    recipient = get_account(index=3)
+
+    # A single mint before the batch shares the same token id counter
+    fee = factory.fee({'from': nft_user})
+    tx = mock_usdt.approve(factory.address, fee, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.mintNFTFromAddress(nft_user.address, mock_nft.address, TEST_URI, fee, {"from": nft_user})
+    tx.wait(1)
+
+    count = 5
+    base_uri = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5a/"
+    tx = mock_usdt.approve(factory.address, fee * count, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.mintConsecutiveFromAddress(
+        recipient.address,
+        mock_nft.address,
+        count,
+        base_uri,
+        fee * count,
+        {"from": nft_user})
+    tx.wait(1)
+
+    assert tx.return_value == 2
+    assert [event["tokenId"] for event in tx.events["NFTCreated"]] == [2, 3, 4, 5, 6]
+    assert [event["tokenId"] for event in tx.events["Transfer"]] == [2, 3, 4, 5, 6]
+    assert mock_nft.balanceOf(recipient) == count
+    for token_id in range(2, 7):
+        assert mock_nft.ownerOf(token_id) == recipient.address
+        assert mock_nft.tokenURI(token_id) == base_uri + str(token_id)
+    assert mock_nft.ownerOf(1) == nft_user.address
+    assert mock_nft.tokenURI(1) == TEST_URI
+    with pytest.raises(Exception):
+        mock_nft.ownerOf(7)
+
+    # Tokens of the batch cannot be transferred while the contract is locked
+    with pytest.raises(Exception):
+        mock_nft.transferFrom(recipient, nft_user, 3, {"from": recipient})
+
+    factory.unlockContract(mock_nft.address, {"from": nft_user})
+    mock_nft.transferFrom(recipient, nft_user, 3, {"from": recipient})
+    factory.lockContract(mock_nft.address, {"from": nft_user})
+
+    assert mock_nft.ownerOf(3) == nft_user.address
+    assert mock_nft.ownerOf(4) == recipient.address
+    assert mock_nft.balanceOf(recipient) == count - 1
+    assert mock_nft.balanceOf(nft_user) == 2
+
+    # Burned tokens of the batch do not fall back to the batch owner
+    editing_fee = factory.editingFee({'from': nft_user})
+    tx = mock_usdt.approve(factory.address, editing_fee, {"from": nft_user})
+    tx.wait(1)
+    factory.deleteNFT(mock_nft.address, 5, editing_fee, {"from": nft_user})
+
+    with pytest.raises(Exception):
+        mock_nft.ownerOf(5)
+    assert mock_nft.balanceOf(recipient) == count - 2
+    assert mock_nft.ownerOf(6) == recipient.address
+
+    # Explicit URIs take precedence over the batch URI
+    tx = mock_usdt.approve(factory.address, editing_fee, {"from": nft_user})
+    tx.wait(1)
+    factory.changeTokenURI(mock_nft.address, 4, TEST_URI2, editing_fee, {"from": nft_user})
+    assert mock_nft.tokenURI(4) == TEST_URI2
+
+
+def test_mint_with_cid(registered, nft_user):
+    """
+    Testing that tokens stored as CID digests rebuild the same URI
+    and can be edited through the factory
+    """
+    factory, mock_usdt, mock_nft = registered
+
+    fee = factory.fee({'from': nft_user})
+    tx = mock_usdt.approve(factory.address, fee, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.mintNFTWithCIDFromAddress(
+        nft_user.address,
+        mock_nft.address,
+        cid_digest(CID_URI),
+        fee,
+        {"from": nft_user})
+    tx.wait(1)
+
+    assert tx.return_value == 1
+    assert mock_nft.ownerOf(1) == nft_user.address
+    assert mock_nft.tokenURI(1) == CID_URI
+
+    # Change the CID
+    editing_fee = factory.editingFee({'from': nft_user})
+    new_digest = bytes(reversed(cid_digest(CID_URI)))
+    tx = mock_usdt.approve(factory.address, editing_fee, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.changeTokenCID(mock_nft.address, 1, new_digest, editing_fee, {'from': nft_user})
+    tx.wait(1)
+
+    assert mock_nft.tokenURI(1) == cid_uri(new_digest)
+    assert tx.events["AttributesUpdated"]["oldURI"] == CID_URI
+    assert tx.events["AttributesUpdated"]["newURI"] == cid_uri(new_digest)
+
+    # A full URI replaces the digest and the other way around
+    tx = mock_usdt.approve(factory.address, editing_fee, {"from": nft_user})
+    tx.wait(1)
+    factory.changeTokenURI(mock_nft.address, 1, TEST_URI2, editing_fee, {'from': nft_user})
+    assert mock_nft.tokenURI(1) == TEST_URI2
+
+    tx = mock_usdt.approve(factory.address, editing_fee, {"from": nft_user})
+    tx.wait(1)
+    factory.changeTokenCID(mock_nft.address, 1, cid_digest(CID_URI), editing_fee, {'from': nft_user})
+    assert mock_nft.tokenURI(1) == CID_URI
+
+
+def test_prepaid_credits(factory, mocks, nft_user, factory_owner):
+    """
+    Testing that deposited amounts are credited to the user and used
+    to pay the fees, falling back to a transfer when they are not enough
+    """
+    mock_usdt, mock_usdc, mock_nft = mocks
+
+    fee = factory.fee({'from': nft_user})
+    admission_fee = factory.admissionFee({'from': nft_user})
+    prepaid = admission_fee + 2 * fee
+
+    # Top up once
+    tx = mock_usdt.approve(factory.address, prepaid, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.deposit(prepaid, {"from": nft_user})
+    tx.wait(1)
+    assert factory.credits(nft_user) == prepaid
+    assert mock_usdt.balanceOf(factory.address) == prepaid
+
+    tx = factory.applyToWhitelist(mock_nft.address, admission_fee, {"from": nft_user})
+    tx.wait(1)
+    assert "Deposit" not in tx.events
+    assert tx.events["CreditUsed"]["_value"] == admission_fee
+
+    tx = mock_nft.transferOwnership(factory.address, {'from': nft_user})
+    tx.wait(1)
+
+    initial_fu_balance = mock_usdt.balanceOf(nft_user.address)
+    for _ in range(2):
+        tx = factory.mintNFTFromAddress(
+            nft_user.address, mock_nft.address, TEST_URI, fee, {"from": nft_user})
+        tx.wait(1)
+        assert "Deposit" not in tx.events
+
+    assert factory.credits(nft_user) == 0
+    assert mock_usdt.balanceOf(nft_user.address) == initial_fu_balance
+    assert mock_nft.balanceOf(nft_user) == 2
+
+    # Without credits the fee is transferred again
+    with pytest.raises(Exception):
+        factory.mintNFTFromAddress(
+            nft_user.address, mock_nft.address, TEST_URI, fee, {"from": nft_user})
+
+    tx = mock_usdt.approve(factory.address, fee, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.mintNFTFromAddress(
+        nft_user.address, mock_nft.address, TEST_URI, fee, {"from": nft_user})
+    tx.wait(1)
+    assert tx.events["Deposit"]["_value"] == fee
+    assert mock_usdt.balanceOf(nft_user.address) == initial_fu_balance - fee
+
+    # The owner withdraws the whole token balance
+    initial_fo_balance = mock_usdt.balanceOf(factory_owner.address)
+    factory.withdraw({"from": factory_owner})
+    assert mock_usdt.balanceOf(factory_owner.address) == initial_fo_balance + prepaid + fee
+
+
+def test_credits_survive_withdraw(factory, mocks, nft_user, factory_owner):
+    """
+    Testing that the owner withdraws only the collected fees, while the unused
+    credits stay in the factory and can be taken back by their user
+    """
+    mock_usdt, _, mock_nft = mocks
+    admission_fee = factory.admissionFee({'from': nft_user})
+    prepaid = admission_fee + 3 * factory.fee({'from': nft_user})
+
+    tx = mock_usdt.approve(factory.address, prepaid, {"from": nft_user})
+    tx.wait(1)
+    factory.deposit(prepaid, {"from": nft_user})
+    factory.applyToWhitelist(mock_nft.address, admission_fee, {"from": nft_user})
+    assert factory.outstandingCredits() == prepaid - admission_fee
+
+    initial_fo_balance = mock_usdt.balanceOf(factory_owner.address)
+    factory.withdraw({"from": factory_owner})
+    assert mock_usdt.balanceOf(factory_owner.address) == initial_fo_balance + admission_fee
+    assert mock_usdt.balanceOf(factory.address) == prepaid - admission_fee
+    assert factory.credits(nft_user) == prepaid - admission_fee
+
+    # Only the unused credits can be taken back
+    with pytest.raises(Exception):
+        factory.withdrawCredits(prepaid, {"from": nft_user})
+    initial_fu_balance = mock_usdt.balanceOf(nft_user.address)
+    tx = factory.withdrawCredits(prepaid - admission_fee, {"from": nft_user})
+    tx.wait(1)
+    assert tx.events["CreditWithdrawn"]["_value"] == prepaid - admission_fee
+    assert mock_usdt.balanceOf(nft_user.address) == initial_fu_balance + prepaid - admission_fee
+    assert factory.credits(nft_user) == 0
+    assert factory.outstandingCredits() == 0
+
+
+def test_permit(mocks, nft_user, factory_owner):
+    """
+    Testing that fees can be approved with EIP-2612 permit signatures
+    in the same transaction that uses them
+    """
+    token_owner = nft_user
+    _, mock_usdc, _ = mocks
+
+    # Permits are signed off-chain, so the user needs a known private key
+    permit_user = accounts.add(PERMIT_USER_KEY)
+    get_account(index=0).transfer(permit_user, Web3.toWei(1, "ether"))
+    _, _, mock_nft = deploy_mocks(account=permit_user)
+
+    factory = deploy_generic_factory(
+        factory_owner,
+        ADMISSION_FEE,
+        MINTING_FEE,
+        EDITING_FEE,
+        mock_usdc.address,
+        force=True
+    )
+
+    mock_usdc.transfer(permit_user, KEPT_BALANCE, {"from": token_owner})
+    deadline = chain.time() + 3600
+
+    admission_fee = factory.admissionFee({'from': permit_user})
+    tx = factory.applyToWhitelistWithPermit(
+        mock_nft.address,
+        admission_fee,
+        *sign_permit(mock_usdc, permit_user.private_key, factory.address, admission_fee, deadline),
+        {"from": permit_user})
+    tx.wait(1)
+
+    assert factory.checkWhitelistAdmission.call({"from": permit_user})
+    assert mock_usdc.balanceOf(factory.address) == admission_fee
+
+    tx = mock_nft.transferOwnership(factory.address, {'from': permit_user})
+    tx.wait(1)
+
+    fee = factory.fee({'from': permit_user})
+    tx = factory.mintNFTFromAddressWithPermit(
+        permit_user.address,
+        mock_nft.address,
+        TEST_URI,
+        fee,
+        *sign_permit(mock_usdc, permit_user.private_key, factory.address, fee, deadline),
+        {"from": permit_user})
+    tx.wait(1)
+
+    assert mock_nft.ownerOf(1) == permit_user.address
+    assert mock_usdc.balanceOf(factory.address) == admission_fee + fee
+    assert mock_usdc.allowance(permit_user, factory.address) == 0
+
+    # A permit signed by someone else does not approve anything
+    another_user = accounts.add(OTHER_PERMIT_USER_KEY)
+    with pytest.raises(Exception):
+        factory.depositWithPermit(
+            fee,
+            *sign_permit(mock_usdc, another_user.private_key, factory.address, fee, deadline),
+            {"from": permit_user})
+
+    # Bulk top up of credits
+    tx = factory.depositWithPermit(
+        2 * fee,
+        *sign_permit(mock_usdc, permit_user.private_key, factory.address, 2 * fee, deadline),
+        {"from": permit_user})
+    tx.wait(1)
+    assert factory.credits(permit_user) == 2 * fee
+
+
+def test_create_collection(factory, mocks, nft_user, factory_owner):
+    """
+    Testing that users can create a collection as a minimal proxy clone
+    that is admitted and operated by the factory in one transaction
+    """
+    mock_usdt, _, _ = mocks
+
+    admission_fee = factory.admissionFee({'from': nft_user})
+    tx = mock_usdt.approve(factory.address, admission_fee, {"from": nft_user})
+    tx.wait(1)
+
+    # Collections are not available until the implementation is set
+    with pytest.raises(Exception):
+        factory.createCollection("Collection", "COL", admission_fee, {"from": nft_user})
+
+    implementation = GenericNFT.deploy("GenericNFT", "GNFT", {"from": factory_owner})
+    with pytest.raises(Exception):
+        factory.setCollectionImplementation(implementation.address, {"from": nft_user})
+    factory.setCollectionImplementation(implementation.address, {"from": factory_owner})
+
+    tx = factory.createCollection("Collection", "COL", admission_fee, {"from": nft_user})
+    tx.wait(1)
+
+    collection = GenericNFT.at(tx.return_value)
+    assert tx.events["CollectionCreated"]["_owner"] == nft_user
+    assert tx.events["CollectionCreated"]["_collection"] == collection.address
+    assert collection.name() == "Collection"
+    assert collection.symbol() == "COL"
+    assert collection.owner() == factory.address
+    assert collection.locked()
+    assert factory.getUserOfContract.call(collection.address, {"from": factory_owner}) == nft_user
+    assert factory.checkWhitelistAdmission.call({"from": nft_user})
+
+    # Clones cannot be initialized twice
+    with pytest.raises(Exception):
+        collection.initialize("Other", "OTH", nft_user, {"from": nft_user})
+    with pytest.raises(Exception):
+        implementation.initialize("Other", "OTH", nft_user, {"from": nft_user})
+
+    fee = factory.fee({'from': nft_user})
+    tx = mock_usdt.approve(factory.address, fee, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.mintNFTFromAddress(
+        nft_user.address, collection.address, TEST_URI, fee, {"from": nft_user})
+    tx.wait(1)
+
+    assert collection.ownerOf(1) == nft_user.address
+    assert collection.tokenURI(1) == TEST_URI
+    assert implementation.balanceOf(nft_user) == 0
+
+    factory.claimOwnership(collection.address, {"from": nft_user})
+    assert collection.owner() == nft_user
+
+
+def test_apply_cannot_take_over_contracts(factory, mocks, nft_user, factory_owner):
+    """
+    Testing that a whitelisted user cannot register a collection of another user,
+    while the owner can still move it
+    """
+    mock_usdt, _, mock_nft = mocks
+    other_user = get_account(index=3)
+    _, _, other_nft = deploy_mocks(account=other_user)
+    admission_fee = factory.admissionFee({'from': nft_user})
+
+    implementation = GenericNFT.deploy("GenericNFT", "GNFT", {"from": factory_owner})
+    factory.setCollectionImplementation(implementation.address, {"from": factory_owner})
+    mock_usdt.approve(factory.address, 2 * admission_fee, {"from": nft_user})
+    factory.applyToWhitelist(mock_nft.address, admission_fee, {"from": nft_user})
+    tx = factory.createCollection("Collection", "COL", admission_fee, {"from": nft_user})
+    collection = tx.return_value
+
+    mock_usdt.transfer(other_user, 3 * admission_fee, {"from": nft_user})
+    mock_usdt.approve(factory.address, 3 * admission_fee, {"from": other_user})
+    factory.applyToWhitelist(other_nft.address, admission_fee, {"from": other_user})
+    for nft_contract in (mock_nft.address, collection):
+        with pytest.raises(Exception):
+            factory.applyToWhitelist(nft_contract, admission_fee, {"from": other_user})
+        assert factory.getUserOfContract(nft_contract) == nft_user
+        with pytest.raises(Exception):
+            factory.claimOwnership(nft_contract, {"from": other_user})
+    assert GenericNFT.at(collection).owner() == factory.address
+
+    # The user can apply again for its own contract
+    factory.applyToWhitelist(other_nft.address, admission_fee, {"from": other_user})
+    assert factory.getUserOfContract(other_nft) == other_user
+
+    factory.admitToWhitelist(other_user, mock_nft.address, {"from": factory_owner})
+    assert factory.getUserOfContract(mock_nft) == other_user
+
+
+def test_lock_only_applies_to_transfers(factory, mocks, nft_user):
+    """
+    Testing that the factory can mint and delete NFTs without toggling
+    the lock, while transfers are still blocked when the contract is locked
+    """
+    mock_usdt, _, mock_nft = mocks
+    recipient = get_account(index=3)
+
+    admission_fee = factory.admissionFee({'from': nft_user})
+    fee = factory.fee({'from': nft_user})
+    editing_fee = factory.editingFee({'from': nft_user})
+    tx = mock_usdt.approve(factory.address, admission_fee + 2 * fee + editing_fee, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.applyToWhitelist(mock_nft.address, admission_fee, {"from": nft_user})
+    tx.wait(1)
+
+    # Only the owner of the NFT contract can mint
+    with pytest.raises(Exception):
+        mock_nft.mintNFT(recipient, TEST_URI, {"from": recipient})
+
+    tx = mock_nft.transferOwnership(factory.address, {'from': nft_user})
+    tx.wait(1)
+
+    tx = factory.mintNFTFromAddress(nft_user.address, mock_nft.address, TEST_URI, fee, {"from": nft_user})
+    tx.wait(1)
+    assert mock_nft.locked()
+    assert not any(call["function"] in ("lock()", "unlock()") for call in tx.subcalls)
+
+    with pytest.raises(Exception):
+        mock_nft.transferFrom(nft_user, recipient, 1, {"from": nft_user})
+
+    # An unlocked contract stays unlocked after minting and deleting
+    factory.unlockContract(mock_nft.address, {"from": nft_user})
+    tx = factory.mintNFTFromAddress(nft_user.address, mock_nft.address, TEST_URI, fee, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.deleteNFT(mock_nft.address, 2, editing_fee, {"from": nft_user})
+    tx.wait(1)
+    assert not mock_nft.locked()
+
+    mock_nft.transferFrom(nft_user, recipient, 1, {"from": nft_user})
+    assert mock_nft.ownerOf(1) == recipient.address
+
+
+def test_packed_configuration(factory, mocks, nft_user, factory_owner):
+    """
+    Testing that the packed fees, deposit token and contract registry
+    are exposed through the getters and reject values that do not fit
+    """
+    mock_usdt, mock_usdc, mock_nft = mocks
+
+    # Updating a value does not change the ones sharing its slot
+    factory.setFee(MINTING_FEE + 1, {'from': factory_owner})
+    assert factory.fee() == MINTING_FEE + 1
+    assert factory.depositToken() == mock_usdt
+    factory.setDepositToken(mock_usdc.address, {'from': factory_owner})
+    assert factory.fee() == MINTING_FEE + 1
+    assert factory.depositToken() == mock_usdc
+
+    factory.setEditingFee(EDITING_FEE + 1, {'from': factory_owner})
+    assert factory.editingFee() == EDITING_FEE + 1
+    assert factory.admissionFee() == ADMISSION_FEE
+
+    with pytest.raises(Exception):
+        factory.setFee(2 ** 96, {'from': factory_owner})
+    with pytest.raises(Exception):
+        factory.setAdmissionFee(2 ** 128, {'from': factory_owner})
+
+    factory.setFee(MINTING_FEE, {'from': factory_owner})
+    factory.setDepositToken(mock_usdt.address, {'from': factory_owner})
+
+    admission_fee = factory.admissionFee({'from': nft_user})
+    fee = factory.fee({'from': nft_user})
+    tx = mock_usdt.approve(factory.address, admission_fee + 3 * fee, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.applyToWhitelist(mock_nft.address, admission_fee, {"from": nft_user})
+    tx.wait(1)
+    tx = mock_nft.transferOwnership(factory.address, {'from': nft_user})
+    tx.wait(1)
+
+    assert factory.getContractInfo(mock_nft.address) == (nft_user, 0, 0)
+
+    factory.mintNFTFromAddress(nft_user.address, mock_nft.address, TEST_URI, fee, {"from": nft_user})
+    factory.mintBatchFromAddress(
+        [nft_user.address] * 2, mock_nft.address, [TEST_URI] * 2, 2 * fee, {"from": nft_user})
+    assert factory.getContractInfo(mock_nft.address) == (nft_user, 0, 3)
+
+    factory.claimOwnership(mock_nft.address, {'from': nft_user})
+    assert factory.getContractInfo(mock_nft.address) == (ZERO_ADDRESS, 0, 0)
+    assert factory.getContractsOfUser.call(nft_user, {"from": factory_owner}) == 0
+
+
+def test_paginated_enumeration(registered, nft_user, factory_owner):
+    """
+    Testing that the contracts of a user, the whitelist and the live tokens
+    of a collection can be read page by page
+    """
+    factory, mock_usdt, mock_nft = registered
+    _, _, mock_nft2 = deploy_mocks(account=nft_user)
+    _, _, mock_nft3 = deploy_mocks(account=nft_user)
+    members = [get_account(index=index) for index in range(3, 6)]
+
+    factory.admitToWhitelistBatch([nft_user] * 2, [mock_nft2, mock_nft3], {'from': factory_owner})
+    assert factory.getContractsOfUser(nft_user, 0, 2) == [mock_nft, mock_nft2]
+    assert factory.getContractsOfUser(nft_user, 2, 2) == [mock_nft3]
+    assert factory.getContractsOfUser(nft_user, 3, 2) == []
+    assert factory.getContractsOfUser(members[0], 0, 10) == []
+
+    # The last contract takes the position of the released one
+    mock_nft2.transferOwnership(factory.address, {'from': nft_user})
+    factory.claimOwnership(mock_nft2, {'from': nft_user})
+    assert factory.getContractsOfUser(nft_user, 0, 10) == [mock_nft, mock_nft3]
+    assert factory.getContractsOfUser["address"](nft_user, {'from': factory_owner}) == 2
+
+    # Admitting a contract again moves it to the new owner
+    factory.admitToWhitelist(members[0], mock_nft3, {'from': factory_owner})
+    assert factory.getContractsOfUser(nft_user, 0, 10) == [mock_nft]
+    assert factory.getContractsOfUser(members[0], 0, 10) == [mock_nft3]
+
+    factory.addToWhitelistBatch(members, {'from': factory_owner})
+    assert factory.getWhitelist(0, 10) == [nft_user] + members
+    assert factory.getWhitelist(1, 2) == members[:2]
+    assert factory.getWhitelist(4, 2) == []
+
+    # Live tokens skip the burned ones
+    count = 7
+    base_uri = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5a/"
+    editing_fee = factory.editingFee()
+    mock_usdt.approve(factory.address, MINTING_FEE * count + 2 * editing_fee, {"from": nft_user})
+    factory.mintNFTFromAddress(nft_user, mock_nft, TEST_URI, MINTING_FEE, {"from": nft_user})
+    factory.mintConsecutiveFromAddress(
+        nft_user, mock_nft, count - 1, base_uri, MINTING_FEE * (count - 1), {"from": nft_user})
+    factory.deleteNFT(mock_nft, 1, editing_fee, {"from": nft_user})
+    factory.deleteNFT(mock_nft, 4, editing_fee, {"from": nft_user})
+
+    assert mock_nft.totalSupply() == count - 2
+    assert mock_nft.getTokenIds(1, 3) == ([2, 3, 5], 6)
+    assert mock_nft.getTokenIds(6, 3) == ([6, 7], 0)
+    assert mock_nft.getTokenIds(0, 100) == ([2, 3, 5, 6, 7], 0)
+    assert mock_nft.getTokenIds(8, 3) == ([], 0)
+    # An empty page would return the same cursor forever
+    with pytest.raises(Exception):
+        mock_nft.getTokenIds(1, 0)
+
+
+def test_token_locks(registered, nft_user):
+    """
+    Testing that ranges of tokens can be locked and unlocked through the factory,
+    and that the contract lock still blocks every transfer
+    """
+    factory, mock_usdt, mock_nft = registered
+    recipient = get_account(index=3)
+    count = 6
+
+    mock_usdt.approve(factory.address, MINTING_FEE * count, {"from": nft_user})
+    factory.mintConsecutiveFromAddress(
+        nft_user, mock_nft, count, "ipfs://batch/", MINTING_FEE * count, {"from": nft_user})
+
+    # Only the user of the contract can lock its tokens
+    with pytest.raises(Exception):
+        factory.lockTokens(mock_nft, 1, 6, {"from": recipient})
+    with pytest.raises(Exception):
+        mock_nft.lockTokens(1, 6, {"from": nft_user})
+    with pytest.raises(Exception):
+        factory.lockTokens(mock_nft, 4, 3, {"from": nft_user})
+
+    tx = factory.lockTokens(mock_nft, 2, 5, {"from": nft_user})
+    tx.wait(1)
+    assert tx.events["TokensLockChanged"]["locked"]
+    factory.unlockContract(mock_nft, {"from": nft_user})
+    assert [mock_nft.isTokenLocked(token_id) for token_id in range(1, 7)] == [
+        False, True, True, True, True, False]
+
+    mock_nft.transferFrom(nft_user, recipient, 1, {"from": nft_user})
+    mock_nft.transferFrom(nft_user, recipient, 6, {"from": nft_user})
+    with pytest.raises(Exception):
+        mock_nft.transferFrom(nft_user, recipient, 3, {"from": nft_user})
+
+    # Releasing a few tokens leaves the others locked
+    factory.unlockTokens(mock_nft, 3, 3, {"from": nft_user})
+    mock_nft.transferFrom(nft_user, recipient, 3, {"from": nft_user})
+    with pytest.raises(Exception):
+        mock_nft.transferFrom(nft_user, recipient, 4, {"from": nft_user})
+
+    # The contract lock overrides the token locks
+    factory.lockContract(mock_nft, {"from": nft_user})
+    assert mock_nft.isTokenLocked(1)
+    with pytest.raises(Exception):
+        mock_nft.transferFrom(recipient, nft_user, 1, {"from": recipient})
 
+    # Locked tokens can still be deleted
+    editing_fee = factory.editingFee()
+    mock_usdt.approve(factory.address, editing_fee, {"from": nft_user})
+    factory.deleteNFT(mock_nft, 4, editing_fee, {"from": nft_user})
+    assert mock_nft.balanceOf(recipient) == 3
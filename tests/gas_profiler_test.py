@@ -0,0 +1,92 @@
+from scripts.gas_profiler import OVERHEAD, profile_trace, profile_transaction, render_folded, render_text
+from web3 import Web3
+
+import pytest
+
+TEST_URI = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5a/metadata.json"
+ADMISSION_FEE = Web3.toWei(50, "ether")
+MINTING_FEE = Web3.toWei(29, "ether")
+EDITING_FEE = Web3.toWei(23, "ether")
+
+
+@pytest.fixture(scope="module")
+def fees():
+    return (ADMISSION_FEE, MINTING_FEE, EDITING_FEE)
+
+
+def step(fn, depth, jump_depth, gas, gas_cost, address="0xFactory"):
+    return {"fn": fn, "depth": depth, "jumpDepth": jump_depth, "gas": gas, "gasCost": gas_cost, "address": address}
+
+
+def external_calls(node):
+    """
+    Returns every external call made below the node
+    """
+    calls = []
+    for child in node.children.values():
+        if child.kind == "call":
+            calls.append(child)
+        calls.extend(external_calls(child))
+    return calls
+
+
+def test_profile_trace():
+    """
+    Testing that the gas of a trace is attributed to the functions of each call stack,
+    with the gas forwarded by a call charged to the called contract only
+    """
+    trace = [
+        step("Factory.mint", 1, 0, 1000, 10),
+        step("Factory._collectFee", 1, 1, 990, 20),
+        # The CALL forwards 500 gas, of which the token uses 30 and returns the rest
+        step("Factory._collectFee", 1, 1, 970, 500),
+        step("Token.transferFrom", 2, 0, 500, 25, "0xToken"),
+        step("Token.transferFrom", 2, 0, 475, 5, "0xToken"),
+        step("Factory._collectFee", 1, 1, 930, 3),
+        step("Factory.mint", 1, 0, 927, 7),
+        step("Factory._collectFee", 1, 1, 920, 20),
+        step("Factory.mint", 1, 0, 900, 0),
+    ]
+    root = profile_trace(trace, 21100)
+
+    assert root.gas == 21100
+    assert root.find(OVERHEAD)[0].self_gas == 21100 - 100
+
+    mint, = root.find("Factory.mint")
+    assert mint.kind == "call" and mint.calls == 1
+    assert mint.self_gas == 10 + 7
+
+    collect_fee, = root.find("Factory._collectFee")
+    assert collect_fee.kind == "internal" and collect_fee.calls == 2
+    assert collect_fee.self_gas == 20 + 10 + 3 + 20
+    assert collect_fee.gas == collect_fee.self_gas + 30
+
+    transfer, = root.find("Token.transferFrom")
+    assert transfer.kind == "call" and transfer.address == "0xToken"
+    assert transfer.gas == 30
+
+    assert "<transaction>;Factory.mint;Factory._collectFee;Token.transferFrom 30" in render_folded(root).splitlines()
+    assert "Token.transferFrom @ 0xToken" in render_text(root)
+
+
+def test_profile_mint_and_edit(registered, nft_user):
+    """
+    Testing that the profile of real transactions accounts for all their gas
+    and separates the calls to the deposit token and to the NFT contract
+    """
+    factory, mock_usdt, mock_nft = registered
+    mock_usdt.approve(factory.address, MINTING_FEE + EDITING_FEE, {"from": nft_user})
+
+    tx = factory.mintNFTFromAddress(nft_user, mock_nft.address, TEST_URI, MINTING_FEE, {"from": nft_user})
+    tx.wait(1)
+    root = profile_transaction(tx)
+    assert root.gas == tx.gas_used
+
+    entry, = [child for child in root.children.values() if child.kind == "call"]
+    assert entry.address == factory.address
+    assert {node.address for node in external_calls(entry)} == {mock_usdt.address, mock_nft.address}
+
+    tx = factory.changeTokenURI(mock_nft.address, tx.return_value, TEST_URI + "?v=2", EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+    root = profile_transaction(tx.txid)
+    assert root.gas == tx.gas_used
@@ -0,0 +1,776 @@
+from brownie import GenericNFT
+from scripts.helpful_scripts import get_account, deploy_mocks
+from web3 import Web3
+from scripts.deploy import deploy_generic_factory
+from scripts.gas_profiler import profile_transaction, save_profile
+from scripts.contract_size import MAX_RUNTIME_SIZE, deployment_report
+
+from pathlib import Path
+
+import base64
+import json
+import pytest
+import time
+
+TEST_URI = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5a/metadata.json"
+# Directory CID in the default compact format of the collections
+CID_URI = "ipfs://bafybeib4fmtj7jbc66wap5bg3op2weyjcmb5stqz7bfhqxphfgmonwum7a/metadata.json"
+# Fees are kept low so that the mock token supply covers large batches
+ADMISSION_FEE = Web3.toWei(50, "gwei")
+MINTING_FEE = Web3.toWei(29, "gwei")
+EDITING_FEE = Web3.toWei(23, "gwei")
+
+# Maximum relative difference accepted between the gas used by the
+# same call with a small and a large whitelist
+FLAT_GAS_TOLERANCE = 0.01
+
+# Committed gas used by every benchmarked entry point
+GAS_SNAPSHOT_PATH = Path(__file__).parent / "gas_snapshot.json"
+# Maximum relative increase accepted with respect to the snapshot
+GAS_REGRESSION_TOLERANCE = 0.02
+# Deployment report of the contracts before the bytecode was slimmed with custom errors, written by
+# `brownie run scripts/contract_size.py main tests/deployment_baseline.json` with the contracts of the parent of
+# the commit "Slim the factory and NFT bytecode with custom errors and shared checks"
+DEPLOYMENT_BASELINE_PATH = Path(__file__).parent / "deployment_baseline.json"
+
+
+@pytest.fixture(scope="module")
+def fees():
+    return (ADMISSION_FEE, MINTING_FEE, EDITING_FEE)
+
+
+class GasSnapshot:
+    """
+    Compares the gas used by the benchmarks with the committed snapshot
+    """
+    def __init__(self, stored, update, profile_dir=None):
+        self.stored = stored
+        self.update = update
+        self.profile_dir = profile_dir
+        self.measured = {}
+
+    def check(self, name, gas_used, tx=None):
+        """
+        Records the gas used by the benchmark and fails if it is missing from the
+        snapshot or regressed beyond the tolerance, unless the snapshot is being updated.
+        When profiling, the transaction measured by the benchmark is profiled as well
+        """
+        assert name not in self.measured, f"{name} is measured twice, give each measurement its own name"
+        self.measured[name] = gas_used
+        if tx is not None and self.profile_dir is not None:
+            self.profile(name, tx)
+        expected = self.stored.get(name)
+        print(f"{name}: {gas_used} (snapshot {expected})")
+        if self.update:
+            return
+
+        assert expected is not None, (
+            f"{name} is not in the snapshot. Run with --update-gas-snapshot to record it")
+        assert gas_used <= expected * (1 + GAS_REGRESSION_TOLERANCE), (
+            f"{name} used {gas_used} gas, the snapshot allows {expected} "
+            f"+{GAS_REGRESSION_TOLERANCE:.0%}. Run with --update-gas-snapshot "
+            f"if the increase is expected")
+
+    def profile(self, name, tx):
+        """
+        Writes the per-function gas profile of the transaction as text tree and JSON
+        """
+        root = profile_transaction(tx)
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        for extension in ("txt", "json"):
+            save_profile(root, self.profile_dir / f"{name}.{extension}")
+
+    def merged(self):
+        """
+        Returns the snapshot with the measured benchmarks added or replaced,
+        keeping the ones that were not run
+        """
+        snapshot = dict(self.stored)
+        snapshot.update(self.measured)
+        return snapshot
+
+
+@pytest.fixture(scope="module")
+def gas_snapshot(request):
+    """
+    Loads the committed gas snapshot. It is written back with the
+    measured benchmarks only when running with --update-gas-snapshot
+    """
+    stored = {}
+    if GAS_SNAPSHOT_PATH.exists():
+        stored = json.loads(GAS_SNAPSHOT_PATH.read_text())
+
+    profile_dir = request.config.getoption("--gas-profile-dir")
+    snapshot = GasSnapshot(
+        stored,
+        request.config.getoption("--update-gas-snapshot"),
+        Path(profile_dir) if profile_dir else None)
+    yield snapshot
+
+    merged = snapshot.merged()
+    if snapshot.update and merged != stored:
+        GAS_SNAPSHOT_PATH.write_text(json.dumps(merged, indent=2, sort_keys=True) + "\n")
+
+
+def filler_address(index):
+    """
+    Returns a deterministic address to be used to populate the whitelist
+    """
+    return Web3.toChecksumAddress("0x" + format(index + 1, "040x"))
+
+
+def fill_whitelist(factory, factory_owner, size):
+    """
+    Adds size addresses to the whitelist of the factory, 500 for each transaction
+    """
+    for start in range(0, size, 500):
+        addresses = [filler_address(index) for index in range(start, min(start + 500, size))]
+        factory.addToWhitelistBatch(addresses, {'from': factory_owner})
+
+
+def deploy_with_whitelist(nft_user, factory_owner, whitelist_size):
+    """
+    Deploys mocks and factory, fills the whitelist with whitelist_size - 1
+    addresses and then admits nft_user as the last member of the whitelist.
+    The ownership of the mock NFT is transferred to the factory
+    """
+    mock_usdt, mock_usdc, mock_nft = deploy_mocks(account=nft_user)
+
+    factory = deploy_generic_factory(
+        factory_owner,
+        ADMISSION_FEE,
+        MINTING_FEE,
+        EDITING_FEE,
+        mock_usdt.address,
+        force=True
+    )
+
+    fill_whitelist(factory, factory_owner, whitelist_size - 1)
+
+    tx = mock_usdt.approve(factory.address, ADMISSION_FEE, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.applyToWhitelist(mock_nft.address, ADMISSION_FEE, {"from": nft_user})
+    tx.wait(1)
+
+    tx = mock_nft.transferOwnership(factory.address, {'from': nft_user})
+    tx.wait(1)
+
+    return factory, mock_usdt, mock_nft
+
+
+def assert_flat(gas_used):
+    """
+    Checks that the gas used does not depend on the whitelist size
+    """
+    smallest = min(gas_used.values())
+    largest = max(gas_used.values())
+    assert (largest - smallest) <= smallest * FLAT_GAS_TOLERANCE, gas_used
+
+
+def test_whitelist_gas_is_flat(nft_user, factory_owner):
+    """
+    Testing that minting, whitelist checks and whitelist removals
+    cost the same amount of gas with 10 and 10,000 whitelist members
+    """
+    mint_gas = {}
+    check_gas = {}
+    remove_gas = {}
+    for whitelist_size in [10, 10000]:
+        factory, mock_usdt, mock_nft = deploy_with_whitelist(
+            nft_user, factory_owner, whitelist_size)
+
+        tx = mock_usdt.approve(factory.address, MINTING_FEE, {"from": nft_user})
+        tx.wait(1)
+        tx = factory.mintNFTFromAddress(
+            nft_user.address,
+            mock_nft.address,
+            TEST_URI,
+            MINTING_FEE,
+            {"from": nft_user})
+        tx.wait(1)
+        mint_gas[whitelist_size] = tx.gas_used
+
+        check_gas[whitelist_size] = factory.checkWhitelistAdmission.estimate_gas(
+            {"from": nft_user})
+
+        # Removing the first member moves the last one in its position
+        tx = factory.removeFromWhitelist(filler_address(0), {'from': factory_owner})
+        tx.wait(1)
+        remove_gas[whitelist_size] = tx.gas_used
+
+        assert factory.getFromWhitelist.call(0, {'from': factory_owner}) == nft_user
+        assert factory.checkWhitelistAdmission.call({"from": nft_user})
+        assert not factory.checkWhitelistAdmission.call(
+            filler_address(0), {"from": factory_owner})
+
+        print(f"whitelist size {whitelist_size}: mint {mint_gas[whitelist_size]}, "
+              f"check {check_gas[whitelist_size]}, remove {remove_gas[whitelist_size]}")
+
+    assert_flat(mint_gas)
+    assert_flat(check_gas)
+    assert_flat(remove_gas)
+
+
+def test_batch_mint_gas_per_token(registered, nft_user):
+    """
+    Testing that minting through mintBatchFromAddress costs less gas
+    per token than calling mintNFTFromAddress once per token
+    """
+    batch_size = 50
+
+    factory, mock_usdt, mock_nft = registered
+
+    tx = mock_usdt.approve(factory.address, MINTING_FEE * batch_size * 2, {"from": nft_user})
+    tx.wait(1)
+
+    single_gas = 0
+    for _ in range(batch_size):
+        tx = factory.mintNFTFromAddress(
+            nft_user.address,
+            mock_nft.address,
+            TEST_URI,
+            MINTING_FEE,
+            {"from": nft_user})
+        tx.wait(1)
+        single_gas += tx.gas_used
+
+    tx = factory.mintBatchFromAddress(
+        [nft_user.address] * batch_size,
+        mock_nft.address,
+        [TEST_URI] * batch_size,
+        MINTING_FEE * batch_size,
+        {"from": nft_user})
+    tx.wait(1)
+    batch_gas = tx.gas_used
+
+    print(f"gas per token: single {single_gas // batch_size}, batch {batch_gas // batch_size}")
+    assert batch_gas < single_gas
+
+
+def test_consecutive_mint_gas(registered, nft_user):
+    """
+    Testing that consecutive minting costs less gas per token than
+    minting every token on its own, for batches of 1, 10, 100 and 1000 tokens
+    """
+    base_uri = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5a/"
+
+    factory, mock_usdt, mock_nft = registered
+
+    tx = mock_usdt.approve(factory.address, MINTING_FEE * 2000, {"from": nft_user})
+    tx.wait(1)
+
+    tx = factory.mintNFTFromAddress(
+        nft_user.address,
+        mock_nft.address,
+        TEST_URI,
+        MINTING_FEE,
+        {"from": nft_user})
+    tx.wait(1)
+    single_gas = tx.gas_used
+
+    for count in [1, 10, 100, 1000]:
+        tx = factory.mintConsecutiveFromAddress(
+            nft_user.address,
+            mock_nft.address,
+            count,
+            base_uri,
+            MINTING_FEE * count,
+            {"from": nft_user})
+        tx.wait(1)
+
+        print(f"{count} tokens: consecutive {tx.gas_used} ({tx.gas_used // count} per token), "
+              f"single {single_gas * count} ({single_gas} per token)")
+        if count > 1:
+            assert tx.gas_used < single_gas * count
+
+
+def test_cid_storage_gas(registered, nft_user):
+    """
+    Testing that storing the CID digest instead of the full URI
+    reduces the gas used for minting and editing
+    """
+    cid = CID_URI[len("ipfs://b"):].split("/")[0].upper()
+    raw = base64.b32decode(cid + "=" * (-len(cid) % 8))
+    digest = raw[4:]
+    new_digest = bytes(reversed(digest))
+    new_cid = base64.b32encode(raw[:4] + new_digest).decode().lower().rstrip("=")
+    new_uri = "ipfs://b" + new_cid + "/metadata.json"
+
+    factory, mock_usdt, mock_nft = registered
+
+    tx = mock_usdt.approve(
+        factory.address, 3 * MINTING_FEE + 2 * EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+
+    # The first mint initializes the balance of the recipient
+    for _ in range(2):
+        tx = factory.mintNFTFromAddress(
+            nft_user.address, mock_nft.address, TEST_URI, MINTING_FEE, {"from": nft_user})
+        tx.wait(1)
+    uri_mint_gas = tx.gas_used
+
+    tx = factory.mintNFTWithCIDFromAddress(
+        nft_user.address, mock_nft.address, digest, MINTING_FEE, {"from": nft_user})
+    tx.wait(1)
+    cid_mint_gas = tx.gas_used
+    assert mock_nft.tokenURI(3) == CID_URI
+
+    tx = factory.changeTokenURI(
+        mock_nft.address, 1, new_uri, EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+    uri_edit_gas = tx.gas_used
+
+    tx = factory.changeTokenCID(
+        mock_nft.address, 3, new_digest, EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+    cid_edit_gas = tx.gas_used
+    assert mock_nft.tokenURI(3) == new_uri
+
+    print(f"mint: uri {uri_mint_gas}, cid {cid_mint_gas}")
+    print(f"edit: uri {uri_edit_gas}, cid {cid_edit_gas}")
+    assert cid_mint_gas < uri_mint_gas
+    assert cid_edit_gas < uri_edit_gas
+
+
+def test_prepaid_mint_gas(registered, nft_user):
+    """
+    Testing that paying the minting fee with prepaid credits costs
+    less gas than transferring the fee on every mint
+    """
+    factory, mock_usdt, mock_nft = registered
+
+    tx = mock_usdt.approve(factory.address, 3 * MINTING_FEE, {"from": nft_user})
+    tx.wait(1)
+
+    # The first mint initializes the balance of the recipient
+    for _ in range(2):
+        tx = factory.mintNFTFromAddress(
+            nft_user.address, mock_nft.address, TEST_URI, MINTING_FEE, {"from": nft_user})
+        tx.wait(1)
+    transfer_gas = tx.gas_used
+
+    tx = factory.deposit(MINTING_FEE, {"from": nft_user})
+    tx.wait(1)
+
+    tx = factory.mintNFTFromAddress(
+        nft_user.address, mock_nft.address, TEST_URI, MINTING_FEE, {"from": nft_user})
+    tx.wait(1)
+    prepaid_gas = tx.gas_used
+
+    print(f"mint: transfer {transfer_gas}, prepaid {prepaid_gas}, "
+          f"saved {transfer_gas - prepaid_gas}")
+    assert prepaid_gas < transfer_gas
+
+
+def test_clone_collection_gas(nft_user, factory_owner):
+    """
+    Testing that creating a collection as a clone costs less gas than
+    deploying a full GenericNFT, applying and transferring the ownership
+    """
+    mock_usdt, mock_usdc, _ = deploy_mocks(account=nft_user)
+    factory = deploy_generic_factory(
+        factory_owner,
+        ADMISSION_FEE,
+        MINTING_FEE,
+        EDITING_FEE,
+        mock_usdt.address,
+        force=True
+    )
+    implementation = GenericNFT.deploy("GenericNFT", "GNFT", {"from": factory_owner})
+    factory.setCollectionImplementation(implementation.address, {"from": factory_owner})
+
+    tx = mock_usdt.approve(factory.address, 2 * ADMISSION_FEE, {"from": nft_user})
+    tx.wait(1)
+
+    # Full deployment
+    collection = GenericNFT.deploy("Collection", "COL", {"from": nft_user})
+    full_gas = collection.tx.gas_used
+    tx = factory.applyToWhitelist(collection.address, ADMISSION_FEE, {"from": nft_user})
+    tx.wait(1)
+    full_gas += tx.gas_used
+    tx = collection.transferOwnership(factory.address, {'from': nft_user})
+    tx.wait(1)
+    full_gas += tx.gas_used
+
+    # Clone
+    tx = factory.createCollection("Collection", "COL", ADMISSION_FEE, {"from": nft_user})
+    tx.wait(1)
+    clone_gas = tx.gas_used
+
+    print(f"collection: full deploy {full_gas}, clone {clone_gas}")
+    assert clone_gas < full_gas
+
+
+def lock_toggles(tx):
+    """
+    Returns the calls to lock and unlock made during the transaction
+    """
+    return [step["fn"] for step in tx.trace if step["fn"] in ("GenericNFT.lock", "GenericNFT.unlock")]
+
+
+def test_mint_delete_without_lock_toggling_gas(gas_snapshot, registered, nft_user):
+    """
+    Testing that minting and deleting do not toggle the lock of the
+    NFT contract, and that their gas does not regress from the snapshot
+    """
+    factory, mock_usdt, mock_nft = registered
+
+    tx = mock_usdt.approve(
+        factory.address, 2 * MINTING_FEE + EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+
+    for _ in range(2):
+        tx = factory.mintNFTFromAddress(
+            nft_user.address, mock_nft.address, TEST_URI, MINTING_FEE, {"from": nft_user})
+        tx.wait(1)
+    assert lock_toggles(tx) == []
+    mint_gas = tx.gas_used
+    gas_snapshot.check("mintNFTFromAddress[locked contract]", mint_gas, tx)
+
+    tx = factory.deleteNFT(mock_nft.address, 1, EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+    assert lock_toggles(tx) == []
+    delete_gas = tx.gas_used
+    gas_snapshot.check("deleteNFT[locked contract]", delete_gas, tx)
+
+    # The round trip that the factory used to pay on every mint and delete
+    tx = factory.unlockContract(mock_nft.address, {"from": nft_user})
+    tx.wait(1)
+    unlock_gas = tx.gas_used
+    tx = factory.lockContract(mock_nft.address, {"from": nft_user})
+    tx.wait(1)
+    lock_gas = tx.gas_used
+
+    print(f"mint {mint_gas}, delete {delete_gas}, "
+          f"avoided lock round trip up to {unlock_gas + lock_gas}")
+    assert mock_nft.locked()
+
+
+def storage_slots_read(tx, contract):
+    """
+    Returns the distinct storage slots read by the contract during the transaction
+    """
+    return {
+        step["stack"][-1]
+        for step in tx.trace
+        if step["op"] == "SLOAD" and step["address"] == contract.address
+    }
+
+
+def storage_slots_written(tx, contract):
+    """
+    Returns the number of SSTORE executed by the contract during the transaction
+    """
+    return sum(1 for step in tx.trace if step["op"] == "SSTORE" and step["address"] == contract.address)
+
+
+@pytest.mark.parametrize("token_count", [1, 256, 1000])
+def test_benchmark_token_locks(gas_snapshot, token_count, registered, nft_user):
+    """
+    Benchmarks locking and unlocking ranges of tokens, which write one
+    storage slot for every 256 tokens instead of one for every token
+    """
+    suffix = f"[tokens={token_count}]"
+    factory, _, mock_nft = registered
+    # Not aligned to the 256 tokens of each slot
+    first_token_id = 100
+    last_token_id = first_token_id + token_count - 1
+    slots = (last_token_id >> 8) - (first_token_id >> 8) + 1
+
+    tx = factory.lockTokens(mock_nft, first_token_id, last_token_id, {"from": nft_user})
+    tx.wait(1)
+    assert storage_slots_written(tx, mock_nft) == slots
+    gas_snapshot.check("lockTokens" + suffix, tx.gas_used, tx)
+
+    tx = factory.unlockTokens(mock_nft, first_token_id, last_token_id, {"from": nft_user})
+    tx.wait(1)
+    assert storage_slots_written(tx, mock_nft) == slots
+    gas_snapshot.check("unlockTokens" + suffix, tx.gas_used, tx)
+
+    assert mock_nft.isTokenLocked(first_token_id) == mock_nft.locked()
+    print(f"{token_count} tokens: {slots} slots written, {tx.gas_used} gas to unlock")
+
+
+def test_packed_storage_reads(registered, nft_user):
+    """
+    Testing that minting and editing read the packed configuration and
+    the contract registry entry with a single storage slot each.
+    Minting reads the whitelist entry of the user, the owner, the payment
+    configuration, the credits of the user and the contract registry entry.
+    Editing also reads the slot of the admission and editing fees
+    """
+    factory, mock_usdt, mock_nft = registered
+
+    tx = mock_usdt.approve(factory.address, MINTING_FEE + EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+
+    tx = factory.mintNFTFromAddress(
+        nft_user.address, mock_nft.address, TEST_URI, MINTING_FEE, {"from": nft_user})
+    tx.wait(1)
+    mint_slots = storage_slots_read(tx, factory)
+
+    tx = factory.changeTokenURI(
+        mock_nft.address, 1, TEST_URI, EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+    edit_slots = storage_slots_read(tx, factory)
+
+    print(f"factory slots read: mint {len(mint_slots)}, edit {len(edit_slots)}")
+    assert len(mint_slots) <= 5
+    assert len(edit_slots) <= 6
+
+
+@pytest.mark.parametrize("batch_size", [1, 50, 500])
+def test_benchmark_batch_admin(gas_snapshot, batch_size, factory, factory_owner):
+    """
+    Benchmarks the gas per entry of the batch whitelist operations and checks that
+    batches of more than one entry cost less per entry than the single entry calls
+    """
+    suffix = f"[batch={batch_size}]"
+    owners = [filler_address(index) for index in range(batch_size)]
+    nft_contracts = [filler_address(10000 + index) for index in range(batch_size)]
+
+    tx = factory.addToWhitelist(filler_address(20000), {'from': factory_owner})
+    tx.wait(1)
+    single_add = tx.gas_used
+    tx = factory.removeFromWhitelist(filler_address(20000), {'from': factory_owner})
+    tx.wait(1)
+    single_remove = tx.gas_used
+    tx = factory.admitToWhitelist(filler_address(20000), filler_address(30000), {'from': factory_owner})
+    tx.wait(1)
+    single_admit = tx.gas_used
+
+    tx = factory.addToWhitelistBatch(owners, {'from': factory_owner})
+    tx.wait(1)
+    assert tx.return_value == batch_size
+    add_per_entry = tx.gas_used // batch_size
+    gas_snapshot.check("addToWhitelistBatch per entry" + suffix, add_per_entry)
+
+    tx = factory.removeFromWhitelistBatch(owners, {'from': factory_owner})
+    tx.wait(1)
+    assert tx.return_value == batch_size
+    remove_per_entry = tx.gas_used // batch_size
+    gas_snapshot.check("removeFromWhitelistBatch per entry" + suffix, remove_per_entry)
+
+    tx = factory.admitToWhitelistBatch(owners, nft_contracts, {'from': factory_owner})
+    tx.wait(1)
+    assert tx.return_value == batch_size
+    admit_per_entry = tx.gas_used // batch_size
+    gas_snapshot.check("admitToWhitelistBatch per entry" + suffix, admit_per_entry)
+
+    print(f"batch {batch_size} gas per entry: add {add_per_entry} (single {single_add}), "
+          f"remove {remove_per_entry} (single {single_remove}), admit {admit_per_entry} (single {single_admit})")
+    if batch_size > 1:
+        assert add_per_entry < single_add
+        assert remove_per_entry < single_remove
+        assert admit_per_entry < single_admit
+
+
+@pytest.mark.parametrize("whitelist_size", [1, 100, 1000])
+def test_benchmark_whitelist_management(gas_snapshot, whitelist_size, nft_user, factory_owner):
+    """
+    Benchmarks the whitelist management entry points with whitelists of different sizes
+    """
+    new_user = get_account(index=3)
+    suffix = f"[whitelist={whitelist_size}]"
+
+    factory, mock_usdt, mock_nft = deploy_with_whitelist(nft_user, factory_owner, whitelist_size)
+    _, _, other_nft = deploy_mocks(account=new_user)
+    _, _, admitted_nft = deploy_mocks(account=new_user)
+
+    gas_snapshot.check(
+        "checkWhitelistAdmission" + suffix,
+        factory.checkWhitelistAdmission.estimate_gas({"from": nft_user}))
+
+    tx = factory.addToWhitelist(filler_address(whitelist_size), {'from': factory_owner})
+    tx.wait(1)
+    gas_snapshot.check("addToWhitelist" + suffix, tx.gas_used, tx)
+
+    tx = factory.removeFromWhitelist(filler_address(whitelist_size), {'from': factory_owner})
+    tx.wait(1)
+    gas_snapshot.check("removeFromWhitelist" + suffix, tx.gas_used, tx)
+
+    tx = mock_usdt.transfer(new_user, ADMISSION_FEE, {"from": nft_user})
+    tx.wait(1)
+    tx = mock_usdt.approve(factory.address, ADMISSION_FEE, {"from": new_user})
+    tx.wait(1)
+    tx = factory.applyToWhitelist(other_nft.address, ADMISSION_FEE, {"from": new_user})
+    tx.wait(1)
+    gas_snapshot.check("applyToWhitelist" + suffix, tx.gas_used, tx)
+
+    tx = factory.admitToWhitelist(new_user, admitted_nft.address, {"from": factory_owner})
+    tx.wait(1)
+    gas_snapshot.check("admitToWhitelist" + suffix, tx.gas_used, tx)
+
+    tx = other_nft.transferOwnership(factory.address, {'from': new_user})
+    tx.wait(1)
+    tx = factory.claimOwnership(other_nft.address, {'from': new_user})
+    tx.wait(1)
+    gas_snapshot.check("claimOwnership" + suffix, tx.gas_used, tx)
+
+
+@pytest.mark.parametrize("uri_length", [32, 80, 256])
+def test_benchmark_token_uri_length(gas_snapshot, uri_length, registered, nft_user):
+    """
+    Benchmarks minting, editing and deleting tokens with URIs of different lengths
+    """
+    suffix = f"[uri={uri_length}]"
+    uri = "ipfs://" + "a" * (uri_length - len("ipfs://"))
+    new_uri = "ipfs://" + "b" * (uri_length - len("ipfs://"))
+
+    factory, mock_usdt, mock_nft = registered
+
+    tx = mock_usdt.approve(
+        factory.address, 2 * MINTING_FEE + 2 * EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+
+    # The first mint initializes the balance of the recipient
+    for _ in range(2):
+        tx = factory.mintNFTFromAddress(
+            nft_user.address, mock_nft.address, uri, MINTING_FEE, {"from": nft_user})
+        tx.wait(1)
+    gas_snapshot.check("mintNFTFromAddress" + suffix, tx.gas_used, tx)
+
+    tx = factory.changeTokenURI(mock_nft.address, 2, new_uri, EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+    gas_snapshot.check("changeTokenURI" + suffix, tx.gas_used, tx)
+
+    tx = factory.deleteNFT(mock_nft.address, 2, EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+    gas_snapshot.check("deleteNFT" + suffix, tx.gas_used, tx)
+
+
+@pytest.mark.parametrize("batch_size", [1, 10, 50])
+def test_benchmark_batch_size(gas_snapshot, batch_size, registered, nft_user):
+    """
+    Benchmarks the batch minting entry points with batches of different sizes
+    """
+    suffix = f"[batch={batch_size}]"
+    base_uri = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5a/"
+
+    factory, mock_usdt, mock_nft = registered
+
+    tx = mock_usdt.approve(factory.address, 2 * batch_size * MINTING_FEE, {"from": nft_user})
+    tx.wait(1)
+
+    tx = factory.mintBatchFromAddress(
+        [nft_user.address] * batch_size,
+        mock_nft.address,
+        [TEST_URI] * batch_size,
+        batch_size * MINTING_FEE,
+        {"from": nft_user})
+    tx.wait(1)
+    gas_snapshot.check("mintBatchFromAddress" + suffix, tx.gas_used, tx)
+
+    tx = factory.mintConsecutiveFromAddress(
+        nft_user.address,
+        mock_nft.address,
+        batch_size,
+        base_uri,
+        batch_size * MINTING_FEE,
+        {"from": nft_user})
+    tx.wait(1)
+    gas_snapshot.check("mintConsecutiveFromAddress" + suffix, tx.gas_used, tx)
+
+
+def test_benchmark_other_entry_points(gas_snapshot, registered, nft_user, factory_owner):
+    """
+    Benchmarks deposits, compact URIs and collection creation
+    """
+    cid = CID_URI[len("ipfs://b"):].split("/")[0].upper()
+    digest = base64.b32decode(cid + "=" * (-len(cid) % 8))[4:]
+
+    factory, mock_usdt, mock_nft = registered
+    implementation = GenericNFT.deploy("GenericNFT", "GNFT", {"from": factory_owner})
+    factory.setCollectionImplementation(implementation.address, {"from": factory_owner})
+
+    tx = mock_usdt.approve(
+        factory.address, ADMISSION_FEE + 2 * MINTING_FEE + EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+
+    tx = factory.deposit(2 * MINTING_FEE + EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+    gas_snapshot.check("deposit", tx.gas_used, tx)
+
+    # Paid with the credits deposited above
+    for _ in range(2):
+        tx = factory.mintNFTWithCIDFromAddress(
+            nft_user.address, mock_nft.address, digest, MINTING_FEE, {"from": nft_user})
+        tx.wait(1)
+    gas_snapshot.check("mintNFTWithCIDFromAddress[credits]", tx.gas_used, tx)
+
+    tx = factory.changeTokenCID(
+        mock_nft.address, 2, bytes(reversed(digest)), EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+    gas_snapshot.check("changeTokenCID[credits]", tx.gas_used, tx)
+
+    tx = factory.createCollection("Collection", "COL", ADMISSION_FEE, {"from": nft_user})
+    tx.wait(1)
+    gas_snapshot.check("createCollection", tx.gas_used, tx)
+
+
+@pytest.mark.parametrize("page_size", [10, 100])
+def test_benchmark_enumeration(gas_snapshot, page_size, registered, nft_user, factory_owner):
+    """
+    Benchmarks the paginated views, reporting their gas and read latency,
+    and the write gas of the entry points maintaining the enumeration
+    """
+    suffix = f"[page={page_size}]"
+    factory, mock_usdt, mock_nft = registered
+    base_uri = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5a/"
+
+    # One token out of ten is burned, so that pages skip gaps
+    token_count = 2 * page_size
+    tx = mock_usdt.approve(
+        factory.address, MINTING_FEE * token_count + EDITING_FEE * token_count, {"from": nft_user})
+    tx.wait(1)
+    tx = factory.mintConsecutiveFromAddress(
+        nft_user.address, mock_nft.address, token_count, base_uri, MINTING_FEE * token_count,
+        {"from": nft_user})
+    tx.wait(1)
+    for token_id in range(1, token_count + 1, 10):
+        tx = factory.deleteNFT(mock_nft.address, token_id, EDITING_FEE, {"from": nft_user})
+        tx.wait(1)
+    gas_snapshot.check("deleteNFT consecutive token" + suffix, tx.gas_used, tx)
+
+    fill_whitelist(factory, factory_owner, token_count)
+    admitted = [filler_address(10000 + index) for index in range(page_size)]
+    tx = factory.admitToWhitelistBatch([nft_user.address] * page_size, admitted, {"from": factory_owner})
+    tx.wait(1)
+    gas_snapshot.check("admitToWhitelistBatch per contract of one user" + suffix, tx.gas_used // page_size)
+
+    reads = {
+        "getTokenIds": (mock_nft.getTokenIds, (1, page_size)),
+        "getContractsOfUser": (factory.getContractsOfUser["address,uint256,uint256"], (nft_user, 0, page_size)),
+        "getWhitelist": (factory.getWhitelist, (0, page_size)),
+    }
+    for name, (method, args) in reads.items():
+        started = time.perf_counter()
+        page = method(*args)
+        latency = time.perf_counter() - started
+        gas_snapshot.check(name + suffix, method.estimate_gas(*args))
+        print(f"{name}{suffix}: {latency * 1000:.1f} ms")
+
+        items = page[0] if name == "getTokenIds" else page
+        assert len(items) == page_size
+
+
+def test_benchmark_deployment(gas_snapshot, factory_owner):
+    """
+    Benchmarks the deployment gas of the factory and of the NFT contract, and checks
+    that their runtime bytecode is below the EIP-170 limit and smaller and cheaper
+    to deploy than in the baseline recorded before the bytecode was slimmed
+    """
+    assert DEPLOYMENT_BASELINE_PATH.exists(), (
+        f"{DEPLOYMENT_BASELINE_PATH.name} is missing, write it with scripts/contract_size.py "
+        f"and the contracts before they were slimmed with custom errors")
+    baseline = json.loads(DEPLOYMENT_BASELINE_PATH.read_text())
+
+    for name, measures in deployment_report(factory_owner).items():
+        gas_snapshot.check("deploy " + name, measures["deployment_gas"])
+        before = baseline[name]
+        print(f"{name}: runtime {measures['runtime_size']} bytes (baseline {before['runtime_size']}), "
+              f"init code {measures['initcode_size']} bytes (baseline {before['initcode_size']}), "
+              f"deployment {measures['deployment_gas']} gas (baseline {before['deployment_gas']})")
+        assert measures["runtime_size"] < MAX_RUNTIME_SIZE
+        assert measures["runtime_size"] < before["runtime_size"]
+        assert measures["deployment_gas"] < before["deployment_gas"]
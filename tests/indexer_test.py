@@ -0,0 +1,157 @@
+from brownie import GenericNFT, chain
+from scripts.helpful_scripts import get_account
+from scripts.indexer import FactoryIndexer
+from scripts.vouchers import sign_voucher
+from web3 import Web3
+
+import datetime
+import pytest
+
+TEST_URI = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5a/metadata.json"
+TEST_URI2 = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5b/metadata.json"
+ADMISSION_FEE = Web3.toWei(50, "ether")
+MINTING_FEE = Web3.toWei(29, "ether")
+EDITING_FEE = Web3.toWei(23, "ether")
+
+
+@pytest.fixture(scope="module")
+def fees():
+    return (ADMISSION_FEE, MINTING_FEE, EDITING_FEE)
+
+
+def test_index_factory_events(registered, nft_user, factory_owner, tmp_path):
+    """
+    Testing that the indexer stores the factory activity, answers the
+    dashboard queries and resumes from its checkpoint
+    """
+    factory, mock_usdt, mock_nft = registered
+    recipient = get_account(index=3)
+    start_block = factory.tx.block_number
+
+    tx = mock_usdt.approve(factory.address, 3 * MINTING_FEE + EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+    factory.mintNFTFromAddress(nft_user.address, mock_nft.address, TEST_URI, MINTING_FEE, {"from": nft_user})
+    factory.mintBatchFromAddress(
+        [nft_user.address, recipient.address], mock_nft.address, [TEST_URI] * 2, 2 * MINTING_FEE,
+        {"from": nft_user})
+    factory.changeTokenURI(mock_nft.address, 2, TEST_URI2, EDITING_FEE, {"from": nft_user})
+
+    database = tmp_path / "events.db"
+    indexer = FactoryIndexer(factory.address, str(database), batch_size=3, confirmations=0)
+    assert indexer.sync(from_block=start_block) == 10
+    assert indexer.last_block == chain.height
+
+    assert indexer.whitelist() == [nft_user.address]
+    assert indexer.contracts_of_user(nft_user) == [mock_nft.address]
+    assert indexer.user_of_contract(mock_nft) == nft_user
+    assert indexer.user_of_contract(recipient) is None
+    assert indexer.fees_collected() == ADMISSION_FEE + 3 * MINTING_FEE + EDITING_FEE
+
+    today = datetime.datetime.utcfromtimestamp(chain[-1].timestamp).strftime("%Y-%m-%d")
+    assert indexer.mints_per_day(mock_nft) == [(mock_nft.address, today, 3)]
+
+    mints = indexer.connection.execute(
+        "SELECT token_id, caller, recipient, fee FROM mints ORDER BY block_number, log_index").fetchall()
+    assert mints == [
+        ("1", nft_user.address, nft_user.address, str(MINTING_FEE)),
+        ("2", nft_user.address, nft_user.address, str(2 * MINTING_FEE)),
+        ("3", nft_user.address, recipient.address, "0"),
+    ]
+
+    update = indexer.connection.execute(
+        "SELECT collection, token_id, caller, old_uri, new_uri, fee FROM attribute_updates").fetchall()
+    assert update == [(mock_nft.address, "2", nft_user.address, TEST_URI, TEST_URI2, str(EDITING_FEE))]
+    indexer.close()
+
+    # A new indexer on the same database only processes the blocks after the checkpoint
+    tx = mock_usdt.approve(factory.address, EDITING_FEE, {"from": nft_user})
+    tx.wait(1)
+    factory.deleteNFT(mock_nft.address, 3, EDITING_FEE, {"from": nft_user})
+    factory.setFee(MINTING_FEE + 1, {"from": factory_owner})
+    factory.claimOwnership(mock_nft.address, {"from": nft_user})
+    chain.sleep(86400)
+    chain.mine()
+
+    indexer = FactoryIndexer(factory.address, str(database), confirmations=0)
+    assert indexer.sync() == 5
+    assert indexer.whitelist() == []
+    assert indexer.contracts_of_user(nft_user) == []
+    assert indexer.user_of_contract(mock_nft) is None
+    assert indexer.fees_collected() == ADMISSION_FEE + 3 * MINTING_FEE + 2 * EDITING_FEE
+    assert indexer.fees_collected(since=chain[-1].timestamp) == 0
+
+    deletion = indexer.connection.execute("SELECT collection, token_id, fee FROM deletions").fetchall()
+    assert deletion == [(mock_nft.address, "3", str(EDITING_FEE))]
+    fee_change = indexer.connection.execute("SELECT old_value, new_value FROM fee_changes").fetchall()
+    assert fee_change == [(str(MINTING_FEE), str(MINTING_FEE + 1))]
+    assert indexer.sync() == 0
+    indexer.close()
+
+
+def test_deposits_are_not_fees(registered, nft_user):
+    """
+    Testing that prepaid credits count as fees only when they are spent
+    """
+    factory, mock_usdt, mock_nft = registered
+    start_block = chain.height + 1
+
+    tx = mock_usdt.approve(factory.address, 2 * MINTING_FEE, {"from": nft_user})
+    tx.wait(1)
+    factory.deposit(2 * MINTING_FEE, {"from": nft_user})
+
+    indexer = FactoryIndexer(factory.address, confirmations=0)
+    assert indexer.sync(from_block=start_block) == 1
+    assert indexer.fees_collected() == 0
+
+    factory.mintNFTFromAddress(nft_user.address, mock_nft.address, TEST_URI, MINTING_FEE, {"from": nft_user})
+    assert indexer.sync() == 2
+    assert indexer.fees_collected() == MINTING_FEE
+
+    credit_uses = indexer.connection.execute("SELECT sender, amount FROM credit_uses").fetchall()
+    assert credit_uses == [(nft_user.address, str(MINTING_FEE))]
+    indexer.close()
+
+
+def test_index_whitelist_collections_and_vouchers(registered, nft_user, factory_owner):
+    """
+    Testing that the whitelist, the created collections and the voucher nonces
+    are rebuilt from the logs, and that unconfirmed blocks are left to the next sync
+    """
+    factory, mock_usdt, mock_nft = registered
+    member = get_account(index=3)
+    start_block = factory.tx.block_number
+
+    factory.addToWhitelist(member, {"from": factory_owner})
+    factory.removeFromWhitelist(member, {"from": factory_owner})
+    factory.addToWhitelist(member, {"from": factory_owner})
+
+    implementation = GenericNFT.deploy("GenericNFT", "GNFT", {"from": factory_owner})
+    factory.setCollectionImplementation(implementation.address, {"from": factory_owner})
+    mock_usdt.approve(factory.address, ADMISSION_FEE + MINTING_FEE, {"from": nft_user})
+    collection = factory.createCollection("Collection", "COL", ADMISSION_FEE, {"from": nft_user}).return_value
+
+    voucher, signature = sign_voucher(
+        factory, nft_user.private_key, mock_nft, TEST_URI, MINTING_FEE, chain.time() + 3600, 1)
+    tx = factory.redeemVoucher(voucher, signature, {"from": nft_user})
+    token_id = tx.return_value
+    factory.cancelVoucher(2, {"from": nft_user})
+    chain.mine(2)
+
+    indexer = FactoryIndexer(factory.address, confirmations=2)
+    indexer.sync(from_block=start_block)
+    assert indexer.last_block == chain.height - 2
+    assert indexer.is_voucher_nonce_used(nft_user, 2)
+    assert indexer.sync() == 0
+
+    assert indexer.whitelist() == [nft_user.address, member.address]
+    assert indexer.is_whitelisted(member)
+    assert indexer.collections_created(nft_user) == [collection]
+    assert indexer.contracts_of_user(nft_user) == [mock_nft.address, collection]
+    assert indexer.is_voucher_nonce_used(nft_user, 1)
+    assert not indexer.is_voucher_nonce_used(nft_user, 3)
+
+    redemption = indexer.connection.execute(
+        "SELECT signer, nonce, collection, token_id FROM voucher_redemptions").fetchall()
+    assert redemption == [(nft_user.address, "1", mock_nft.address, str(token_id))]
+    assert indexer.fees_collected() == ADMISSION_FEE + MINTING_FEE
+    indexer.close()
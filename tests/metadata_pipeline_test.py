@@ -0,0 +1,126 @@
+from scripts.metadata_pipeline import (
+    RAW_CODEC, DAG_PB_CODEC, benchmark, build_jobs, cid_bytes, cid_digest, cid_string, directory_cid, mint_jobs,
+    process_batch, read_jobs)
+from web3 import Web3
+
+import json
+import os
+import pytest
+
+ADMISSION_FEE = Web3.toWei(50, "gwei")
+MINTING_FEE = Web3.toWei(29, "gwei")
+EDITING_FEE = Web3.toWei(23, "gwei")
+
+
+@pytest.fixture(scope="module")
+def fees():
+    return (ADMISSION_FEE, MINTING_FEE, EDITING_FEE)
+
+
+def write_manifest(path, count, recipient="0x" + "ab" * 20):
+    with open(path, "w") as manifest_file:
+        for index in range(count):
+            item = {"recipient": recipient, "name": f"Token #{index}", "attributes": [{"value": index}]}
+            manifest_file.write(json.dumps(item) + "\n")
+
+
+def test_cid():
+    """
+    Testing the CIDs against the ones computed by IPFS for the empty file and the empty directory
+    """
+    assert cid_string(cid_bytes(RAW_CODEC, b"")) == "bafkreihdwdcefgh4dqkjv67uzcmw7ojee6xedzdetojuzjevtenxquvyku"
+    assert cid_string(cid_bytes(DAG_PB_CODEC, bytes([0x0a, 0x02, 0x08, 0x01]))) == \
+        "bafybeiczsscdsbs7ffqz55asqdf3smv6klcw3gofszvwlyarci47bgf354"
+
+    cid = directory_cid("metadata.json", b'{"name":"Token"}')
+    assert cid.startswith("bafybei") and len(cid) == 59
+    assert cid_string(cid_bytes(DAG_PB_CODEC, b"")[:4] + cid_digest(cid)) == cid
+    assert cid != directory_cid("metadata.json", b'{"name":"Other"}')
+    assert cid != directory_cid("other.json", b'{"name":"Token"}')
+
+
+def test_build_jobs_resumes(tmp_path):
+    """
+    Testing that the job file follows the manifest order and that an interrupted
+    run resumes after the last complete row without computing the others again
+    """
+    manifest_path = str(tmp_path / "manifest.jsonl")
+    write_manifest(manifest_path, 25)
+
+    full_path = str(tmp_path / "full.csv")
+    output_dir = str(tmp_path / "metadata")
+    assert build_jobs(manifest_path, full_path, output_dir, workers=2, batch_size=4, max_pending=2) == 25
+    rows = list(read_jobs(full_path))
+    assert len(rows) == 25 and len(set(uri for _, uri in rows)) == 25
+
+    recipient, uri = rows[7]
+    cid = uri[len("ipfs://"):].split("/")[0]
+    with open(os.path.join(output_dir, cid, "metadata.json"), "rb") as metadata_file:
+        content = metadata_file.read()
+    assert json.loads(content)["name"] == "Token #7"
+    assert directory_cid("metadata.json", content) == cid
+
+    # Interrupted while writing the 11th row
+    with open(full_path, newline="") as full_file:
+        lines = full_file.readlines()
+    interrupted_path = str(tmp_path / "interrupted.csv")
+    with open(interrupted_path, "w", newline="") as interrupted_file:
+        interrupted_file.write("".join(lines[:10]) + lines[10][:20])
+
+    assert build_jobs(manifest_path, interrupted_path, workers=2, batch_size=4) == 15
+    assert list(read_jobs(interrupted_path)) == rows
+    assert build_jobs(manifest_path, interrupted_path, workers=2, batch_size=4) == 0
+
+
+def test_mint_jobs(registered, nft_user, tmp_path):
+    """
+    Testing that the jobs are minted in chunks and that a second run
+    does not mint the jobs already minted
+    """
+    factory, mock_usdt, mock_nft = registered
+    manifest_path = str(tmp_path / "manifest.jsonl")
+    jobs_path = str(tmp_path / "jobs.csv")
+    write_manifest(manifest_path, 7, nft_user.address)
+    build_jobs(manifest_path, jobs_path, workers=2, batch_size=3)
+
+    mock_usdt.approve(factory.address, 7 * MINTING_FEE, {"from": nft_user})
+    token_ids = mint_jobs(factory, mock_nft.address, jobs_path, nft_user, chunk_size=3)
+
+    assert len(token_ids) == 7
+    for token_id, (recipient, uri) in zip(token_ids, read_jobs(jobs_path)):
+        assert mock_nft.ownerOf(token_id) == recipient
+        assert mock_nft.tokenURI(token_id) == uri
+    with open(jobs_path + ".minted") as progress_file:
+        assert progress_file.read() == "7"
+
+    assert mint_jobs(factory, mock_nft.address, jobs_path, nft_user, chunk_size=3) == []
+
+
+def test_mint_with_cid(registered, nft_user):
+    """
+    Testing that the URI of a pipeline item minted as a CID digest is rebuilt
+    by the collection with its default compact format
+    """
+    factory, mock_usdt, mock_nft = registered
+    (recipient, uri), = process_batch([{"recipient": nft_user.address, "name": "Token #0"}])
+    cid = uri[len("ipfs://"):].split("/")[0]
+
+    mock_usdt.approve(factory.address, MINTING_FEE, {"from": nft_user})
+    tx = factory.mintNFTWithCIDFromAddress(
+        recipient, mock_nft.address, cid_digest(cid), MINTING_FEE, {"from": nft_user})
+    tx.wait(1)
+    assert mock_nft.tokenURI(tx.return_value) == uri
+
+    with pytest.raises(ValueError):
+        cid_digest(cid_string(cid_bytes(RAW_CODEC, b"")))
+
+
+def test_benchmark_throughput():
+    """
+    Benchmarks the URIs computed per second and per core with one and two workers
+    """
+    for workers in (1, 2):
+        result = benchmark(item_count=5000, workers=workers, batch_size=500)
+        print(f"{workers} workers: {result['items_per_second']:.0f} items/s, "
+              f"{result['items_per_second_per_core']:.0f} items/s per core")
+        assert result["items"] == 5000
@@ -0,0 +1,108 @@
+from brownie import MockLegacyFactory
+from scripts.helpful_scripts import get_account, deploy_mocks
+from scripts.merkle_whitelist import MigrationTree, pairs_from_factory
+from web3 import Web3
+
+import pytest
+
+ADMISSION_FEE = Web3.toWei(50, "ether")
+MINTING_FEE = Web3.toWei(29, "ether")
+EDITING_FEE = Web3.toWei(23, "ether")
+
+
+@pytest.fixture(scope="module")
+def fees():
+    return (ADMISSION_FEE, MINTING_FEE, EDITING_FEE)
+
+
+def filler_pair(index):
+    """
+    Returns a deterministic (owner, NFT contract) pair of another migrated user
+    """
+    return (
+        Web3.toChecksumAddress("0x" + format(2 * index + 1, "040x")),
+        Web3.toChecksumAddress("0x" + format(2 * index + 2, "040x")),
+    )
+
+
+def test_claim_migration(factory, mocks, nft_user, factory_owner):
+    """
+    Testing that contracts of the migration tree can be admitted once,
+    by their owner or by a relayer, and that other contracts are rejected
+    """
+    mock_usdt, _, mock_nft = mocks
+    _, _, mock_nft2 = deploy_mocks(account=nft_user)
+    relayer = get_account(index=3)
+
+    # An odd number of leaves exercises the nodes without sibling
+    pairs = [(nft_user, mock_nft), (nft_user, mock_nft2)] + [filler_pair(index) for index in range(5)]
+    tree = MigrationTree(pairs)
+
+    with pytest.raises(Exception):
+        factory.setMigrationRoot(tree.root, {"from": nft_user})
+    factory.setMigrationRoot(tree.root, {"from": factory_owner})
+    assert factory.migrationRoot() == tree.root.hex()
+
+    # A valid proof for a different pair is rejected
+    with pytest.raises(Exception):
+        factory.claimMigration(relayer, mock_nft, tree.proof(nft_user, mock_nft), {"from": relayer})
+
+    tx = factory.claimMigration(nft_user, mock_nft, tree.proof(nft_user, mock_nft), {"from": relayer})
+    tx.wait(1)
+    assert tx.events["ContractAdmitted"]["user"] == nft_user
+    assert factory.getContractInfo(mock_nft.address)[0] == nft_user
+    assert factory.checkWhitelistAdmission.call({"from": nft_user})
+
+    with pytest.raises(Exception):
+        factory.claimMigration(nft_user, mock_nft, tree.proof(nft_user, mock_nft), {"from": nft_user})
+
+    factory.claimMigration(nft_user, mock_nft2, tree.proof(nft_user, mock_nft2), {"from": nft_user})
+    assert factory.getContractsOfUser.call(nft_user, {"from": factory_owner}) == 2
+
+    # Every leaf of the tree can be proven
+    for owner, nft_contract in tree.pairs:
+        if nft_contract in (mock_nft.address, mock_nft2.address):
+            continue
+        factory.claimMigration(owner, nft_contract, tree.proof(owner, nft_contract), {"from": relayer})
+        assert factory.getContractInfo(nft_contract)[0] == owner
+
+    # Migrated contracts are operated like the ones that applied
+    mock_nft.transferOwnership(factory.address, {"from": nft_user})
+    mock_usdt.approve(factory.address, MINTING_FEE, {"from": nft_user})
+    factory.mintNFTFromAddress(nft_user, mock_nft, "ipfs://migrated", MINTING_FEE, {"from": nft_user})
+    assert mock_nft.ownerOf(1) == nft_user
+
+
+def test_pairs_from_legacy_factory(factory, mocks, nft_user, factory_owner):
+    """
+    Testing that the contracts currently admitted to a version 1 factory are rebuilt
+    from a list of candidates and its owner-only getter, and can be claimed on the new factory
+    """
+    mock_usdt, _, mock_nft = mocks
+    _, _, mock_nft2 = deploy_mocks(account=nft_user)
+    _, _, released_nft = deploy_mocks(account=nft_user)
+    other_user = get_account(index=3)
+
+    legacy = MockLegacyFactory.deploy(ADMISSION_FEE, mock_usdt.address, {"from": factory_owner})
+    mock_usdt.approve(legacy.address, 3 * ADMISSION_FEE, {"from": nft_user})
+    legacy.applyToWhitelist(mock_nft.address, ADMISSION_FEE, {"from": nft_user})
+    legacy.admitToWhitelist(other_user, mock_nft2.address, {"from": factory_owner})
+    legacy.deposit(ADMISSION_FEE, {"from": nft_user})
+
+    # Released before the migration
+    legacy.applyToWhitelist(released_nft.address, ADMISSION_FEE, {"from": nft_user})
+    released_nft.transferOwnership(legacy.address, {"from": nft_user})
+    legacy.claimOwnership(released_nft.address, {"from": nft_user})
+
+    # An exported list of candidates may contain contracts that were never admitted
+    candidates = [mock_nft.address, mock_nft2.address, released_nft.address, mock_nft.address, other_user.address]
+    pairs = pairs_from_factory(legacy.address, factory_owner, candidates=candidates)
+    assert sorted(pairs) == sorted([(nft_user.address, mock_nft.address), (other_user.address, mock_nft2.address)])
+
+    tree = MigrationTree(pairs)
+    factory.setMigrationRoot(tree.root, {"from": factory_owner})
+    for owner, nft_contract in tree.pairs:
+        factory.claimMigration(owner, nft_contract, tree.proof(owner, nft_contract), {"from": nft_user})
+        assert factory.getContractInfo(nft_contract)[0] == owner
+    with pytest.raises(Exception):
+        factory.claimMigration(nft_user, released_nft, tree.proof(nft_user, mock_nft), {"from": nft_user})
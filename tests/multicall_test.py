@@ -0,0 +1,72 @@
+from brownie import MockMulticall3
+from scripts.multicall import Multicall, factory_status
+from web3 import Web3
+
+import pytest
+
+TEST_URI = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5a/metadata.json"
+ADMISSION_FEE = Web3.toWei(50, "ether")
+MINTING_FEE = Web3.toWei(29, "ether")
+EDITING_FEE = Web3.toWei(23, "ether")
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+@pytest.fixture(scope="module")
+def fees():
+    return (ADMISSION_FEE, MINTING_FEE, EDITING_FEE)
+
+
+@pytest.fixture(scope="module")
+def multicall(factory_owner):
+    aggregator = MockMulticall3.deploy({"from": factory_owner})
+    return Multicall(aggregator.address, max_calls=4)
+
+
+def test_factory_status(registered, multicall, nft_user):
+    """
+    Testing that the monitoring reads of the factory and its collections
+    are aggregated and decoded, with failing calls returned as None
+    """
+    factory, mock_usdt, mock_nft = registered
+
+    mock_usdt.approve(factory.address, 2 * MINTING_FEE, {"from": nft_user})
+    factory.mintBatchFromAddress(
+        [nft_user.address] * 2, mock_nft.address, [TEST_URI] * 2, 2 * MINTING_FEE, {"from": nft_user})
+
+    status = factory_status(multicall, factory, [mock_nft], [1, 2, 3])
+
+    assert status["fee"] == MINTING_FEE
+    assert status["admissionFee"] == ADMISSION_FEE
+    assert status["editingFee"] == EDITING_FEE
+    assert status["depositToken"] == mock_usdt.address
+    assert status["latestAddress"] == ZERO_ADDRESS
+    assert status["collections"] == {
+        mock_nft.address: {"locked": True, "tokenURIs": {1: TEST_URI, 2: TEST_URI, 3: None}}
+    }
+
+
+def test_aggregate_view_getters(registered, multicall, nft_user, factory_owner):
+    """
+    Testing that the view getters of the factory can be aggregated,
+    including the registry getters that used to be restricted to the owner
+    """
+    factory, _, mock_nft = registered
+
+    assert multicall.add(factory.getLatestVersion) == 0
+    multicall.add(factory.getContractInfo, mock_nft)
+    multicall.add(factory.checkWhitelistAdmission["address"], nft_user)
+    multicall.add(factory.getUserOfContract, mock_nft)
+    multicall.add(factory.getContractsOfUser["address"], nft_user)
+    multicall.add(factory.checkWhitelistAdmission["address"], factory_owner)
+
+    latest, info, admitted, user, contract_count, owner_admitted = multicall.execute()
+    assert latest == ZERO_ADDRESS
+    assert info == (nft_user, 0, 0)
+    assert admitted is True
+    assert user == nft_user
+    assert contract_count == 1
+    assert owner_admitted is False
+    assert multicall.calls == []
+
+    # Any account can read them directly as well
+    assert factory.getUserOfContract(mock_nft, {"from": nft_user}) == nft_user
@@ -0,0 +1,162 @@
+from scripts.helpful_scripts import get_account
+from scripts.read_cache import CollectionReadCache, LRUCache
+from web3 import Web3
+
+import pytest
+import time
+
+TEST_URI = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5a/metadata.json"
+TEST_URI2 = "ipfs://bafyreibi5ogzlukr7yuknism6thyvuukmppvnbjk2llt7algvj2pliqs5b/metadata.json"
+ADMISSION_FEE = Web3.toWei(50, "ether")
+MINTING_FEE = Web3.toWei(29, "ether")
+EDITING_FEE = Web3.toWei(23, "ether")
+
+
+@pytest.fixture(scope="module")
+def fees():
+    return (ADMISSION_FEE, MINTING_FEE, EDITING_FEE)
+
+
+def mint(factory, mock_usdt, mock_nft, nft_user, count):
+    mock_usdt.approve(factory.address, count * MINTING_FEE, {"from": nft_user})
+    tx = factory.mintConsecutiveFromAddress(
+        nft_user, mock_nft.address, count, "ipfs://batch/", count * MINTING_FEE, {"from": nft_user})
+    tx.wait(1)
+    return tx.return_value
+
+
+def test_lru_eviction():
+    """
+    Testing that the least recently used key is evicted when the cache is full
+    """
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2 and cache.evictions == 1
+    assert cache.pop("a") and not cache.pop("a")
+
+
+def test_read_through_and_invalidation(registered, nft_user, factory_owner):
+    """
+    Testing that the cached values are served without calls until the events
+    changing them are synced, and that only the changed entries are dropped
+    """
+    factory, mock_usdt, mock_nft = registered
+    receiver = get_account(index=3)
+    first_token_id = mint(factory, mock_usdt, mock_nft, nft_user, 3)
+    second, third = first_token_id + 1, first_token_id + 2
+
+    cache = CollectionReadCache(factory.address)
+    assert cache.token_uri(mock_nft, second) == "ipfs://batch/" + str(second)
+    assert cache.owner_of(mock_nft, second) == nft_user.address
+    assert cache.owner_of(mock_nft, third) == nft_user.address
+    assert cache.owner_of(mock_nft, 1000) is None
+    assert cache.locked(mock_nft)
+    assert cache.user_of_contract(mock_nft) == nft_user.address
+    assert cache.metrics["misses"] == 6
+
+    assert cache.token_uri(mock_nft, second) == "ipfs://batch/" + str(second)
+    assert cache.owner_of(mock_nft, 1000) is None
+    assert cache.locked(mock_nft)
+    assert cache.metrics["hits"] == 3
+
+    # Edited through the factory
+    mock_usdt.approve(factory.address, 2 * EDITING_FEE, {"from": nft_user})
+    factory.changeTokenURI(mock_nft.address, second, TEST_URI2, EDITING_FEE, {"from": nft_user})
+    assert cache.token_uri(mock_nft, second) != TEST_URI2
+    assert cache.sync() == 1
+    assert cache.token_uri(mock_nft, second) == TEST_URI2
+    assert cache.owner_of(mock_nft, third) == nft_user.address
+
+    # Lock toggles and transfers
+    factory.unlockContract(mock_nft.address, {"from": nft_user})
+    mock_nft.transferFrom(nft_user, receiver, third, {"from": nft_user})
+    factory.lockContract(mock_nft.address, {"from": nft_user})
+    cache.sync()
+    assert cache.owner_of(mock_nft, third) == receiver.address
+    assert cache.owner_of(mock_nft, second) == nft_user.address
+    assert cache.locked(mock_nft)
+
+    # Deleted through the factory
+    factory.deleteNFT(mock_nft.address, second, EDITING_FEE, {"from": nft_user})
+    cache.sync()
+    assert cache.owner_of(mock_nft, second) is None
+    assert cache.token_uri(mock_nft, second) is None
+
+    # Minted through the factory
+    mock_usdt.approve(factory.address, MINTING_FEE, {"from": nft_user})
+    tx = factory.mintNFTFromAddress(nft_user, mock_nft.address, TEST_URI, MINTING_FEE, {"from": nft_user})
+    assert cache.owner_of(mock_nft, tx.return_value) is None
+    cache.sync()
+    assert cache.owner_of(mock_nft, tx.return_value) == nft_user.address
+
+    # Released by the user, who changes the format of the compact URIs
+    factory.claimOwnership(mock_nft.address, {"from": nft_user})
+    cache.sync()
+    assert cache.user_of_contract(mock_nft) == "0x" + "0" * 40
+    cached_tokens = len([key for key in cache.cache.entries if key[1] is not None])
+    mock_nft.setCompactURIFormat("ar://", "0x01711220", "", {"from": nft_user})
+    assert cache.sync() == cached_tokens
+    assert cache.locked(mock_nft)
+
+    metrics = cache.metrics
+    assert metrics["invalidations"] > 0
+    assert metrics["entries"] == 1
+
+
+def test_bounded_memory(registered, nft_user):
+    """
+    Testing that the cache never keeps more than max_entries entries
+    """
+    factory, mock_usdt, mock_nft = registered
+    first_token_id = mint(factory, mock_usdt, mock_nft, nft_user, 10)
+
+    cache = CollectionReadCache(factory.address, max_entries=4)
+    for token_id in range(first_token_id, first_token_id + 10):
+        cache.token_uri(mock_nft, token_id)
+    assert cache.metrics["entries"] == 4
+    assert cache.metrics["evictions"] == 6
+
+    # The most recent tokens are still cached, the oldest ones are read again
+    cache.token_uri(mock_nft, first_token_id + 9)
+    cache.token_uri(mock_nft, first_token_id)
+    assert cache.metrics["hits"] == 1
+    assert cache.metrics["misses"] == 11
+
+
+def test_benchmark_cached_reads(registered, nft_user):
+    """
+    Benchmarks the latency of tokenURI and ownerOf requests served from the
+    node and from the cache, with a working set that fits in the cache
+    """
+    factory, mock_usdt, mock_nft = registered
+    token_count = 20
+    rounds = 10
+    first_token_id = mint(factory, mock_usdt, mock_nft, nft_user, token_count)
+    token_ids = list(range(first_token_id, first_token_id + token_count))
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for token_id in token_ids:
+            mock_nft.tokenURI(token_id)
+            mock_nft.ownerOf(token_id)
+    uncached = (time.perf_counter() - started) / (rounds * token_count * 2)
+
+    cache = CollectionReadCache(factory.address)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        cache.sync()
+        for token_id in token_ids:
+            cache.token_uri(mock_nft, token_id)
+            cache.owner_of(mock_nft, token_id)
+    cached = (time.perf_counter() - started) / (rounds * token_count * 2)
+
+    print(f"request latency: {uncached * 1000:.3f} ms without cache, {cached * 1000:.3f} ms with cache, "
+          f"{cache.metrics}")
+    assert cache.metrics["hit_rate"] == (rounds - 1) / rounds
+    assert cached < uncached
@@ -0,0 +1,182 @@
+from brownie import accounts, chain
+from scripts.helpful_scripts import get_account, deploy_mocks
+from scripts.deploy import deploy_generic_factory
+from scripts.vouchers import sign_voucher, generate_vouchers
+from web3 import Web3
+
+import pytest
+
+ADMISSION_FEE = Web3.toWei(50, "ether")
+MINTING_FEE = Web3.toWei(29, "ether")
+EDITING_FEE = Web3.toWei(23, "ether")
+# Vouchers are signed off-chain, so the signer needs a known private key
+VOUCHER_SIGNER_KEY = "0x" + "44" * 32
+REDEEMER_BALANCE = Web3.toWei(1000, "ether")
+
+
+@pytest.fixture(scope="module")
+def fees():
+    return (ADMISSION_FEE, MINTING_FEE, EDITING_FEE)
+
+
+@pytest.fixture(scope="module")
+def voucher_setup(factory_owner):
+    """
+    A factory where the voucher signer has applied with its own mock NFT and
+    transferred its ownership to the factory. The redeemer holds some mock USDT.
+    Returns the factory, the mock USDT, the mock NFT, the signer and the redeemer
+    """
+    signer = accounts.add(VOUCHER_SIGNER_KEY)
+    get_account(index=0).transfer(signer, Web3.toWei(1, "ether"))
+    mock_usdt, _, mock_nft = deploy_mocks(account=signer)
+    redeemer = get_account(index=3)
+
+    factory = deploy_generic_factory(
+        factory_owner,
+        ADMISSION_FEE,
+        MINTING_FEE,
+        EDITING_FEE,
+        mock_usdt.address,
+        force=True
+    )
+
+    mock_usdt.approve(factory.address, ADMISSION_FEE, {"from": signer})
+    factory.applyToWhitelist(mock_nft.address, ADMISSION_FEE, {"from": signer})
+    mock_nft.transferOwnership(factory.address, {"from": signer})
+    mock_usdt.transfer(redeemer, REDEEMER_BALANCE, {"from": signer})
+
+    return factory, mock_usdt, mock_nft, signer, redeemer
+
+
+def test_redeem_open_voucher(voucher_setup):
+    """
+    Testing that an open voucher mints to the redeemer, who pays the fee,
+    and that it cannot be redeemed twice
+    """
+    factory, mock_usdt, mock_nft, signer, redeemer = voucher_setup
+    expiry = chain.time() + 3600
+    voucher, signature = sign_voucher(factory, signer.private_key, mock_nft, "ipfs://open", MINTING_FEE, expiry, 1)
+
+    signer_balance = mock_usdt.balanceOf(signer)
+    factory_balance = mock_usdt.balanceOf(factory)
+    mock_usdt.approve(factory.address, MINTING_FEE, {"from": redeemer})
+    tx = factory.redeemVoucher(voucher, signature, {"from": redeemer})
+    tx.wait(1)
+
+    token_id = tx.return_value
+    assert mock_nft.ownerOf(token_id) == redeemer
+    assert mock_nft.tokenURI(token_id) == "ipfs://open"
+    assert mock_usdt.balanceOf(factory) == factory_balance + MINTING_FEE
+    assert mock_usdt.balanceOf(signer) == signer_balance
+    assert tx.events["NFTCreated"]["caller"] == redeemer
+    assert tx.events["NFTCreated"]["fee"] == MINTING_FEE
+    assert tx.events["VoucherRedeemed"]["signer"] == signer
+    assert factory.getContractInfo(mock_nft.address)[2] == 1
+    assert factory.isVoucherNonceUsed(signer, 1)
+
+    # Replaying the same voucher is rejected, even by someone else
+    mock_usdt.approve(factory.address, 2 * MINTING_FEE, {"from": redeemer})
+    with pytest.raises(Exception):
+        factory.redeemVoucher(voucher, signature, {"from": redeemer})
+    with pytest.raises(Exception):
+        factory.redeemVoucher(voucher, signature, {"from": signer})
+
+    # Another voucher with the same nonce is rejected as well
+    voucher, signature = sign_voucher(factory, signer.private_key, mock_nft, "ipfs://other", MINTING_FEE, expiry, 1)
+    with pytest.raises(Exception):
+        factory.redeemVoucher(voucher, signature, {"from": redeemer})
+
+
+def test_redeem_targeted_voucher(voucher_setup, nft_user):
+    """
+    Testing that a voucher with a recipient can be redeemed by a relayer paying
+    the fee with its credits, and always mints to the recipient
+    """
+    factory, mock_usdt, mock_nft, signer, redeemer = voucher_setup
+    fee = MINTING_FEE + 1
+    voucher, signature = sign_voucher(factory, signer.private_key, mock_nft, "ipfs://targeted", fee,
+                                      chain.time() + 3600, 2, recipient=nft_user)
+
+    mock_usdt.approve(factory.address, fee, {"from": redeemer})
+    factory.deposit(fee, {"from": redeemer})
+    tx = factory.redeemVoucher(voucher, signature, {"from": redeemer})
+    tx.wait(1)
+
+    assert mock_nft.ownerOf(tx.return_value) == nft_user
+    assert factory.credits(redeemer) == 0
+    assert tx.events["CreditUsed"]["_value"] == fee
+    assert tx.events["NFTCreated"]["recipient"] == nft_user
+
+
+def test_invalid_vouchers(voucher_setup, nft_user, factory_owner):
+    """
+    Testing that expired, tampered, cancelled and underpaid vouchers are rejected,
+    together with the vouchers signed by someone that is not the user of the contract
+    """
+    factory, mock_usdt, mock_nft, signer, redeemer = voucher_setup
+    expiry = chain.time() + 3600
+    mock_usdt.approve(factory.address, 10 * MINTING_FEE, {"from": redeemer})
+
+    # Fee lower than the minting fee
+    voucher, signature = sign_voucher(factory, signer.private_key, mock_nft, "ipfs://low", MINTING_FEE - 1, expiry, 3)
+    with pytest.raises(Exception):
+        factory.redeemVoucher(voucher, signature, {"from": redeemer})
+
+    # Tampered URI, fee and recipient
+    voucher, signature = sign_voucher(factory, signer.private_key, mock_nft, "ipfs://signed", MINTING_FEE, expiry, 4)
+    for index, value in ((2, "ipfs://tampered"), (3, MINTING_FEE + 1), (1, redeemer.address)):
+        tampered = list(voucher)
+        tampered[index] = value
+        with pytest.raises(Exception):
+            factory.redeemVoucher(tuple(tampered), signature, {"from": redeemer})
+
+    # Signed for another factory
+    voucher, signature = sign_voucher(mock_usdt, signer.private_key, mock_nft, "ipfs://other", MINTING_FEE, expiry, 5)
+    with pytest.raises(Exception):
+        factory.redeemVoucher(voucher, signature, {"from": redeemer})
+
+    # Signed by someone that did not apply for the contract
+    other_key = "0x" + "55" * 32
+    voucher, signature = sign_voucher(factory, other_key, mock_nft, "ipfs://other", MINTING_FEE, expiry, 6)
+    with pytest.raises(Exception):
+        factory.redeemVoucher(voucher, signature, {"from": redeemer})
+
+    # Cancelled by the signer
+    voucher, signature = sign_voucher(factory, signer.private_key, mock_nft, "ipfs://cancelled", MINTING_FEE, expiry, 7)
+    tx = factory.cancelVoucher(7, {"from": signer})
+    tx.wait(1)
+    assert tx.events["VoucherCancelled"]["nonce"] == 7
+    with pytest.raises(Exception):
+        factory.redeemVoucher(voucher, signature, {"from": redeemer})
+
+    # Expired
+    voucher, signature = sign_voucher(factory, signer.private_key, mock_nft, "ipfs://expired", MINTING_FEE, expiry, 8)
+    chain.sleep(3601)
+    chain.mine()
+    with pytest.raises(Exception):
+        factory.redeemVoucher(voucher, signature, {"from": redeemer})
+
+    # Signer removed from the whitelist
+    voucher, signature = sign_voucher(factory, signer.private_key, mock_nft, "ipfs://removed", MINTING_FEE,
+                                      chain.time() + 3600, 9)
+    factory.removeFromWhitelist(signer, {"from": factory_owner})
+    with pytest.raises(Exception):
+        factory.redeemVoucher(voucher, signature, {"from": redeemer})
+    assert mock_nft.totalSupply() == 0
+
+
+def test_generate_vouchers(voucher_setup):
+    """
+    Testing that generated vouchers use consecutive nonces and can all be redeemed
+    """
+    factory, mock_usdt, mock_nft, signer, redeemer = voucher_setup
+    jobs = [("", "ipfs://generated/0"), (redeemer.address, "ipfs://generated/1"), ("", "ipfs://generated/2")]
+    vouchers = generate_vouchers(factory, signer.private_key, mock_nft, jobs, MINTING_FEE, chain.time() + 3600)
+    assert [entry["voucher"][5] - vouchers[0]["voucher"][5] for entry in vouchers] == [0, 1, 2]
+
+    mock_usdt.approve(factory.address, len(jobs) * MINTING_FEE, {"from": redeemer})
+    for entry in vouchers:
+        tx = factory.redeemVoucher(entry["voucher"], entry["signature"], {"from": redeemer})
+        tx.wait(1)
+        assert mock_nft.tokenURI(tx.return_value) == entry["voucher"][2]
+    assert mock_nft.balanceOf(redeemer) == len(jobs)